@@ -0,0 +1,520 @@
+"""
+Continuous audio capture into a shared int16 ring buffer
+One persistent audio source feeds both wake word detection and command recording.
+Sources can be a microphone (PyAudio), a WAV file replayed at real-time or
+maximum speed, or a synthetic signal generator. Several sources can run side
+by side as named streams, each with its own ring buffer.
+"""
+
+import os
+import struct
+import threading
+import time
+import weakref
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Preallocated int16 ring buffer addressed by absolute sample positions"""
+    
+    def __init__(self, capacity):
+        """Allocate a ring buffer holding `capacity` samples"""
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._write_position = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._readers = weakref.WeakSet()
+        self._writer_waiting = False
+        
+        # Number of reads that fell behind the writer and lost samples
+        self.overruns = 0
+    
+    @property
+    def write_position(self):
+        """Absolute number of samples written since the buffer was created"""
+        return self._write_position
+    
+    @property
+    def oldest_position(self):
+        """Oldest absolute sample position still held in the buffer"""
+        return max(0, self._write_position - self.capacity)
+    
+    def write(self, samples, block=False):
+        """
+        Append int16 samples, overwriting the oldest audio when full
+        
+        With `block`, waits instead until every live reader has consumed the
+        audio that would be overwritten. Live sources never block; replayed
+        sources use it to run faster than real time without losing audio.
+        """
+        count = len(samples)
+        if count == 0:
+            return
+        
+        if count > self.capacity:
+            samples = samples[-self.capacity:]
+        
+        with self._condition:
+            if block:
+                self._writer_waiting = True
+                self._condition.wait_for(
+                    lambda: self._closed or all(
+                        reader.position >= self._write_position + count - self.capacity
+                        for reader in list(self._readers)
+                    )
+                )
+                self._writer_waiting = False
+            
+            start = (self._write_position + count - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            if first < len(samples):
+                self._buffer[:len(samples) - first] = samples[first:]
+            
+            self._write_position += count
+            self._condition.notify_all()
+    
+    def read(self, position, count, out=None, timeout=None):
+        """
+        Read `count` samples starting at absolute `position`
+        
+        Blocks until the samples are available. Returns a tuple of
+        (samples, position) where position is where the samples actually
+        started; it is moved forward if the requested audio was already
+        overwritten. Returns (None, position) on timeout or after close().
+        """
+        if count > self.capacity:
+            raise ValueError(f"Cannot read {count} samples from a {self.capacity} sample ring buffer")
+        
+        with self._condition:
+            ready = self._condition.wait_for(
+                lambda: self._closed or self._write_position >= position + count,
+                timeout=timeout
+            )
+            if not ready or self._write_position < position + count:
+                return None, position
+            
+            if position < self._write_position - self.capacity:
+                self.overruns += 1
+                position = self._write_position - self.capacity
+            
+            out = self._copy(position, count, out)
+        
+        return out, position
+    
+    def latest(self, count, out=None):
+        """Copy of the most recent `count` samples (fewer if not yet written), without waiting"""
+        with self._condition:
+            count = min(count, self._write_position, self.capacity)
+            return self._copy(self._write_position - count, count, out)
+    
+    def _copy(self, position, count, out):
+        """Copy `count` samples from absolute `position` into `out`; caller holds the lock"""
+        if out is None:
+            out = np.empty(count, dtype=np.int16)
+        
+        start = position % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        if first < count:
+            out[first:count] = self._buffer[:count - first]
+        
+        return out[:count]
+    
+    def reader(self, position=None):
+        """Create a cursor over this buffer, by default at the current write position"""
+        if position is None:
+            position = self._write_position
+        reader = AudioRingReader(self, position)
+        self._readers.add(reader)
+        return reader
+    
+    def release_reader(self, reader):
+        """Forget a reader so a blocking writer no longer waits for it"""
+        with self._condition:
+            self._readers.discard(reader)
+            self._condition.notify_all()
+    
+    def reader_advanced(self):
+        """Wake a blocked writer after a reader moved forward"""
+        if self._writer_waiting:
+            with self._condition:
+                self._condition.notify_all()
+    
+    def close(self):
+        """Wake up any blocked readers; subsequent reads return None"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class AudioRingReader:
+    """Independent read cursor over an AudioRingBuffer"""
+    
+    def __init__(self, ring, position):
+        """Create a reader positioned at absolute sample `position`"""
+        self.ring = ring
+        self.position = position
+    
+    def read(self, count, out=None, timeout=None):
+        """Read the next `count` samples and advance the cursor, or return None"""
+        samples, position = self.ring.read(self.position, count, out=out, timeout=timeout)
+        if samples is None:
+            return None
+        
+        self.position = position + count
+        self.ring.reader_advanced()
+        return samples
+    
+    def close(self):
+        """Stop holding back a blocking writer; the reader must not be used afterwards"""
+        self.ring.release_reader(self)
+    
+    def rewind(self, count):
+        """Move the cursor back by up to `count` samples still held in the buffer"""
+        self.position = max(self.ring.oldest_position, self.position - int(count))
+
+
+def read_wav_mmap(path):
+    """
+    Memory-map the sample data of a PCM WAV file
+    
+    Returns (samples, sample_rate) where samples is a read-only
+    (frames, channels) array backed by the file, or None if the file is not
+    16-bit integer or 32-bit float PCM.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+            return None
+        
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack('<4sI', chunk)
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(size - 16 + (size & 1), os.SEEK_CUR)
+            elif chunk_id == b'data':
+                data_offset = f.tell()
+                data_size = size
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+    
+    if fmt is None:
+        return None
+    
+    audio_format, channels, sample_rate, _, block_align, bits = fmt
+    if audio_format == 1 and bits == 16:
+        dtype = '<i2'
+    elif audio_format == 3 and bits == 32:
+        dtype = '<f4'
+    else:
+        return None
+    
+    # Streamed WAVs may carry a placeholder data size
+    data_size = min(data_size, os.path.getsize(path) - data_offset)
+    frames = data_size // block_align
+    if frames == 0:
+        return np.zeros((0, channels), dtype=dtype), sample_rate
+    
+    samples = np.memmap(path, dtype=dtype, mode='r', offset=data_offset, shape=(frames, channels))
+    return samples, sample_rate
+
+
+class AudioSource:
+    """Base class for audio sources that feed an AudioRingBuffer"""
+    
+    def __init__(self, sample_rate, frames_per_buffer=512):
+        """Configure the source; audio starts flowing on start()"""
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.ring = None
+        
+        # Number of blocks where the source reported an input overflow
+        self.input_overflows = 0
+        
+        # Set once a finite source has delivered all of its audio
+        self.finished = threading.Event()
+    
+    def start(self, ring):
+        """Start writing audio into `ring`"""
+        raise NotImplementedError
+    
+    def stop(self):
+        """Stop producing audio and release blocked readers"""
+        if self.ring is not None:
+            self.ring.close()
+
+
+class PyAudioSource(AudioSource):
+    """Single persistent PyAudio microphone stream"""
+    
+    def __init__(self, sample_rate, frames_per_buffer=512, device_index=None):
+        """Configure capture from the default (or given) input device"""
+        super().__init__(sample_rate, frames_per_buffer)
+        self.device_index = device_index
+        self.audio = None
+        self.stream = None
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback: copy the incoming block into the ring buffer"""
+        if status & self._overflow_flag:
+            self.input_overflows += 1
+        
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        return None, self._continue_flag
+    
+    def start(self, ring):
+        """Open the input stream and start capturing"""
+        if self.stream is not None:
+            return
+        
+        import pyaudio
+        self._overflow_flag = pyaudio.paInputOverflow
+        self._continue_flag = pyaudio.paContinue
+        
+        self.ring = ring
+        self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback
+        )
+        self.stream.start_stream()
+    
+    def stop(self):
+        """Stop capturing and release blocked readers"""
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception as e:
+                print(f"Audio capture shutdown error: {e}")
+            self.stream = None
+        
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
+        
+        super().stop()
+
+
+class GeneratedAudioSource(AudioSource):
+    """Source that produces blocks on its own thread, paced in real time or as fast as possible"""
+    
+    def __init__(self, sample_rate, frames_per_buffer=512, realtime=True):
+        """
+        Configure the producer thread
+        
+        In real-time mode blocks are delivered at the sample rate, like a
+        microphone. Otherwise blocks are written as fast as the slowest ring
+        buffer reader consumes them.
+        """
+        super().__init__(sample_rate, frames_per_buffer)
+        self.realtime = realtime
+        self.is_running = False
+        self.thread = None
+        self.samples_written = 0
+    
+    def next_block(self):
+        """Return the next int16 block, or None when the source is exhausted"""
+        raise NotImplementedError
+    
+    def run(self):
+        """Producer loop"""
+        start = time.monotonic()
+        while self.is_running:
+            block = self.next_block()
+            if block is None:
+                break
+            
+            if self.realtime:
+                delay = start + self.samples_written / self.sample_rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            
+            self.ring.write(block, block=not self.realtime)
+            self.samples_written += len(block)
+        
+        self.finished.set()
+    
+    def start(self, ring):
+        """Start the producer thread"""
+        self.ring = ring
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the producer thread"""
+        self.is_running = False
+        super().stop()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+
+class WavFileSource(GeneratedAudioSource):
+    """Replays a WAV file, optionally looping, at real-time or maximum speed"""
+    
+    def __init__(self, path, sample_rate, frames_per_buffer=512, realtime=True, loop=False):
+        """Memory-map `path`; it must be 16-bit or float PCM at `sample_rate`"""
+        super().__init__(sample_rate, frames_per_buffer, realtime)
+        wav = read_wav_mmap(path)
+        if wav is None:
+            raise ValueError(f"Unsupported WAV file (need 16-bit or float PCM): {path}")
+        if wav[1] != sample_rate:
+            raise ValueError(f"WAV file is {wav[1]} Hz, expected {sample_rate} Hz: {path}")
+        
+        self.path = path
+        self.samples = wav[0]
+        self.loop = loop
+        self.offset = 0
+    
+    def next_block(self):
+        """Next block of the file converted to mono int16"""
+        if self.offset >= len(self.samples):
+            if not self.loop or len(self.samples) == 0:
+                return None
+            self.offset = 0
+        
+        block = self.samples[self.offset:self.offset + self.frames_per_buffer]
+        self.offset += len(block)
+        
+        if block.shape[1] > 1:
+            block = block.mean(axis=1)
+        else:
+            block = block[:, 0]
+        
+        if block.dtype.kind == 'f':
+            return np.clip(block * 32768.0, -32768, 32767).astype(np.int16)
+        return block.astype(np.int16)
+
+
+class SyntheticSource(GeneratedAudioSource):
+    """Deterministic synthetic signal: silence, noise, a tone, or tone bursts separated by noise"""
+    
+    SIGNALS = ("silence", "noise", "tone", "bursts")
+    
+    def __init__(self, sample_rate, frames_per_buffer=512, realtime=False, signal="bursts",
+                 duration=None, amplitude=0.3, noise_level=0.001, frequency=440.0,
+                 burst_duration=1.5, gap_duration=3.0, seed=0):
+        """
+        Configure the generator
+        
+        `duration` is in seconds (None runs until stopped). In "bursts" mode a
+        tone of `burst_duration` seconds alternates with `gap_duration` seconds
+        of background noise, which exercises endpointing like short commands.
+        """
+        super().__init__(sample_rate, frames_per_buffer, realtime)
+        if signal not in self.SIGNALS:
+            raise ValueError(f"Unknown synthetic signal '{signal}', expected one of {self.SIGNALS}")
+        
+        self.signal = signal
+        self.total_samples = None if duration is None else int(duration * sample_rate)
+        self.amplitude = amplitude
+        self.noise_level = noise_level
+        self.frequency = frequency
+        self.burst_samples = int(burst_duration * sample_rate)
+        self.period_samples = self.burst_samples + int(gap_duration * sample_rate)
+        self.rng = np.random.default_rng(seed)
+        self.position = 0
+    
+    def next_block(self):
+        """Generate the next block"""
+        count = self.frames_per_buffer
+        if self.total_samples is not None:
+            count = min(count, self.total_samples - self.position)
+            if count <= 0:
+                return None
+        
+        t = np.arange(self.position, self.position + count)
+        self.position += count
+        
+        block = np.zeros(count, dtype=np.float32)
+        if self.signal != "silence":
+            block += self.rng.normal(0.0, self.noise_level, count).astype(np.float32)
+        if self.signal == "tone":
+            block += self.amplitude * np.sin(2 * np.pi * self.frequency * t / self.sample_rate)
+        elif self.signal == "bursts":
+            in_burst = (t % self.period_samples) < self.burst_samples
+            block += in_burst * self.amplitude * np.sin(2 * np.pi * self.frequency * t / self.sample_rate)
+        
+        return np.clip(block * 32768.0, -32768, 32767).astype(np.int16)
+
+
+def create_audio_source(source_config, sample_rate, frames_per_buffer=512):
+    """
+    Create an audio source from an `audio_source` configuration entry
+    
+    {"type": "pyaudio", "device_index": null}
+    {"type": "wav", "path": "...", "realtime": true, "loop": false}
+    {"type": "synthetic", "signal": "bursts", "duration": 60, "realtime": false}
+    """
+    options = dict(source_config or {})
+    source_type = options.pop('type', 'pyaudio')
+    
+    if source_type == 'pyaudio':
+        return PyAudioSource(sample_rate, frames_per_buffer, **options)
+    if source_type == 'wav':
+        return WavFileSource(options.pop('path'), sample_rate, frames_per_buffer, **options)
+    if source_type == 'synthetic':
+        return SyntheticSource(sample_rate, frames_per_buffer, **options)
+    
+    raise ValueError(f"Unknown audio source type '{source_type}'")
+
+
+class AudioStream:
+    """
+    One named input of the engine: a source, its ring buffer and per-stream state
+    
+    Wake word detection and endpointing keep state across frames, so each
+    stream has its own detector, gate and endpointer; the models that turn
+    commands into text are shared by all streams.
+    """
+    
+    def __init__(self, name, source, ring_buffer):
+        """Pair `source` with the ring buffer it writes into"""
+        self.name = name
+        self.source = source
+        self.ring_buffer = ring_buffer
+        self.monitor_reader = None
+        self.monitor_thread = None
+        self.endpointer = None
+        self.porcupine = None
+        self.wake_word_frames = None
+        self.wake_word_gate = None
+        self.is_listening = False
+        self.wake_words = 0
+    
+    @property
+    def nbytes(self):
+        """Memory held by the stream's ring buffer and wake word buffers"""
+        nbytes = self.ring_buffer.capacity * 2
+        if self.wake_word_frames:
+            nbytes += self.wake_word_frames.frame.nbytes
+        if self.wake_word_gate:
+            nbytes += self.wake_word_gate.history.nbytes + self.wake_word_gate.current.nbytes
+        return nbytes
+    
+    def stats(self):
+        """Capture and wake word counters of this stream"""
+        stats = {
+            "wake_words": self.wake_words,
+            "ring_overruns": self.ring_buffer.overruns,
+            "input_overflows": self.source.input_overflows,
+            "buffer_bytes": self.nbytes,
+            "listening": self.is_listening
+        }
+        if self.wake_word_gate:
+            stats["wake_gate_frames_gated"] = self.wake_word_gate.frames_gated
+        return stats
@@ -0,0 +1,202 @@
+"""
+Offline batch transcription of recorded audio files
+Streams WAV/FLAC files from a directory or manifest through the same
+transcribe -> correct -> save path as live commands, with resumable progress
+"""
+
+import os
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_capture import read_wav_mmap
+from transcription import result_confidence
+
+
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+
+# Per-file processing stages reported in the summary
+BATCH_STAGES = ('load', 'transcribe', 'correct', 'save')
+
+
+def iter_audio_files(source):
+    """
+    Yield audio file paths from a directory (recursively, sorted) or a manifest
+    
+    A manifest is a text file with one path per line; relative paths are
+    resolved against the manifest's folder and lines starting with # are ignored.
+    """
+    if os.path.isdir(source):
+        for folder, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(folder, name)
+        return
+    
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith('#'):
+                yield path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+
+def load_audio_file(path, sample_rate=16000):
+    """
+    Load an audio file as mono float32 at `sample_rate`
+    
+    WAV files already at the target rate are read through a memory map and
+    converted in a single pass; anything else (FLAC, other rates or formats)
+    is decoded and resampled by ffmpeg through whisper.
+    """
+    if path.lower().endswith('.wav'):
+        wav = read_wav_mmap(path)
+        if wav is not None and wav[1] == sample_rate:
+            samples = wav[0]
+            scale = 1.0 / 32768.0 if samples.dtype.kind == 'i' else 1.0
+            if samples.shape[1] == 1:
+                return np.multiply(samples[:, 0], scale, dtype=np.float32)
+            return np.multiply(samples.mean(axis=1), scale, dtype=np.float32)
+    
+    import whisper
+    return whisper.load_audio(path, sr=sample_rate)
+
+
+class BatchCheckpoint:
+    """Append-only record of completed files so an interrupted batch can resume"""
+    
+    def __init__(self, path):
+        """Load previously completed files from `path`, if it exists"""
+        self.path = path
+        self.completed = set()
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.completed = {line.rstrip('\n') for line in f if line.strip()}
+    
+    def is_done(self, audio_path):
+        """Whether a file was completed in a previous run"""
+        return os.path.abspath(audio_path) in self.completed
+    
+    def mark_done(self, audio_path):
+        """Record a completed file; safe to call from several threads"""
+        key = os.path.abspath(audio_path)
+        with self.lock:
+            self.completed.add(key)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(key + '\n')
+
+
+def run_batch(assistant, source, jobs=4, checkpoint_path=None, report_path=None):
+    """
+    Transcribe every file from `source` with `jobs` files in flight at a time
+    
+    Files are loaded, transcribed, corrected and saved to the assistant's
+    output file. Completed files are recorded in `checkpoint_path` and skipped
+    on the next run; files whose transcription failed are not, so they are
+    retried. Returns a summary with real-time factor, files per
+    second and per-stage timings, optionally also written to `report_path`
+    as JSON.
+    """
+    assistant.wait_until_ready()
+    
+    checkpoint = BatchCheckpoint(checkpoint_path)
+    sample_rate = assistant.sample_rate
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(jobs * 2)
+    
+    totals = {stage: 0.0 for stage in BATCH_STAGES}
+    summary = {"files": 0, "skipped": 0, "failed": 0, "audio_seconds": 0.0}
+    
+    def process_file(path):
+        timings = {}
+        try:
+            start = time.perf_counter()
+            audio = load_audio_file(path, sample_rate)
+            timings['load'] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            result = assistant.transcribe_result(audio)
+            if result is None:
+                # Not checkpointed, so the file is retried on the next run
+                raise RuntimeError("transcription failed")
+            segments, dropped = assistant.speech_segments(result)
+            text = " ".join(segment["text"] for segment in segments)
+            timings['transcribe'] = time.perf_counter() - start
+            
+            corrected_text = None
+            if text:
+                start = time.perf_counter()
+                corrected_text = assistant.correct_segments(segments)
+                timings['correct'] = time.perf_counter() - start
+            
+            # The checkpoint is updated by the output writer once the line is written
+            start = time.perf_counter()
+            if corrected_text:
+                record = {
+                    "source": path,
+                    "raw_text": text,
+                    "profile": assistant.decoding_profile,
+                    "audio_duration": len(audio) / sample_rate,
+                    "confidence": result_confidence({"segments": segments}),
+                    "segments_dropped": dropped,
+                    "latencies": {stage: round(seconds, 4) for stage, seconds in timings.items()}
+                }
+                assistant.save_output(corrected_text, record, on_written=lambda: checkpoint.mark_done(path))
+            else:
+                checkpoint.mark_done(path)
+            timings['save'] = time.perf_counter() - start
+            
+            with lock:
+                summary['files'] += 1
+                summary['audio_seconds'] += len(audio) / sample_rate
+                for stage, seconds in timings.items():
+                    totals[stage] += seconds
+        except Exception as e:
+            print(f"Batch transcription failed for {path}: {e}")
+            with lock:
+                summary['failed'] += 1
+        finally:
+            slots.release()
+    
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for path in iter_audio_files(source):
+            if checkpoint.is_done(path):
+                summary['skipped'] += 1
+                continue
+            
+            # Bound the number of queued files so huge archives stream through
+            slots.acquire()
+            executor.submit(process_file, path)
+    assistant.output_writer.flush()
+    wall_time = time.perf_counter() - wall_start
+    
+    summary['wall_seconds'] = wall_time
+    summary['files_per_second'] = summary['files'] / wall_time if wall_time > 0 else 0.0
+    summary['real_time_factor'] = wall_time / summary['audio_seconds'] if summary['audio_seconds'] else 0.0
+    summary['stage_seconds'] = totals
+    summary['decoding_profile'] = assistant.decoding_profile
+    
+    print("=" * 60)
+    print("Batch Summary")
+    print("=" * 60)
+    print(f"Files: {summary['files']} transcribed, {summary['skipped']} skipped, {summary['failed']} failed")
+    print(f"Audio: {summary['audio_seconds']:.1f}s in {wall_time:.1f}s")
+    print(f"Real-time factor: {summary['real_time_factor']:.3f}")
+    print(f"Throughput: {summary['files_per_second']:.2f} files/s")
+    print(f"Decoding profile: {summary['decoding_profile']}")
+    for stage in BATCH_STAGES:
+        average = totals[stage] / summary['files'] if summary['files'] else 0.0
+        print(f"  {stage:<10} total {totals[stage]:8.2f}s  avg {average * 1000:8.1f}ms/file")
+    
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    
+    return summary
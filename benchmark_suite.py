@@ -0,0 +1,412 @@
+"""
+Offline end-to-end benchmark of the voice assistant's hot paths
+Measures wake word frame cost, command recording, transcription real-time
+factor per model, text correction latency by sentence length, spectrum
+updates and model startup on generated signals and optional recorded
+fixtures, writes the results as JSON and compares two runs for regressions
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+from audio_capture import AudioRingBuffer, SyntheticSource
+from batch_transcribe import iter_audio_files, load_audio_file
+from benchmark_symspell import misspell
+from pipeline import Utterance
+
+
+# Bump when metric names or meanings change so old results aren't compared against new ones
+SUITE_VERSION = 1
+
+FRAME_LENGTH = 512
+SENTENCE_LENGTHS = (1, 2, 4, 8, 16)
+
+# Settings that keep the measurements to one code path and away from the user's files
+CONFIG_OVERRIDES = {
+    "audio_source": {"type": "synthetic", "signal": "silence", "realtime": False},
+    "parallel_init": False,
+    "whisper_warmup": False,
+    "transcription_workers": 0,
+    "transcription_batch_size": 1,
+    "streaming_partials": False,
+    "metrics_file": None,
+    "metrics_http_port": None,
+    "correction_warm_file": None
+}
+
+
+def synthetic_clip(signal, seconds, sample_rate, seed=0):
+    """int16 samples of a SyntheticSource signal"""
+    source = SyntheticSource(sample_rate, FRAME_LENGTH, signal=signal, duration=seconds, seed=seed,
+                             burst_duration=1.5, gap_duration=seconds)
+    blocks = []
+    while True:
+        block = source.next_block()
+        if block is None:
+            return np.concatenate(blocks)
+        blocks.append(block)
+
+
+def summarize(samples, prefix):
+    """Mean, median and p99 of a list of seconds, as metrics named prefix.*"""
+    samples = np.sort(np.asarray(samples, dtype=np.float64))
+    return {
+        f"{prefix}.mean_seconds": float(samples.mean()),
+        f"{prefix}.p50_seconds": float(samples[len(samples) // 2]),
+        f"{prefix}.p99_seconds": float(samples[min(int(len(samples) * 0.99), len(samples) - 1)])
+    }
+
+
+def environment():
+    """Interpreter, platform and library versions the results were measured with"""
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__
+    }
+    for module in ("torch", "whisper", "symspellpy", "pvporcupine"):
+        try:
+            info[module] = getattr(__import__(module), "__version__", "installed")
+        except ImportError:
+            info[module] = None
+    return info
+
+
+class BenchmarkSuite:
+    """Runs each benchmark against one VoiceAssistant and collects flat metrics"""
+    
+    def __init__(self, assistant, fixtures, models, repeat=3, sentences=20, seed=0):
+        """
+        Benchmark `assistant`, built with CONFIG_OVERRIDES
+        
+        `fixtures` is a list of (name, float32 audio) clips used for
+        transcription on top of the generated signals; `models` are the
+        Whisper models to load and compare.
+        """
+        self.assistant = assistant
+        self.sample_rate = assistant.sample_rate
+        self.fixtures = fixtures
+        self.models = models
+        self.repeat = repeat
+        self.sentences = sentences
+        self.seed = seed
+        self.metrics = {}
+        self.skipped = {}
+    
+    def run(self, only=None):
+        """Run every benchmark (or those named in `only`); returns (metrics, skipped)"""
+        benchmarks = [
+            ("startup", self.bench_startup),
+            ("detect_wake_word", self.bench_wake_word),
+            ("record_audio", self.bench_record_audio),
+            ("correct_text", self.bench_correct_text),
+            ("update_spectrum", self.bench_update_spectrum),
+            ("transcribe_audio", self.bench_transcribe_audio)
+        ]
+        for name, bench in benchmarks:
+            if only and name not in only:
+                continue
+            print(f"Benchmarking {name}...")
+            start = time.perf_counter()
+            try:
+                reason = bench()
+            except Exception as e:
+                reason = f"failed: {e}"
+            if reason:
+                self.skipped[name] = reason
+                print(f"  skipped, {reason}")
+            else:
+                print(f"  done in {time.perf_counter() - start:.1f}s")
+        return self.metrics, self.skipped
+    
+    def bench_startup(self):
+        """Time of each init_* method when the assistant was created"""
+        for name, seconds in self.assistant.model_load_times.items():
+            self.metrics[f"startup.init_{name}_seconds"] = seconds
+    
+    def bench_wake_word(self):
+        """Per-frame detect_wake_word() cost on quiet noise (gated) and on a tone (gate open)"""
+        if not self.assistant.porcupine:
+            return "Porcupine unavailable (set PORCUPINE_ACCESS_KEY)"
+        
+        for signal in ("noise", "tone"):
+            frames = synthetic_clip(signal, 10.0, self.sample_rate, self.seed)
+            frames = frames[:len(frames) // FRAME_LENGTH * FRAME_LENGTH].reshape(-1, FRAME_LENGTH)
+            
+            latencies = []
+            cpu_start = time.thread_time()
+            for _ in range(self.repeat):
+                for frame in frames:
+                    start = time.perf_counter()
+                    self.assistant.detect_wake_word(frame)
+                    latencies.append(time.perf_counter() - start)
+            
+            self.metrics.update(summarize(latencies, f"detect_wake_word.{signal}"))
+            self.metrics[f"detect_wake_word.{signal}.cpu_per_frame_seconds"] = (
+                (time.thread_time() - cpu_start) / len(latencies)
+            )
+    
+    def bench_record_audio(self):
+        """record_audio() of a 1.5 second command followed by silence, from a prefilled ring buffer"""
+        clip = synthetic_clip("bursts", 6.0, self.sample_rate, self.seed)
+        duration = len(clip) / self.sample_rate
+        
+        wall, cpu = [], []
+        for _ in range(self.repeat):
+            ring = AudioRingBuffer(len(clip))
+            reader = ring.reader()
+            ring.write(clip)
+            
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            with contextlib.redirect_stdout(None):
+                self.assistant.record_audio(duration, reader, Utterance(reader.position, reader=reader))
+            wall.append(time.perf_counter() - start)
+            cpu.append(time.thread_time() - cpu_start)
+        
+        self.metrics.update(summarize(wall, "record_audio"))
+        self.metrics["record_audio.cpu_seconds"] = float(np.median(cpu))
+        self.metrics["record_audio.buffer_bytes"] = self.assistant.last_utterance_bytes
+    
+    def bench_correct_text(self):
+        """correct_text() latency by sentence length, uncached and repeated"""
+        sym_spell = self.assistant.sym_spell
+        if not sym_spell:
+            return "SymSpell dictionary unavailable"
+        
+        rng = random.Random(self.seed)
+        words = sorted(sym_spell._words, key=sym_spell._words.get, reverse=True)[:5000]
+        cache = self.assistant.correction_cache
+        
+        for length in SENTENCE_LENGTHS:
+            sentences = [
+                " ".join(misspell(word, rng) if rng.random() < 0.5 else word for word in rng.sample(words, length))
+                for _ in range(self.sentences)
+            ]
+            
+            cold, warm = [], []
+            for sentence in sentences:
+                if cache:
+                    cache.clear()
+                start = time.perf_counter()
+                self.assistant.correct_text(sentence)
+                cold.append(time.perf_counter() - start)
+                
+                start = time.perf_counter()
+                self.assistant.correct_text(sentence)
+                warm.append(time.perf_counter() - start)
+            
+            self.metrics.update(summarize(cold, f"correct_text.words_{length}"))
+            self.metrics[f"correct_text.words_{length}.repeated_p50_seconds"] = float(np.median(warm))
+    
+    def bench_update_spectrum(self):
+        """GUI spectrum update cost per tick, including drawing on an off-screen canvas"""
+        try:
+            from gui import VoiceAssistantGUI
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+        except ImportError as e:
+            return f"GUI dependencies unavailable ({e})"
+        
+        # The spectrum view without its Tk window: same setup, plot and update code
+        view = VoiceAssistantGUI.__new__(VoiceAssistantGUI)
+        view.setup_spectrum(self.assistant.config.get('spectrum_fft_size', 512))
+        figure = Figure(figsize=(6, 2))
+        view.canvas = FigureCanvasAgg(figure)
+        view.line, = figure.add_subplot(111).plot(view.spectrum_x, np.zeros(len(view.spectrum_x)))
+        
+        clip = synthetic_clip("bursts", 2.0, self.sample_rate, self.seed)
+        windows = [clip[i:i + view.fft_size] for i in range(0, len(clip) - view.fft_size, view.fft_size)]
+        
+        latencies = []
+        for _ in range(self.repeat):
+            for pcm in windows:
+                start = time.perf_counter()
+                view.update_spectrum(pcm)
+                latencies.append(time.perf_counter() - start)
+        self.metrics.update(summarize(latencies, "update_spectrum"))
+    
+    def bench_transcribe_audio(self):
+        """Load time and transcribe_audio() real-time factor of each model on every clip"""
+        clips = [("tone", synthetic_clip("tone", 3.0, self.sample_rate, self.seed)),
+                 ("bursts", synthetic_clip("bursts", 6.0, self.sample_rate, self.seed))]
+        clips = [(name, audio.astype(np.float32) / 32768.0) for name, audio in clips] + self.fixtures
+        audio_seconds = sum(len(audio) for _, audio in clips) / self.sample_rate
+        
+        for model in self.models:
+            self.assistant.config['whisper_model'] = model
+            
+            # Checkpoint paths are named by their file name
+            model = os.path.splitext(os.path.basename(model))[0]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(None):
+                self.assistant.init_whisper()
+            if not self.assistant.whisper_model:
+                self.skipped[f"transcribe_audio.{model}"] = "model failed to load"
+                continue
+            self.metrics[f"startup.init_whisper.{model}_seconds"] = time.perf_counter() - start
+            
+            total = 0.0
+            with contextlib.redirect_stdout(None):
+                # One untimed decode so one-time setup costs don't land on the first clip
+                self.assistant.transcribe_audio(clips[0][1][:self.sample_rate])
+                
+                for name, audio in clips:
+                    latencies = []
+                    for _ in range(self.repeat):
+                        start = time.perf_counter()
+                        self.assistant.transcribe_audio(audio)
+                        latencies.append(time.perf_counter() - start)
+                    latency = float(np.median(latencies))
+                    total += latency
+                    self.metrics[f"transcribe_audio.{model}.{name}.p50_seconds"] = latency
+            self.metrics[f"transcribe_audio.{model}.real_time_factor"] = total / audio_seconds
+
+
+def load_fixtures(source, sample_rate):
+    """(name, float32 audio) of every WAV/FLAC file in a folder or manifest"""
+    fixtures = []
+    for path in iter_audio_files(source):
+        name = os.path.splitext(os.path.basename(path))[0]
+        fixtures.append((f"fixture_{name}", load_audio_file(path, sample_rate)))
+    return fixtures
+
+
+def create_assistant(config_path, scratch):
+    """VoiceAssistant for benchmarking: the given config with CONFIG_OVERRIDES, writing into `scratch`"""
+    from voice_assistant import VoiceAssistant
+    
+    config = {}
+    if os.path.exists(config_path):
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    config.update(CONFIG_OVERRIDES)
+    config["output_file"] = os.path.join(scratch, "output.txt")
+    path = os.path.join(scratch, "config.json")
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    
+    with contextlib.redirect_stdout(None):
+        return VoiceAssistant(path)
+
+
+def run_benchmarks(args):
+    """Run the suite and write the results file"""
+    with tempfile.TemporaryDirectory(prefix="voice_benchmark_") as scratch:
+        assistant = create_assistant(args.config, scratch)
+        fixtures = load_fixtures(args.fixtures, assistant.sample_rate) if args.fixtures else []
+        models = args.models.split(",") if args.models else [assistant.config.get('whisper_model', 'tiny')]
+        
+        suite = BenchmarkSuite(assistant, fixtures, models, repeat=args.repeat, sentences=args.sentences)
+        only = set(args.only.split(",")) if args.only else None
+        try:
+            metrics, skipped = suite.run(only)
+        finally:
+            assistant.stop()
+    
+    results = {
+        "suite_version": SUITE_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "settings": {
+            "models": models,
+            "repeat": args.repeat,
+            "sentences": args.sentences,
+            "fixtures": [name for name, _ in fixtures],
+            "decoding_profile": assistant.decoding_profile
+        },
+        "metrics": metrics,
+        "skipped": skipped
+    }
+    
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"{len(metrics)} metrics written to {args.output}")
+    return 0
+
+
+def compare_results(baseline, current, threshold=0.2, min_seconds=5e-6):
+    """
+    Compare two results files; returns a list of (metric, old, new, change, regressed)
+    
+    Every metric is a cost (seconds, bytes or real-time factor), so a metric
+    regressed when it grew by more than `threshold` (a fraction) of its
+    baseline value. Times must also have grown by at least `min_seconds`, so
+    timer jitter on microsecond measurements isn't reported.
+    """
+    rows = []
+    for name in sorted(set(baseline["metrics"]) & set(current["metrics"])):
+        old, new = baseline["metrics"][name], current["metrics"][name]
+        change = (new - old) / old if old else 0.0
+        regressed = change > threshold and (not name.endswith("_seconds") or new - old >= min_seconds)
+        rows.append((name, old, new, change, regressed))
+    return rows
+
+
+def run_compare(args):
+    """Print a comparison of two results files; exits 1 if anything regressed"""
+    runs = []
+    for path in args.compare:
+        with open(path, 'r', encoding='utf-8') as f:
+            runs.append(json.load(f))
+    baseline, current = runs
+    
+    if baseline.get("suite_version") != current.get("suite_version"):
+        print(f"Results come from different suite versions "
+              f"({baseline.get('suite_version')} and {current.get('suite_version')}), not comparing")
+        return 2
+    for key in ("platform", "cpu_count", "python", "torch"):
+        if baseline["environment"].get(key) != current["environment"].get(key):
+            print(f"Note: {key} differs ({baseline['environment'].get(key)} -> {current['environment'].get(key)})")
+    
+    rows = compare_results(baseline, current, args.threshold, args.min_seconds)
+    print(f"{'Metric':<56}{'Baseline':>12}{'Current':>12}{'Change':>9}")
+    for name, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<56}{old:>12.4g}{new:>12.4g}{change:>+9.1%}{flag}")
+    
+    for name in sorted(set(baseline["metrics"]) ^ set(current["metrics"])):
+        print(f"{name:<56} only in {'baseline' if name in baseline['metrics'] else 'current'}")
+    
+    regressions = [row for row in rows if row[4]]
+    print(f"\n{len(regressions)} of {len(rows)} metrics regressed by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    """Run the benchmark suite, or compare two of its results files"""
+    parser = argparse.ArgumentParser(description="Benchmark the voice assistant's hot paths offline")
+    parser.add_argument('--config', default='config.json', help="Configuration to benchmark (default config.json)")
+    parser.add_argument('--fixtures', help="Folder or manifest of recorded WAV/FLAC files to transcribe")
+    parser.add_argument('--models', help="Comma-separated Whisper models (default: the configured one)")
+    parser.add_argument('--only', help="Comma-separated benchmarks: startup, detect_wake_word, record_audio, "
+                                       "correct_text, update_spectrum, transcribe_audio")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions of each measurement (default 3)")
+    parser.add_argument('--sentences', type=int, default=20, help="Sentences per correction length (default 20)")
+    parser.add_argument('--output', default='benchmark_results.json', help="Results file to write")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="Compare two results files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative increase counted as a regression (default 0.2)")
+    parser.add_argument('--min-seconds', type=float, default=5e-6,
+                        help="Smallest increase of a time counted as a regression (default 5e-6)")
+    args = parser.parse_args(argv)
+    
+    if args.compare:
+        return run_compare(args)
+    return run_benchmarks(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
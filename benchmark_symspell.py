@@ -0,0 +1,172 @@
+"""
+Benchmark SymSpell compound correction latency and memory across dictionary sizes
+Each index is built from the most frequent words of the general dictionary,
+optionally with a domain lexicon layered over it, and loaded in a fresh
+process in both SymSpell's list layout and the compact tuple layout
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+from metrics import process_rss_bytes
+from text_correction import DomainLexicon, compact_symspell
+
+
+def write_dictionary(source, size, path):
+    """Write the `size` most frequent entries of a frequency dictionary to `path`"""
+    entries = []
+    with open(source, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2:
+                entries.append((int(parts[1]), parts[0]))
+    entries.sort(reverse=True)
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        for count, term in entries[:size]:
+            f.write(f"{term} {count}\n")
+    return min(size, len(entries))
+
+
+def build_index(dictionary_path, pickle_path, compact, max_edit_distance, prefix_length):
+    """Build an index and pickle it; run in a child process so the parent stays small"""
+    from symspellpy import SymSpell
+    
+    sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance, prefix_length=prefix_length)
+    sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
+    if compact:
+        compact_symspell(sym_spell)
+    sym_spell.save_pickle(pickle_path, compressed=False)
+
+
+def misspell(word, rng):
+    """A word with one random deletion, substitution or transposition"""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(len(word) - 1)
+    edit = rng.choice(("delete", "substitute", "transpose"))
+    if edit == "delete":
+        return word[:i] + word[i + 1:]
+    if edit == "substitute":
+        return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def sample_phrases(dictionary_path, lexicon_path, count, seed=0):
+    """Short commands of common words and lexicon terms, with about half the longer words misspelled"""
+    rng = random.Random(seed)
+    with open(dictionary_path, 'r', encoding='utf-8') as f:
+        words = [line.split()[0] for line in f if line.strip()][:5000]
+    
+    terms = []
+    if lexicon_path:
+        with open(lexicon_path, 'r', encoding='utf-8') as f:
+            terms = [line.split()[0].lower() for line in f if line.strip() and not line.startswith('#')]
+    
+    phrases = []
+    for _ in range(count):
+        phrase = rng.sample(words, rng.randint(2, 4))
+        if terms:
+            phrase.insert(rng.randrange(len(phrase) + 1), rng.choice(terms))
+        phrases.append(" ".join(misspell(word, rng) if rng.random() < 0.5 else word for word in phrase))
+    return phrases
+
+
+def measure(pickle_path, lexicon_path, boost, phrases, max_edit_distance):
+    """Load an index in this (fresh) process and time compound correction of every phrase"""
+    from symspellpy import SymSpell
+    
+    rss_before = process_rss_bytes()
+    start = time.perf_counter()
+    sym_spell = SymSpell(max_dictionary_edit_distance=max_edit_distance)
+    sym_spell.load_pickle(pickle_path, compressed=False)
+    load_seconds = time.perf_counter() - start
+    rss_after = process_rss_bytes()
+    
+    if lexicon_path:
+        DomainLexicon(sym_spell, lexicon_path, boost).reload()
+    
+    for phrase in phrases[:10]:
+        sym_spell.lookup_compound(phrase, max_edit_distance)
+    
+    latencies = []
+    for phrase in phrases:
+        start = time.perf_counter()
+        sym_spell.lookup_compound(phrase, max_edit_distance)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    
+    return {
+        "load_seconds": load_seconds,
+        "index_rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "mean_latency": sum(latencies) / len(latencies),
+        "p50_latency": latencies[len(latencies) // 2],
+        "p95_latency": latencies[int(len(latencies) * 0.95)]
+    }
+
+
+def run_isolated(pool_context, func, *args):
+    """Run func(*args) in a new process and return its result"""
+    with pool_context.Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def main(argv=None):
+    """Benchmark every dictionary size in both layouts and print a table"""
+    parser = argparse.ArgumentParser(description="Benchmark SymSpell lookup latency and memory")
+    parser.add_argument('--dictionary', default="frequency_dictionary_en_82_765.txt",
+                        help="General frequency dictionary (default: frequency_dictionary_en_82_765.txt)")
+    parser.add_argument('--sizes', default="5000,20000,82765",
+                        help="Comma-separated numbers of most frequent words to index")
+    parser.add_argument('--lexicon', help="Domain lexicon to layer over each index")
+    parser.add_argument('--lexicon-boost', type=float, default=2.0, help="Domain lexicon count multiplier")
+    parser.add_argument('--phrases', type=int, default=200, help="Number of test phrases (default 200)")
+    parser.add_argument('--edit-distance', type=int, default=2, help="Max edit distance (default 2)")
+    parser.add_argument('--prefix-length', type=int, default=7, help="SymSpell prefix length (default 7)")
+    parser.add_argument('--report', help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.dictionary):
+        print(f"Dictionary {args.dictionary} not found; run setup_symspell.py first")
+        return 1
+    
+    # Every build and measurement gets a fresh interpreter, so RSS deltas are not skewed by earlier runs
+    context = multiprocessing.get_context("spawn")
+    phrases = sample_phrases(args.dictionary, args.lexicon, args.phrases)
+    results = []
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in (int(size) for size in args.sizes.split(",")):
+            dictionary_path = os.path.join(temp_dir, f"dictionary_{size}.txt")
+            size = write_dictionary(args.dictionary, size, dictionary_path)
+            
+            for layout in ("list", "compact"):
+                pickle_path = os.path.join(temp_dir, f"index_{size}_{layout}.pickle")
+                run_isolated(context, build_index, dictionary_path, pickle_path, layout == "compact",
+                             args.edit_distance, args.prefix_length)
+                
+                result = run_isolated(context, measure, pickle_path, args.lexicon, args.lexicon_boost,
+                                      phrases, args.edit_distance)
+                result.update({"words": size, "layout": layout, "pickle_bytes": os.path.getsize(pickle_path)})
+                results.append(result)
+                
+                rss = result["index_rss_bytes"]
+                print(f"{size:>7} words {layout:<8} load {result['load_seconds']:6.2f}s  "
+                      f"RSS {'n/a' if rss is None else f'{rss / 1e6:7.1f} MB'}  "
+                      f"lookup mean {result['mean_latency'] * 1e3:6.2f} ms  "
+                      f"p95 {result['p95_latency'] * 1e3:6.2f} ms")
+    
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Benchmark per-frame CPU time of wake word frame handling
+Compares the old path (bytes -> struct.unpack -> tuple of ints) with the
+preallocated zero-copy buffer over a long replay of audio. Without a
+Porcupine access key both paths run against a stub engine, so only the
+frame handling around inference is measured
+"""
+
+import os
+import sys
+import time
+import ctypes
+import struct
+import argparse
+
+from audio_capture import AudioRingBuffer, SyntheticSource, WavFileSource
+from wake_word import PorcupineFrameProcessor
+
+
+FRAME_LENGTH = 512
+SAMPLE_RATE = 16000
+
+
+class StubPorcupine:
+    """
+    Stand-in for Porcupine with the same per-frame Python work and a trivial native call
+    
+    process() mirrors pvporcupine's: it checks the length, copies the
+    samples into a new ctypes array and calls the native function. The
+    native function is a memmove of the frame, which both paths pay alike.
+    """
+    
+    frame_length = FRAME_LENGTH
+    
+    class PicovoiceStatuses:
+        SUCCESS = 0
+    
+    def __init__(self):
+        self._handle = None
+        self._scratch = (ctypes.c_short * FRAME_LENGTH)()
+    
+    def _process_func(self, handle, pcm, result):
+        ctypes.memmove(self._scratch, pcm, FRAME_LENGTH * ctypes.sizeof(ctypes.c_short))
+        return self.PicovoiceStatuses.SUCCESS
+    
+    def process(self, pcm):
+        if len(pcm) != self.frame_length:
+            raise ValueError(f"Invalid frame length, expected {self.frame_length} but received {len(pcm)}")
+        result = ctypes.c_int()
+        self._process_func(self._handle, (ctypes.c_short * len(pcm))(*pcm), ctypes.byref(result))
+        return result.value
+    
+    def delete(self):
+        pass
+
+
+def create_porcupine():
+    """Real Porcupine engine if pvporcupine and an access key are available, else None"""
+    access_key = os.environ.get('PORCUPINE_ACCESS_KEY')
+    if not access_key:
+        return None
+    try:
+        import pvporcupine
+        return pvporcupine.create(access_key=access_key, keywords=['porcupine'])
+    except Exception as e:
+        print(f"Porcupine unavailable, measuring frame preparation only: {e}")
+        return None
+
+
+def replay(source, ring, handle_frame, out=None):
+    """
+    Read every frame of `source` from a ring buffer and pass it to `handle_frame`
+    
+    Returns (frames, cpu seconds). CPU time covers the ring buffer read and
+    the frame handling on this thread only, not the producer thread.
+    """
+    reader = ring.reader()
+    source.start(ring)
+    
+    frames = 0
+    start = time.thread_time()
+    while True:
+        frame = reader.read(FRAME_LENGTH, out=out, timeout=0.5)
+        if frame is None:
+            if source.finished.is_set():
+                break
+            continue
+        handle_frame(frame)
+        frames += 1
+    cpu = time.thread_time() - start
+    
+    source.stop()
+    return frames, cpu
+
+
+def make_source(args):
+    """Audio source for one replay pass"""
+    if args.wav:
+        return WavFileSource(args.wav, SAMPLE_RATE, FRAME_LENGTH, realtime=False)
+    return SyntheticSource(SAMPLE_RATE, FRAME_LENGTH, signal="noise", duration=args.duration, noise_level=0.05)
+
+
+def main(argv=None):
+    """Run both frame handling paths over the same audio and print per-frame costs"""
+    parser = argparse.ArgumentParser(description="Benchmark wake word frame handling")
+    parser.add_argument('--wav', help="16 kHz WAV file to replay (default: synthetic noise)")
+    parser.add_argument('--duration', type=float, default=600.0,
+                        help="Seconds of synthetic audio to replay (default 600)")
+    args = parser.parse_args(argv)
+    
+    porcupine = create_porcupine()
+    real = porcupine is not None
+    if not real:
+        porcupine = StubPorcupine()
+    fmt = "h" * FRAME_LENGTH
+    
+    # What the monitoring loop did before: copy the frame to bytes, unpack it, process() the tuple
+    def old_path(frame):
+        audio_data = frame.tobytes()
+        pcm = struct.unpack_from(fmt, audio_data)
+        porcupine.process(pcm)
+    
+    processor = PorcupineFrameProcessor(porcupine)
+    new_path = lambda frame: processor.process()
+    
+    if real:
+        print("Replaying through Porcupine...")
+    else:
+        print("No PORCUPINE_ACCESS_KEY: replaying through a stub engine; "
+              "Porcupine inference is NOT measured, only the frame handling around it")
+    results = {}
+    for name, handle_frame, out in (("struct.unpack", old_path, None), ("zero-copy", new_path, processor.frame)):
+        ring = AudioRingBuffer(SAMPLE_RATE * 4)
+        frames, cpu = replay(make_source(args), ring, handle_frame, out)
+        results[name] = cpu / frames if frames else 0.0
+        print(f"{name:<14} {frames} frames ({frames * FRAME_LENGTH / SAMPLE_RATE:.0f}s of audio): "
+              f"{results[name] * 1e6:8.2f} us CPU/frame")
+    
+    porcupine.delete()
+    
+    if results["zero-copy"] > 0:
+        scope = "per frame" if real else "per frame, excluding inference"
+        print(f"Speedup: {results['struct.unpack'] / results['zero-copy']:.1f}x {scope}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
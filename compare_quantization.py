@@ -0,0 +1,149 @@
+"""
+Compare float32 and int8 quantized Whisper on a fixed set of audio files
+Reports load time, model size, per-file latency, real-time factor and word
+error rate against reference transcripts and between the two models
+"""
+
+import os
+import io
+import re
+import sys
+import json
+import time
+import argparse
+
+from batch_transcribe import iter_audio_files, load_audio_file
+from transcription import TRANSCRIBE_OPTIONS, WHISPER_SAMPLE_RATE, load_whisper_model
+
+
+def normalize_words(text):
+    """Lowercase words without punctuation, for word error rate"""
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def load_reference(audio_path):
+    """Reference transcript stored next to the audio file as .txt, or None"""
+    path = os.path.splitext(audio_path)[0] + ".txt"
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def model_size_bytes(model):
+    """Serialized size of the model weights"""
+    import torch
+    
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def run_mode(model_name, quantize, cache_dir, clips):
+    """Load one model variant and transcribe every clip; returns a result dict"""
+    import torch
+    
+    model, source, load_seconds = load_whisper_model(model_name, quantize, cache_dir)
+    options = dict(TRANSCRIBE_OPTIONS, temperature=0.0)
+    
+    # Warm-up so the first file doesn't pay one-time setup costs
+    model.transcribe(clips[0][1][:WHISPER_SAMPLE_RATE], **options)
+    
+    texts = {}
+    latencies = []
+    audio_seconds = 0.0
+    with torch.inference_mode():
+        for path, audio in clips:
+            start = time.perf_counter()
+            texts[path] = model.transcribe(audio, **options)['text'].strip()
+            latencies.append(time.perf_counter() - start)
+            audio_seconds += len(audio) / WHISPER_SAMPLE_RATE
+    
+    latencies.sort()
+    return {
+        "load_source": source,
+        "load_seconds": load_seconds,
+        "model_bytes": model_size_bytes(model),
+        "mean_latency": sum(latencies) / len(latencies),
+        "p50_latency": latencies[len(latencies) // 2],
+        "max_latency": latencies[-1],
+        "real_time_factor": sum(latencies) / audio_seconds if audio_seconds else 0.0,
+        "texts": texts
+    }
+
+
+def main(argv=None):
+    """Run the comparison and print a summary"""
+    parser = argparse.ArgumentParser(description="Compare float32 and int8 Whisper accuracy and latency")
+    parser.add_argument('source', help="Folder or manifest of WAV/FLAC files; references are <name>.txt")
+    parser.add_argument('--model', default='tiny', help="Whisper model name or checkpoint path")
+    parser.add_argument('--cache-dir', default='cache', help="Quantized model cache folder")
+    parser.add_argument('--report', help="Write the full results, including transcripts, as JSON")
+    args = parser.parse_args(argv)
+    
+    clips = [(path, load_audio_file(path, WHISPER_SAMPLE_RATE)) for path in iter_audio_files(args.source)]
+    if not clips:
+        print(f"No audio files found in {args.source}")
+        return 1
+    
+    references = {path: load_reference(path) for path, _ in clips}
+    results = {}
+    for mode, quantize in (("float32", False), ("int8", True)):
+        print(f"Transcribing {len(clips)} files with the {mode} model...")
+        results[mode] = run_mode(args.model, quantize, args.cache_dir, clips)
+        
+        scored = [path for path, reference in references.items() if reference is not None]
+        if scored:
+            results[mode]["wer"] = sum(
+                word_error_rate(references[path], results[mode]["texts"][path]) for path in scored
+            ) / len(scored)
+    
+    results["int8_vs_float32_wer"] = sum(
+        word_error_rate(results["float32"]["texts"][path], results["int8"]["texts"][path]) for path, _ in clips
+    ) / len(clips)
+    
+    print("=" * 60)
+    print(f"{'':<22}{'float32':>16}{'int8':>16}")
+    rows = [
+        ("Load time (s)", "load_seconds", "{:.2f}"),
+        ("Model size (MB)", "model_bytes", "{:.1f}"),
+        ("Mean latency (s)", "mean_latency", "{:.3f}"),
+        ("p50 latency (s)", "p50_latency", "{:.3f}"),
+        ("Max latency (s)", "max_latency", "{:.3f}"),
+        ("Real-time factor", "real_time_factor", "{:.3f}"),
+        ("WER vs reference", "wer", "{:.3f}")
+    ]
+    for label, key, fmt in rows:
+        values = []
+        for mode in ("float32", "int8"):
+            value = results[mode].get(key)
+            if key == "model_bytes":
+                value = value / 1e6
+            values.append("n/a" if value is None else fmt.format(value))
+        print(f"{label:<22}{values[0]:>16}{values[1]:>16}")
+    print(f"int8 load source: {results['int8']['load_source']}")
+    print(f"WER of int8 against float32 output: {results['int8_vs_float32_wer']:.3f}")
+    
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
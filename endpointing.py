@@ -0,0 +1,104 @@
+"""
+Energy based voice activity endpointing for command recording
+Stops recording shortly after speech ends and trims surrounding silence
+"""
+
+import numpy as np
+
+
+class EnergyEndpointer:
+    """Frame by frame endpointer with an adaptive noise floor and hangover"""
+    
+    def __init__(self, sample_rate, threshold_db=10.0, min_energy_db=-50.0,
+                 hangover=0.8, min_duration=1.0, max_duration=5.0,
+                 no_speech_timeout=3.0, padding=0.2, noise_adaptation=0.05):
+        """
+        Configure the endpointer
+        
+        A frame counts as speech when its energy is `threshold_db` above the
+        tracked noise floor and above `min_energy_db` (dBFS). Recording ends
+        after `hangover` seconds of silence following speech, but never before
+        `min_duration` and never after `max_duration` seconds. All durations
+        are in seconds.
+        """
+        self.sample_rate = sample_rate
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.hangover_samples = int(hangover * sample_rate)
+        self.min_samples = int(min_duration * sample_rate)
+        self.max_samples = int(max_duration * sample_rate)
+        self.no_speech_samples = int(no_speech_timeout * sample_rate)
+        self.padding_samples = int(padding * sample_rate)
+        self.noise_adaptation = noise_adaptation
+        
+        # The noise floor persists across utterances so it is already
+        # settled when the next command starts
+        self.noise_floor_db = min_energy_db - threshold_db
+        self.reset()
+    
+    @staticmethod
+    def frame_energy_db(frame):
+        """RMS level of an int16 frame in dBFS"""
+        if len(frame) == 0:
+            return -120.0
+        x = frame.astype(np.float32)
+        rms = np.sqrt(np.dot(x, x) / len(x)) / 32768.0
+        return 20.0 * np.log10(rms + 1e-10)
+    
+    def update_noise_floor(self, energy_db):
+        """Follow drops in level immediately and rises slowly"""
+        if energy_db < self.noise_floor_db:
+            self.noise_floor_db = energy_db
+        else:
+            self.noise_floor_db += self.noise_adaptation * (energy_db - self.noise_floor_db)
+    
+    def is_speech(self, energy_db):
+        """Whether a frame at this level counts as speech"""
+        return energy_db > max(self.noise_floor_db + self.threshold_db, self.min_energy_db)
+    
+    def observe(self, frame):
+        """Track background level between commands without endpointing"""
+        energy_db = self.frame_energy_db(frame)
+        if not self.is_speech(energy_db):
+            self.update_noise_floor(energy_db)
+    
+    def reset(self):
+        """Start a new utterance"""
+        self.samples_seen = 0
+        self.speech_start = None
+        self.speech_end = None
+        self.done = False
+    
+    def process(self, frame):
+        """Feed the next frame of the utterance; returns True once the endpoint is reached"""
+        if self.done:
+            return True
+        
+        energy_db = self.frame_energy_db(frame)
+        frame_start = self.samples_seen
+        self.samples_seen += len(frame)
+        
+        if self.is_speech(energy_db):
+            if self.speech_start is None:
+                self.speech_start = frame_start
+            self.speech_end = self.samples_seen
+        else:
+            self.update_noise_floor(energy_db)
+        
+        if self.samples_seen >= self.max_samples:
+            self.done = True
+        elif self.speech_start is None:
+            self.done = self.samples_seen >= self.no_speech_samples
+        elif self.samples_seen >= self.min_samples:
+            self.done = self.samples_seen - self.speech_end >= self.hangover_samples
+        
+        return self.done
+    
+    def speech_bounds(self):
+        """(start, end) sample offsets of the padded speech region, or None if no speech"""
+        if self.speech_start is None:
+            return None
+        
+        start = max(0, self.speech_start - self.padding_samples)
+        end = min(self.samples_seen, self.speech_end + self.padding_samples)
+        return start, end
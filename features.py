@@ -0,0 +1,123 @@
+"""
+Incremental Whisper log-mel features
+Spectrogram frames are computed while a command is recorded, so the model
+can decode it without padding the audio to 30 seconds and recomputing the
+whole spectrogram afterwards
+"""
+
+import time
+
+import numpy as np
+
+
+# Whisper's STFT parameters and single-window length in frames
+N_FFT = 400
+HOP_LENGTH = 160
+N_FRAMES = 3000
+
+# log10 of whisper's power floor, the value of frames that are all silence
+SILENCE_LOG_POWER = -10.0
+
+
+def hann_window(length):
+    """Periodic Hann window, as torch.hann_window uses for the STFT"""
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)).astype(np.float32)
+
+
+class IncrementalLogMel:
+    """Log-mel frames of a float32 recording buffer, computed as the buffer fills"""
+    
+    def __init__(self, samples, filters, n_frames=N_FRAMES):
+        """
+        Track `samples`, the buffer a recording is written into from the start
+        
+        `filters` is whisper's (n_mels, 201) mel filterbank. Frames are
+        produced for the first `n_frames` frames of the final clip, which is
+        what whisper decodes from a single 30 second window.
+        """
+        self.samples = samples
+        self.filters = np.asarray(filters, dtype=np.float32)
+        self.n_mels = len(self.filters)
+        self.n_frames = n_frames
+        self.window = hann_window(N_FFT)
+        
+        # Frame j is centred on sample j * HOP_LENGTH of the buffer; log10 power, not yet normalized
+        self.log_power = np.empty((self.n_mels, len(samples) // HOP_LENGTH + 1), dtype=np.float32)
+        self.features = np.empty((self.n_mels, n_frames), dtype=np.float32)
+        self.next_frame = 2
+        self.seconds = 0.0
+    
+    @property
+    def nbytes(self):
+        """Memory held by the feature buffers"""
+        return self.log_power.nbytes + self.features.nbytes
+    
+    def log_mel(self, windows):
+        """log10 mel power of a (frames, N_FFT) array of audio windows"""
+        spectrum = np.fft.rfft(windows * self.window, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        return np.log10(np.maximum(self.filters @ power.T.astype(np.float32), 1e-10))
+    
+    def update(self, filled):
+        """Compute every frame whose window lies within samples[:filled]"""
+        start = time.perf_counter()
+        last = (filled - N_FFT // 2) // HOP_LENGTH
+        last = min(last, self.log_power.shape[1] - 1)
+        if last >= self.next_frame:
+            first = self.next_frame
+            windows = np.lib.stride_tricks.sliding_window_view(
+                self.samples[first * HOP_LENGTH - N_FFT // 2:last * HOP_LENGTH + N_FFT // 2], N_FFT
+            )[::HOP_LENGTH]
+            self.log_power[:, first:last + 1] = self.log_mel(windows)
+            self.next_frame = last + 1
+        self.seconds += time.perf_counter() - start
+    
+    def finalize(self, start, end):
+        """
+        Normalized log-mel features of samples[start:end] for whisper.decode()
+        
+        Returns an (n_mels, n_frames) array equal to the window transcribe()
+        decodes: the clip's frames, normalized together with 30 seconds of
+        padding, then zeros up to n_frames. `start` is rounded down to a frame
+        boundary so earlier frames can be reused; the extra samples are
+        silence trimmed by the endpointer.
+        """
+        self.update(end)
+        timer = time.perf_counter()
+        
+        offset = start // HOP_LENGTH
+        clip = self.samples[offset * HOP_LENGTH:end]
+        length = len(clip)
+        features = self.features
+        
+        # Frames whose window ends inside the clip were already computed
+        inside = min(max((length - N_FFT // 2) // HOP_LENGTH + 1, 2), self.n_frames)
+        features[:, 2:inside] = self.log_power[:, offset + 2:offset + inside]
+        
+        # The first two frames use reflect padding at the start of the clip
+        head = np.zeros(N_FFT + 1, dtype=np.float32)
+        head[:min(length, len(head))] = clip[:len(head)]
+        head = np.concatenate([head[1:N_FFT // 2 + 1][::-1], head[:N_FFT]])
+        features[:, :2] = self.log_mel(np.stack([head[:N_FFT], head[HOP_LENGTH:HOP_LENGTH + N_FFT]]))
+        
+        # Frames overlapping the end see zeros after it, and later frames are silence
+        tail_end = min((length + N_FFT // 2 - 1) // HOP_LENGTH + 1, self.n_frames)
+        if tail_end > inside:
+            tail_start = inside * HOP_LENGTH - N_FFT // 2
+            tail = np.zeros((tail_end - 1) * HOP_LENGTH + N_FFT // 2 - tail_start, dtype=np.float32)
+            remaining = clip[tail_start:tail_start + len(tail)]
+            tail[:len(remaining)] = remaining
+            windows = np.lib.stride_tricks.sliding_window_view(tail, N_FFT)[::HOP_LENGTH]
+            features[:, inside:tail_end] = self.log_mel(windows)
+        features[:, max(tail_end, 2):] = SILENCE_LOG_POWER
+        
+        # Whisper's dynamic range clamp and scaling
+        np.maximum(features, features.max() - 8.0, out=features)
+        features += 4.0
+        features /= 4.0
+        
+        # transcribe() pads the clip's content frames with zeros, not with silent audio
+        features[:, length // HOP_LENGTH:] = 0.0
+        
+        self.seconds += time.perf_counter() - timer
+        return features
@@ -0,0 +1,212 @@
+"""
+Tkinter GUI for the voice assistant
+Shows the live audio spectrum and transcriptions; only imported when a GUI is wanted
+"""
+
+import queue
+
+import numpy as np
+
+import tkinter as tk
+from tkinter import ttk, scrolledtext
+import matplotlib
+matplotlib.use('TkAgg')
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+
+class VoiceAssistantGUI:
+    """GUI for the voice assistant with audio spectrum visualization"""
+    
+    def __init__(self, root, assistant):
+        """Initialize the GUI around a VoiceAssistant engine"""
+        self.root = root
+        self.root.title("Voice Assistant - Say 'porcupine' to activate")
+        self.root.geometry("700x500")
+        self.root.resizable(True, True)
+        
+        # Voice assistant engine
+        self.assistant = assistant
+        self.update_interval = assistant.config.get('spectrum_update_interval', 50)
+        
+        # Setup GUI
+        self.setup_gui()
+        self.setup_spectrum(assistant.config.get('spectrum_fft_size', 512))
+        
+        # Start assistant
+        self.assistant.start()
+        
+        # Start GUI update loop
+        self.update_gui()
+        
+        # Handle window close
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+    
+    def setup_gui(self):
+        """Setup GUI components"""
+        # Main container
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure grid weights
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(1, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+        
+        # Status label
+        self.status_label = ttk.Label(
+            main_frame, 
+            text="Status: Listening for wake word...",
+            font=('Segoe UI', 10, 'bold')
+        )
+        self.status_label.grid(row=0, column=0, pady=5, sticky=tk.W)
+        
+        # Audio spectrum visualization
+        spectrum_frame = ttk.LabelFrame(main_frame, text="Audio Spectrum", padding="5")
+        spectrum_frame.grid(row=1, column=0, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
+        spectrum_frame.columnconfigure(0, weight=1)
+        spectrum_frame.rowconfigure(0, weight=1)
+        
+        self.figure = Figure(figsize=(6, 2), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_ylim([0, 1])
+        self.ax.set_xlim([0, 100])
+        self.ax.set_xlabel('Frequency Bins')
+        self.ax.set_ylabel('Amplitude')
+        self.ax.grid(True, alpha=0.3)
+        
+        self.canvas = FigureCanvasTkAgg(self.figure, spectrum_frame)
+        self.canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        self.line, = self.ax.plot([], [], 'b-', linewidth=1)
+        
+        # Output text area
+        output_frame = ttk.LabelFrame(main_frame, text="Transcriptions", padding="5")
+        output_frame.grid(row=2, column=0, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
+        output_frame.columnconfigure(0, weight=1)
+        output_frame.rowconfigure(0, weight=1)
+        
+        self.output_text = scrolledtext.ScrolledText(
+            output_frame,
+            wrap=tk.WORD,
+            width=70,
+            height=10,
+            font=('Segoe UI', 9)
+        )
+        self.output_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Control buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=3, column=0, pady=5)
+        
+        self.clear_button = ttk.Button(
+            button_frame,
+            text="Clear Output",
+            command=self.clear_output
+        )
+        self.clear_button.grid(row=0, column=0, padx=5)
+        
+        self.quit_button = ttk.Button(
+            button_frame,
+            text="Quit",
+            command=self.on_closing
+        )
+        self.quit_button.grid(row=0, column=1, padx=5)
+        
+        # Decoding profile for the next commands
+        ttk.Label(button_frame, text="Profile:").grid(row=0, column=2, padx=(15, 5))
+        self.profile_var = tk.StringVar(value=self.assistant.decoding_profile)
+        self.profile_box = ttk.Combobox(
+            button_frame,
+            textvariable=self.profile_var,
+            values=list(self.assistant.profile_options),
+            state="readonly",
+            width=10
+        )
+        self.profile_box.grid(row=0, column=3, padx=5)
+        self.profile_box.bind("<<ComboboxSelected>>", self.change_profile)
+        
+    def setup_spectrum(self, fft_size, display_bins=100):
+        """Precompute the FFT window and display interpolation for the spectrum"""
+        self.fft_size = fft_size
+        self.pcm_buffer = np.zeros(fft_size, dtype=np.int16)
+        
+        # Hann window with the int16 -> [-1, 1] scaling folded in
+        self.fft_window = (np.hanning(fft_size) / 32768.0).astype(np.float32)
+        
+        # Linear interpolation from FFT bins to display bins as fixed index pairs
+        num_bins = fft_size // 2 + 1
+        if num_bins > display_bins:
+            positions = np.linspace(0, num_bins - 1, display_bins)
+        else:
+            positions = np.arange(num_bins, dtype=np.float64)
+        self.interp_low = np.floor(positions).astype(np.intp)
+        self.interp_high = np.minimum(self.interp_low + 1, num_bins - 1)
+        self.interp_weight = (positions - self.interp_low).astype(np.float32)
+        self.spectrum_x = np.arange(len(positions))
+        
+        self.last_spectrum_position = -1
+    
+    def update_spectrum(self, pcm):
+        """Update audio spectrum visualization from an int16 window of samples"""
+        try:
+            # Compute FFT
+            spectrum = np.abs(np.fft.rfft(pcm * self.fft_window))
+            
+            # Normalize and downsample for display
+            spectrum /= spectrum.max() + 1e-10
+            low = spectrum[self.interp_low]
+            display = low + (spectrum[self.interp_high] - low) * self.interp_weight
+            
+            # Update plot
+            self.line.set_data(self.spectrum_x, display)
+            self.canvas.draw_idle()
+        except Exception as e:
+            pass  # Silently ignore visualization errors
+    
+    def update_gui(self):
+        """Update GUI with new data from queues"""
+        # Update audio spectrum once per tick from the most recent captured audio
+        ring = self.assistant.ring_buffer
+        position = ring.write_position
+        if position != self.last_spectrum_position and position >= self.fft_size:
+            self.last_spectrum_position = position
+            self.update_spectrum(ring.latest(self.fft_size, out=self.pcm_buffer))
+        
+        # Update status and results
+        try:
+            while not self.assistant.result_queue.empty():
+                msg_type, msg = self.assistant.result_queue.get_nowait()
+                
+                if msg_type == "status":
+                    self.status_label.config(text=f"Status: {msg}")
+                elif msg_type == "partial":
+                    self.status_label.config(text=f"Hearing: {msg}")
+                elif msg_type == "wake_word":
+                    self.output_text.insert(tk.END, f"\n=== {msg} ===\n")
+                    self.output_text.see(tk.END)
+                elif msg_type == "transcription":
+                    self.output_text.insert(tk.END, f"{msg}\n")
+                    self.output_text.see(tk.END)
+        except queue.Empty:
+            pass
+        
+        # Schedule next update
+        self.root.after(self.update_interval, self.update_gui)
+    
+    def change_profile(self, event=None):
+        """Switch the assistant's decoding profile to the selected one"""
+        self.assistant.set_decoding_profile(self.profile_var.get())
+        self.status_label.config(text=f"Decoding profile: {self.profile_var.get()}")
+    
+    def clear_output(self):
+        """Clear the output text area"""
+        self.output_text.delete(1.0, tk.END)
+    
+    def on_closing(self):
+        """Handle window closing"""
+        print("Shutting down...")
+        self.assistant.stop()
+        self.root.destroy()
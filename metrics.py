@@ -0,0 +1,349 @@
+"""
+Latency instrumentation for the command path
+Per-stage durations go into rolling log-linear (HDR-style) histograms that
+report percentiles over the last minute, plus lifetime counters. Snapshots
+can be dumped to JSON or served in Prometheus text format over HTTP
+"""
+
+import os
+import sys
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Linear sub-buckets per power of two; values are kept within 1/16 (~6%)
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Enough buckets for durations up to about 2^40 microseconds
+NUM_BUCKETS = 42 * SUB_BUCKETS
+
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(value):
+    """Log-linear bucket for a non-negative integer value"""
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_value(index):
+    """Representative (midpoint) value of a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    low = (index - shift * SUB_BUCKETS) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """Rolling histogram of durations in seconds, recorded with microsecond resolution"""
+    
+    def __init__(self, window=60.0, slices=6):
+        """Percentiles cover the last `window` seconds, expired `window / slices` at a time"""
+        self.slice_seconds = window / slices
+        self.slices = [[None, [0] * NUM_BUCKETS] for _ in range(slices)]
+        self.lock = threading.Lock()
+        
+        # Lifetime totals
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds):
+        """Add one duration"""
+        index = min(bucket_index(max(0, int(seconds * 1e6))), NUM_BUCKETS - 1)
+        epoch = int(time.monotonic() / self.slice_seconds)
+        
+        with self.lock:
+            current = self.slices[epoch % len(self.slices)]
+            if current[0] != epoch:
+                current[0] = epoch
+                current[1] = [0] * NUM_BUCKETS
+            current[1][index] += 1
+            
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+    
+    def percentiles(self, percentiles=REPORTED_PERCENTILES):
+        """Recent percentiles in seconds, plus the recent sample count"""
+        oldest = int(time.monotonic() / self.slice_seconds) - len(self.slices) + 1
+        
+        counts = [0] * NUM_BUCKETS
+        with self.lock:
+            for epoch, slice_counts in self.slices:
+                if epoch is not None and epoch >= oldest:
+                    counts = [a + b for a, b in zip(counts, slice_counts)]
+        
+        recent = sum(counts)
+        result = {f"p{p}": None for p in percentiles}
+        if recent:
+            targets = sorted((max(1, -(-recent * p // 100)), f"p{p}") for p in percentiles)
+            seen = 0
+            for index, count in enumerate(counts):
+                seen += count
+                while targets and seen >= targets[0][0]:
+                    result[targets.pop(0)[1]] = bucket_value(index) / 1e6
+                if not targets:
+                    break
+        
+        result["recent_count"] = recent
+        return result
+    
+    def snapshot(self):
+        """Lifetime count, sum, mean and max plus recent percentiles"""
+        stats = {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max if self.count else None
+        }
+        stats.update(self.percentiles())
+        return stats
+
+
+class LatencyMetrics:
+    """Named latency histograms and event counters"""
+    
+    def __init__(self, window=60.0):
+        """Histograms are created on first use and keep `window` seconds of percentiles"""
+        self.window = window
+        self.histograms = {}
+        self.counters = {}
+        self.events = {}
+        self.lock = threading.Lock()
+    
+    def record(self, stage, seconds):
+        """Record a duration for a stage"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram(self.window))
+        histogram.record(seconds)
+    
+    @contextmanager
+    def time(self, stage):
+        """Context manager recording the duration of its block for a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+    
+    def increment(self, counter, amount=1):
+        """Increase an event counter"""
+        now = time.monotonic()
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+            self.events.setdefault(counter, deque(maxlen=10000)).append((now, amount))
+    
+    def rate_per_minute(self, counter):
+        """Events per minute for a counter, averaged over the window"""
+        oldest = time.monotonic() - self.window
+        with self.lock:
+            events = self.events.get(counter, ())
+            recent = sum(amount for timestamp, amount in events if timestamp >= oldest)
+        return recent * 60.0 / self.window
+    
+    def snapshot(self):
+        """Per-stage latency statistics (seconds) and counters"""
+        return {
+            "stages": {name: histogram.snapshot() for name, histogram in list(self.histograms.items())},
+            "counters": dict(self.counters)
+        }
+
+
+class MetricsDumper:
+    """Background thread writing a metrics snapshot to a JSON file at a fixed interval"""
+    
+    def __init__(self, path, snapshot, interval=10.0):
+        """Write the dict returned by `snapshot()` to `path` every `interval` seconds"""
+        self.path = path
+        self.snapshot = snapshot
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+    
+    def dump(self):
+        """Write one snapshot, replacing the file atomically"""
+        try:
+            data = self.snapshot()
+            data["timestamp"] = time.time()
+            
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Failed to write metrics: {e}")
+    
+    def run(self):
+        """Dump until stopped"""
+        while not self.stop_event.wait(self.interval):
+            self.dump()
+    
+    def start(self):
+        """Start the dump thread"""
+        self.thread = threading.Thread(target=self.run, name="metrics-dumper", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the thread and write a final snapshot"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        self.dump()
+
+
+def process_rss_bytes():
+    """Resident memory of this process in bytes, or None if it can't be determined"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                    (name, ctypes.c_size_t) for name in (
+                        "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                        "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                        "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")
+                ]
+            
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        
+        with open("/proc/self/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def format_prometheus(snapshot, prefix="voice_assistant"):
+    """Render a VoiceAssistant.get_metrics() snapshot in Prometheus text exposition format"""
+    lines = []
+    
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            if value is None:
+                value = math.nan
+            label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    
+    def summary(name, help_text, histograms, label):
+        samples = []
+        for key, stats in histograms.items():
+            for p in REPORTED_PERCENTILES:
+                samples.append(({label: key, "quantile": p / 100}, stats[f"p{p}"]))
+        metric(name, "summary", help_text, samples)
+        for key, stats in histograms.items():
+            lines.append(f'{name}_sum{{{label}="{key}"}} {stats["sum"]}')
+            lines.append(f'{name}_count{{{label}="{key}"}} {stats["count"]}')
+    
+    summary(f"{prefix}_stage_latency_seconds", "Per-stage latency; quantiles cover the recent window",
+            snapshot["stages"], "stage")
+    
+    if snapshot.get("real_time_factor"):
+        summary(f"{prefix}_transcription_real_time_factor",
+                "Transcription time divided by audio duration",
+                {"transcribe_audio": snapshot["real_time_factor"]}, "stage")
+    
+    metric(f"{prefix}_events_total", "counter", "Event counters",
+           [({"event": name}, value) for name, value in sorted(snapshot["counters"].items())])
+    metric(f"{prefix}_wake_words_per_minute", "gauge", "Wake word detections per minute over the recent window",
+           [({}, snapshot.get("wake_words_per_minute", 0.0))])
+    metric(f"{prefix}_queue_depth", "gauge", "Items waiting in each processing queue",
+           [({"queue": name}, depth) for name, depth in snapshot.get("queue_depths", {}).items()])
+    metric(f"{prefix}_model_load_seconds", "gauge", "Time taken to load each model",
+           [({"model": name}, seconds) for name, seconds in snapshot.get("model_load_times", {}).items()])
+    
+    if "wake_gate_cpu_saved_seconds" in snapshot:
+        metric(f"{prefix}_wake_gate_cpu_saved_seconds", "gauge",
+               "Estimated wake word CPU time avoided by the energy gate, net of its own cost; may be negative",
+               [({}, snapshot["wake_gate_cpu_saved_seconds"])])
+    
+    metric(f"{prefix}_utterance_buffer_bytes", "gauge", "Audio and feature buffer memory of the last and largest utterance",
+           [({"utterance": key}, snapshot[f"{key}_utterance_bytes"]) for key in ("last", "peak")
+            if f"{key}_utterance_bytes" in snapshot])
+    
+    streams = snapshot.get("streams", {})
+    if streams:
+        metric(f"{prefix}_stream_events_total", "counter", "Capture event counters per audio source",
+               [({"source": name, "event": event}, stats[event]) for name, stats in streams.items()
+                for event in ("wake_words", "ring_overruns", "input_overflows")])
+        metric(f"{prefix}_stream_buffer_bytes", "gauge", "Ring buffer memory per audio source",
+               [({"source": name}, stats["buffer_bytes"]) for name, stats in streams.items()])
+    
+    if snapshot.get("process_rss_bytes") is not None:
+        metric("process_resident_memory_bytes", "gauge", "Resident memory size in bytes",
+               [({}, snapshot["process_rss_bytes"])])
+    
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Minimal HTTP server on its own thread serving /metrics in Prometheus text format"""
+    
+    def __init__(self, snapshot, host="127.0.0.1", port=9109):
+        """Serve `format_prometheus(snapshot())` on `host`:`port`"""
+        self.snapshot = snapshot
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+    
+    def start(self):
+        """Bind the socket and start serving on a background thread"""
+        snapshot = self.snapshot
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                try:
+                    body = format_prometheus(snapshot()).encode('utf-8')
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop serving and close the socket"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,236 @@
+"""
+Asynchronous output file writer
+Results are queued and appended in batches by a background thread as plain
+text lines or JSON Lines records, with periodic fsync and size or age based
+rotation of the output file
+"""
+
+import os
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+OUTPUT_FORMATS = ("text", "jsonl")
+
+
+class OutputWriter:
+    """Appends result records to a file on its own thread"""
+    
+    def __init__(self, path, output_format="text", fsync_interval=5.0, max_bytes=None, max_age=None,
+                 backup_count=5, batch_size=256, max_pending=10000):
+        """
+        Configure the writer; its thread starts with the first record
+        
+        Each batch of up to `batch_size` queued records is written with one
+        call and flushed; the file is fsynced at most every `fsync_interval`
+        seconds and when the writer stops. The file is rotated to `path.1`,
+        `path.2`, ... (keeping `backup_count` old files) once it would exceed
+        `max_bytes` or was opened more than `max_age` seconds ago. write()
+        blocks only when `max_pending` records are already waiting.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}', expected one of {', '.join(OUTPUT_FORMATS)}")
+        
+        self.path = path
+        self.output_format = output_format
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._file = None
+        self._opened_at = None
+        self._last_fsync = 0.0
+        
+        # Statistics
+        self.records_written = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.rotations = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.queue_full = 0
+    
+    @property
+    def pending(self):
+        """Records queued but not yet written"""
+        return self._queue.qsize()
+    
+    def start(self):
+        """Start the writer thread, if it isn't running yet"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="output-writer", daemon=True)
+                self._thread.start()
+    
+    def write(self, text, record=None, on_written=None):
+        """
+        Queue one result
+        
+        `record` holds extra fields for JSONL output (raw text, timestamps,
+        latencies, confidence, source). `on_written()` is called on the writer
+        thread once the line has been written and flushed.
+        """
+        if self._thread is None:
+            self.start()
+        
+        item = (time.time(), text, record, on_written)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.queue_full += 1
+            self._queue.put(item)
+    
+    def format(self, timestamp, text, record):
+        """One output line for a result"""
+        if self.output_format == "jsonl":
+            data = {"timestamp": datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"), "text": text}
+            if record:
+                data.update(record)
+            return json.dumps(data, ensure_ascii=False) + "\n"
+        
+        prefix = f"{record['source']}: " if record and record.get("source") else ""
+        return f"[{datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')}] {prefix}{text}\n"
+    
+    def run(self):
+        """Write queued records in batches until a None sentinel arrives"""
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval or None)]
+            except queue.Empty:
+                self.sync()
+                continue
+            
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            if None in batch:
+                running = False
+            items = [item for item in batch if item is not None]
+            
+            try:
+                if items:
+                    self.write_batch(items)
+            except Exception as e:
+                self.errors += 1
+                print(f"Failed to save output: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        
+        self.sync()
+        self.close()
+    
+    def write_batch(self, items):
+        """Append a batch of records with as few writes as rotation allows, then run callbacks"""
+        if self._file is None:
+            self.open()
+        
+        chunk, chunk_size = [], 0
+        for timestamp, text, record, _ in items:
+            line = self.format(timestamp, text, record).encode('utf-8')
+            if self.should_rotate(chunk_size, len(line)):
+                self._file.write(b"".join(chunk))
+                self.rotate()
+                self.open()
+                chunk, chunk_size = [], 0
+            chunk.append(line)
+            chunk_size += len(line)
+            self.bytes_written += len(line)
+        
+        self._file.write(b"".join(chunk))
+        self._file.flush()
+        self.records_written += len(items)
+        self.batches += 1
+        
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self.sync()
+        
+        for _, _, _, on_written in items:
+            if on_written:
+                on_written()
+    
+    def open(self):
+        """Open the output file for appending"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._opened_at = time.time()
+    
+    def should_rotate(self, pending, incoming):
+        """Whether the open file plus `pending` unwritten bytes is full or too old for `incoming` more"""
+        size = self._file.tell() + pending
+        if not size:
+            return False
+        if self.max_bytes and size + incoming > self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened_at >= self.max_age
+    
+    def rotate(self):
+        """Close the file and shift it to path.1, path.1 to path.2 and so on"""
+        self.sync()
+        self.close()
+        
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+    
+    def sync(self):
+        """fsync the open file"""
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+        except OSError as e:
+            print(f"Failed to sync output: {e}")
+        self._last_fsync = time.monotonic()
+    
+    def close(self):
+        """Close the open file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def flush(self):
+        """Block until every queued record has been written"""
+        if self._thread is not None:
+            self._queue.join()
+    
+    def stop(self, timeout=5):
+        """Write what is queued, fsync and close the file"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=timeout)
+            self._thread = None
+    
+    def stats(self):
+        """Writer counters"""
+        return {
+            "records_written": self.records_written,
+            "batches": self.batches,
+            "bytes_written": self.bytes_written,
+            "rotations": self.rotations,
+            "fsyncs": self.fsyncs,
+            "errors": self.errors,
+            "queue_full": self.queue_full,
+            "pending": self.pending
+        }
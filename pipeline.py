@@ -0,0 +1,272 @@
+"""
+Staged producer/consumer pipeline for voice command processing
+Each stage owns a bounded queue and a dedicated worker thread; stages shared
+by several audio sources can serve the sources in turn
+"""
+
+import threading
+import queue
+import time
+import itertools
+from collections import OrderedDict, deque
+
+
+# What a stage does with new work when its queue is full
+DROP_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+
+class Utterance:
+    """A single voice command travelling through the pipeline"""
+    
+    def __init__(self, start_position, detected_at=None, reader=None, source=None):
+        """
+        Create an utterance starting at an absolute ring buffer position
+        
+        An optional ring buffer reader at that position keeps the audio from
+        being overwritten by sources that respect readers while queued.
+        `source` names the audio stream it was heard on.
+        """
+        self.start_position = start_position
+        self.reader = reader
+        self.source = source
+        self.detected_at = detected_at if detected_at is not None else time.monotonic()
+        self.timestamps = {"detected": self.detected_at}
+        self.audio = None
+        self.audio_duration = None
+        self.features = None
+        self.text = None
+        self.segments = None
+        self.segments_dropped = 0
+        self.confidence = None
+        self.profile = None
+        self.corrected_text = None
+
+
+class FairQueue(queue.Queue):
+    """
+    Queue that serves the items of each source in turn
+    
+    Items are grouped by their `source` attribute; get() takes the oldest
+    item of the next source in round-robin order, so a busy source can't
+    starve the others. Within a source, items stay in FIFO order. The size
+    limit applies to all sources together.
+    """
+    
+    def _init(self, maxsize):
+        self.sources = OrderedDict()
+        self.sequence = itertools.count()
+    
+    def _qsize(self):
+        return sum(len(items) for items in self.sources.values())
+    
+    def _put(self, item):
+        self.sources.setdefault(getattr(item, "source", None), deque()).append((next(self.sequence), item))
+    
+    def _get(self):
+        # The source served now moves to the back of the rotation
+        source, items = self.sources.popitem(last=False)
+        _, item = items.popleft()
+        if items:
+            self.sources[source] = items
+        return item
+    
+    def get_oldest_nowait(self):
+        """Remove and return the item queued first across all sources, ignoring the rotation"""
+        with self.not_empty:
+            if not self._qsize():
+                raise queue.Empty
+            source = min(self.sources, key=lambda source: self.sources[source][0][0])
+            items = self.sources[source]
+            _, item = items.popleft()
+            if not items:
+                del self.sources[source]
+            self.not_full.notify()
+            return item
+
+
+class PipelineStage:
+    """One pipeline stage: bounded input queue, worker thread and counters"""
+    
+    def __init__(self, name, handler, queue_size=8, drop_policy="block", block_timeout=None, fair=False):
+        """
+        Create a stage that calls `handler(item)` for each queued item
+        
+        The handler returns the item to pass to the next stage, or None to
+        stop processing it. When the queue is full, `drop_policy` decides
+        whether the producer waits ("block"), the new item is discarded
+        ("drop_newest") or the oldest queued item is discarded ("drop_oldest").
+        A blocking put gives up and drops the item after `block_timeout`
+        seconds, or waits indefinitely if it is None. With `fair`, queued
+        items are taken from each source in turn (see FairQueue).
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {DROP_POLICIES}")
+        
+        self.name = name
+        self.handler = handler
+        self.queue = FairQueue(maxsize=queue_size) if fair else queue.Queue(maxsize=queue_size)
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.next_stage = None
+        self.is_running = False
+        self.thread = None
+        
+        # Counters
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.busy = False
+    
+    @property
+    def depth(self):
+        """Number of items waiting in this stage's queue"""
+        return self.queue.qsize()
+    
+    @property
+    def in_flight(self):
+        """
+        Items queued or being handled
+        
+        An item counts from the moment it is queued until its handler has
+        returned and the result was passed on, so a pipeline never looks idle
+        while an item moves between a queue and a worker or between stages.
+        """
+        return self.queue.unfinished_tasks
+    
+    def submit(self, item):
+        """Queue an item for this stage according to its drop policy; returns False if dropped"""
+        self.submitted += 1
+        
+        if self.drop_policy == "block":
+            deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+            while True:
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    if not self.is_running or (deadline is not None and time.monotonic() >= deadline):
+                        self.dropped += 1
+                        return False
+        elif self.drop_policy == "drop_newest":
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+                return False
+        else:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    # A fair queue's next item is not necessarily its oldest
+                    take_oldest = getattr(self.queue, "get_oldest_nowait", self.queue.get_nowait)
+                    try:
+                        take_oldest()
+                        self.queue.task_done()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+    
+    def worker(self):
+        """Worker loop: process queued items and forward results downstream"""
+        while self.is_running:
+            try:
+                item = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            self.busy = True
+            try:
+                result = self.handler(item)
+                self.processed += 1
+                if result is not None and self.next_stage is not None:
+                    self.next_stage.submit(result)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline stage '{self.name}' error: {e}")
+            finally:
+                self.busy = False
+                self.queue.task_done()
+    
+    def start(self):
+        """Start the worker thread"""
+        self.is_running = True
+        self.thread = threading.Thread(target=self.worker, name=f"pipeline-{self.name}", daemon=True)
+        self.thread.start()
+    
+    def stop(self, timeout=2):
+        """Stop the worker thread"""
+        self.is_running = False
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+    
+    def stats(self):
+        """Queue depth and throughput counters for this stage"""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "queue_size": self.queue.maxsize,
+            "drop_policy": self.drop_policy,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "busy": self.busy
+        }
+
+
+class Pipeline:
+    """Linear chain of PipelineStages, optionally fed by one input stage per source"""
+    
+    def __init__(self, stages, inputs=None):
+        """
+        Link the stages in order; items submitted go to the first stage
+        
+        `inputs` maps source names to stages that run side by side in front
+        of the chain, each feeding its first stage. Items are then submitted
+        to the input stage of their `source`.
+        """
+        self.inputs = dict(inputs or {})
+        chain = list(stages)
+        for stage, next_stage in zip(chain, chain[1:]):
+            stage.next_stage = next_stage
+        for stage in self.inputs.values():
+            stage.next_stage = chain[0]
+        self.stages = list(self.inputs.values()) + chain
+    
+    def submit(self, item):
+        """Submit an item to its source's input stage, or the first stage"""
+        if self.inputs:
+            return self.inputs[item.source].submit(item)
+        return self.stages[0].submit(item)
+    
+    def stage(self, name):
+        """Look up a stage by name"""
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+    
+    def start(self):
+        """Start all stage workers, last stage first"""
+        for stage in reversed(self.stages):
+            stage.start()
+    
+    def stop(self, timeout=2):
+        """Stop all stage workers, first stage first"""
+        for stage in self.stages:
+            stage.stop(timeout)
+    
+    def is_idle(self):
+        """Whether no stage has an item queued or in progress"""
+        return all(stage.in_flight == 0 for stage in self.stages)
+    
+    def stats(self):
+        """Per-stage counters keyed by stage name"""
+        return {stage.name: stage.stats() for stage in self.stages}
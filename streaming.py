@@ -0,0 +1,116 @@
+"""
+Streaming partial transcripts while a command is being recorded
+The growing recording is re-decoded at a fixed stride and words that two
+consecutive hypotheses agree on are committed as stable text
+"""
+
+import threading
+import time
+
+
+def common_prefix_length(a, b):
+    """Number of leading words two hypotheses share"""
+    count = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        count += 1
+    return count
+
+
+class PartialTranscriber:
+    """Re-decodes a growing float32 recording on its own thread and reports stabilized partial text"""
+    
+    def __init__(self, decode, on_partial, sample_rate, stride=1.0, min_audio=0.5):
+        """
+        Configure partial decoding
+        
+        `decode(audio, prefix)` transcribes float32 audio, optionally forcing
+        the already stable text as the decoder prefix, and returns the full
+        text. `on_partial(text)` is called whenever the displayed hypothesis
+        changes. A decode runs at most every `stride` seconds and only once at
+        least `min_audio` seconds of new speech are available.
+        """
+        self.decode = decode
+        self.on_partial = on_partial
+        self.sample_rate = sample_rate
+        self.stride = stride
+        self.min_samples = int(min_audio * sample_rate)
+        
+        self.samples = None
+        self.region = (0, 0)
+        self.stop_event = threading.Event()
+        self.thread = None
+        
+        self.stable_words = []
+        self.previous_words = []
+        self.text = ""
+        
+        # Statistics
+        self.decodes = 0
+        self.decode_seconds = 0.0
+        self.first_partial_latency = None
+    
+    @property
+    def stable_text(self):
+        """Words committed by agreement between consecutive hypotheses"""
+        return " ".join(self.stable_words)
+    
+    def start(self, samples):
+        """Start decoding regions of `samples`, the buffer the recording is written into"""
+        self.samples = samples
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self.run, name="partial-transcriber", daemon=True)
+        self.thread.start()
+    
+    def update(self, start, end):
+        """Report that samples[start:end] now holds the speech recorded so far"""
+        self.region = (start, end)
+    
+    def run(self):
+        """Decode the latest region every stride while it keeps growing"""
+        decoded_region = None
+        while not self.stop_event.wait(self.stride):
+            start, end = self.region
+            if end - start < self.min_samples or (start, end) == decoded_region:
+                continue
+            if decoded_region is not None and end - decoded_region[1] < self.min_samples // 2:
+                continue
+            
+            decoded_region = (start, end)
+            audio = self.samples[start:end]
+            
+            decode_start = time.perf_counter()
+            try:
+                text = self.decode(audio, self.stable_text)
+            except Exception as e:
+                print(f"Partial transcription error: {e}")
+                continue
+            self.decode_seconds += time.perf_counter() - decode_start
+            self.decodes += 1
+            
+            if text is not None and not self.stop_event.is_set():
+                self.add_hypothesis(text)
+    
+    def add_hypothesis(self, text):
+        """Extend the stable words by local agreement and report the new hypothesis"""
+        words = text.split()
+        
+        # Words agreed on by the last two decodes become stable; stable words never change
+        agreed = common_prefix_length(self.previous_words, words)
+        if agreed > len(self.stable_words) and words[:len(self.stable_words)] == self.stable_words:
+            self.stable_words = words[:agreed]
+        self.previous_words = words
+        
+        text = " ".join(self.stable_words + words[len(self.stable_words):])
+        if text and text != self.text:
+            self.text = text
+            if self.first_partial_latency is None:
+                self.first_partial_latency = time.monotonic() - self.started_at
+            self.on_partial(text)
+    
+    def stop(self):
+        """Stop decoding; a decode already running is left to finish in the background"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=0.1)
@@ -73,11 +73,23 @@ def test_file_structure():
     
     required_files = [
         'voice_assistant.py',
+        'gui.py',
         'config.json',
         'requirements.txt',
         'README.md',
         'build_exe.py',
-        'setup_symspell.py'
+        'setup_symspell.py',
+        'audio_capture.py',
+        'endpointing.py',
+        'pipeline.py',
+        'features.py',
+        'transcription.py',
+        'text_correction.py',
+        'batch_transcribe.py',
+        'streaming.py',
+        'metrics.py',
+        'wake_word.py',
+        'output_writer.py'
     ]
     
     missing_files = []
@@ -122,6 +134,983 @@ def test_config_validity():
         print(f"✗ Error reading config: {e}")
         return False
 
+def test_ring_buffer():
+    """Test the capture ring buffer wraparound and overrun handling"""
+    print("\nTesting audio ring buffer...")
+    
+    try:
+        import numpy as np
+        from audio_capture import AudioRingBuffer
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    ring = AudioRingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.write(np.arange(6, 12, dtype=np.int16))
+    
+    # Positions 0-3 were overwritten, so a read from 0 starts at 4
+    samples, position = ring.read(0, 4, timeout=0)
+    assert position == 4
+    assert list(samples) == [4, 5, 6, 7]
+    assert ring.overruns == 1
+    
+    # A reader picks up where it left off across the wrap point
+    reader = ring.reader(8)
+    assert list(reader.read(4, timeout=0)) == [8, 9, 10, 11]
+    assert reader.read(1, timeout=0) is None
+    
+    reader.rewind(100)
+    assert reader.position == ring.oldest_position
+    
+    # A closed reader no longer holds back a blocking writer
+    reader.close()
+    ring.write(np.arange(8, dtype=np.int16), block=True)
+    assert ring.write_position == 20
+    
+    print("✓ Ring buffer works")
+    return True
+
+def test_endpointer():
+    """Test that the endpointer stops after speech and trims silence"""
+    print("\nTesting VAD endpointer...")
+    
+    try:
+        import numpy as np
+        from endpointing import EnergyEndpointer
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    sample_rate = 16000
+    silence = np.zeros(sample_rate, dtype=np.int16)
+    t = np.arange(sample_rate) / sample_rate
+    speech = (8000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+    audio = np.concatenate([silence, speech, silence, silence, silence])
+    
+    endpointer = EnergyEndpointer(sample_rate, hangover=0.5, max_duration=5.0, padding=0.1)
+    for i in range(0, len(audio), 512):
+        if endpointer.process(audio[i:i + 512]):
+            break
+    
+    # Ends well before the 5 s maximum, half a second after speech stops
+    assert endpointer.done
+    assert endpointer.samples_seen < 3 * sample_rate
+    
+    start, end = endpointer.speech_bounds()
+    assert 0.8 * sample_rate < start < sample_rate
+    assert 2 * sample_rate < end < 2.2 * sample_rate
+    
+    print("✓ Endpointer works")
+    return True
+
+def test_pipeline():
+    """Test pipeline stage ordering and drop policies"""
+    print("\nTesting processing pipeline...")
+    
+    import threading
+    import time
+    from pipeline import Pipeline, PipelineStage
+    
+    # Items pass through every stage in order
+    results = []
+    done = threading.Event()
+    
+    def collect(item):
+        results.append(item)
+        if len(results) == 3:
+            done.set()
+    
+    pipeline = Pipeline([
+        PipelineStage("double", lambda x: x * 2),
+        PipelineStage("increment", lambda x: x + 1),
+        PipelineStage("collect", collect)
+    ])
+    pipeline.start()
+    try:
+        for i in range(3):
+            pipeline.submit(i)
+        assert done.wait(timeout=5)
+    finally:
+        pipeline.stop()
+    assert results == [1, 3, 5]
+    assert pipeline.stats()["double"]["processed"] == 3
+    
+    # Full queues drop according to policy while the workers are stopped
+    newest = PipelineStage("newest", lambda x: x, queue_size=2, drop_policy="drop_newest")
+    oldest = PipelineStage("oldest", lambda x: x, queue_size=2, drop_policy="drop_oldest")
+    for i in range(4):
+        newest.submit(i)
+        oldest.submit(i)
+    assert list(newest.queue.queue) == [0, 1]
+    assert list(oldest.queue.queue) == [2, 3]
+    assert newest.dropped == 2 and oldest.dropped == 2
+    assert newest.stats()["max_depth"] == 2
+    assert oldest.in_flight == 2
+    
+    # An item counts as in flight until it has been handled and passed on
+    release = threading.Event()
+    handled = threading.Event()
+    pipeline = Pipeline([
+        PipelineStage("wait", lambda x: release.wait(timeout=5) and x),
+        PipelineStage("done", lambda x: handled.set())
+    ])
+    pipeline.submit(1)
+    assert not pipeline.is_idle()
+    pipeline.start()
+    try:
+        assert not pipeline.is_idle()
+        release.set()
+        assert handled.wait(timeout=5)
+        deadline = time.monotonic() + 5
+        while not pipeline.is_idle() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pipeline.is_idle()
+    finally:
+        pipeline.stop()
+    
+    print("✓ Pipeline works")
+
+def test_symspell_cache():
+    """Test that the SymSpell index is cached and rebuilt when the key changes"""
+    print("\nTesting SymSpell index cache...")
+    
+    try:
+        from text_correction import load_symspell
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dictionary_path = os.path.join(temp_dir, "dictionary.txt")
+        cache_dir = os.path.join(temp_dir, "cache")
+        with open(dictionary_path, 'w') as f:
+            f.write("hello 1000\nworld 800\nhelp 500\n")
+        
+        _, source, _ = load_symspell(dictionary_path, 2, 7, cache_dir)
+        assert source == "dictionary"
+        
+        sym_spell, source, _ = load_symspell(dictionary_path, 2, 7, cache_dir)
+        assert source == "cache"
+        assert sym_spell.lookup_compound("helo wrld", 2)[0].term == "hello world"
+        
+        # A different edit distance is a different index
+        _, source, _ = load_symspell(dictionary_path, 1, 7, cache_dir)
+        assert source == "dictionary"
+        assert len(os.listdir(cache_dir)) == 1
+    
+    print("✓ SymSpell cache works")
+    return True
+
+def test_correction_cache():
+    """Test that cached corrections match SymSpell and survive a save and load"""
+    print("\nTesting correction cache...")
+    
+    try:
+        from symspellpy import SymSpell
+        from text_correction import CorrectionCache, normalize_text
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    def create_sym_spell():
+        sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+        for word, count in (("turn", 900), ("on", 1000), ("off", 800), ("the", 2000), ("lights", 300)):
+            sym_spell.create_dictionary_entry(word, count)
+        return sym_spell
+    
+    reference = create_sym_spell()
+    cache = CorrectionCache(create_sym_spell())
+    for text in ("turn of the lihgts", "Turn of the  lihgts", "turn on the lihgts"):
+        assert cache.correct(text) == reference.lookup_compound(text, 2)[0].term
+    
+    # Segments that skip SymSpell are normalized to the form of its corrections
+    for text in ("Turn on the lights.", "Turn OFF the lights!", " turn on,  the lights"):
+        assert normalize_text(text) == reference.lookup_compound(text, 2)[0].term
+    
+    stats = cache.stats()
+    assert stats["sentence_hits"] == 1 and stats["sentence_misses"] == 2
+    assert stats["token_hits"] > 0
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "warm.json")
+        cache.save(path, "key")
+        
+        warm = CorrectionCache(create_sym_spell())
+        assert warm.load(path, "key") == 2
+        assert warm.correct("turn on the lihgts") == "turn on the lights"
+        assert warm.stats()["sentence_hits"] == 1
+    
+    print("✓ Correction cache works")
+    return True
+
+def test_domain_lexicon():
+    """Test that a domain lexicon wins over general words and is reloaded cleanly"""
+    print("\nTesting domain lexicon...")
+    
+    import threading
+    
+    try:
+        from symspellpy import SymSpell
+        from text_correction import DomainLexicon, compact_symspell
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+    for word, count in (("turn", 900), ("on", 1000), ("the", 2000), ("sony", 300), ("hi", 200)):
+        sym_spell.create_dictionary_entry(word, count)
+    compact_symspell(sym_spell)
+    words, deletes = dict(sym_spell._words), dict(sym_spell._deletes)
+    assert sym_spell.lookup_compound("turn on sono", 2)[0].term == "turn on sony"
+    
+    # Deletes mapping to the same terms share one tuple
+    assert deletes["sny"] is deletes["son"] == ("sony",)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "lexicon.txt")
+        with open(path, 'w') as f:
+            f.write("# devices\nSonos\nhi 5\n")
+        
+        lexicon = DomainLexicon(sym_spell, path, boost=2.0, check_interval=0)
+        assert lexicon.reload() == 2
+        assert sym_spell.lookup_compound("turn on sono", 2)[0].term == "turn on sonos"
+        assert sym_spell._words["hi"] == 10
+        
+        # Emptying the file restores the general index exactly
+        with open(path, 'w') as f:
+            f.write("")
+        os.utime(path, (lexicon.mtime + 10, lexicon.mtime + 10))
+        assert lexicon.changed()
+        assert lexicon.reload() == 0
+        assert sym_spell._words == words and sym_spell._deletes == deletes
+        
+        # Lookups holding the lock never see a half-merged index
+        results, errors = set(), []
+        stop = threading.Event()
+        
+        def look_up():
+            try:
+                while not stop.is_set():
+                    with lexicon.lock:
+                        results.add(sym_spell.lookup_compound("turn on sono", 2)[0].term)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=look_up) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(20):
+            with open(path, 'w') as f:
+                f.write("Sonos\n" if i % 2 == 0 else "")
+            lexicon.reload()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        assert not errors and results <= {"turn on sony", "turn on sonos"}
+    
+    print("✓ Domain lexicon works")
+    return True
+
+def test_benchmark_compare():
+    """Test that benchmark comparison flags cost increases beyond the threshold"""
+    print("\nTesting benchmark comparison...")
+    
+    try:
+        from benchmark_suite import compare_results
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    baseline = {"metrics": {"a.p50_seconds": 0.010, "b.p50_seconds": 2e-6, "c.buffer_bytes": 1000, "d.rtf": 0.5}}
+    current = {"metrics": {"a.p50_seconds": 0.013, "b.p50_seconds": 4e-6, "c.buffer_bytes": 1100, "e.rtf": 0.1}}
+    
+    rows = {name: regressed for name, _, _, _, regressed in compare_results(baseline, current, 0.2)}
+    assert rows == {"a.p50_seconds": True, "b.p50_seconds": False, "c.buffer_bytes": False}
+    
+    print("✓ Benchmark comparison works")
+    return True
+
+def test_fair_pipeline():
+    """Test that pipeline inputs route by source and fair queues alternate sources"""
+    print("\nTesting multi-source pipeline...")
+    
+    import threading
+    from pipeline import FairQueue, Pipeline, PipelineStage, Utterance
+    
+    # A burst from one source doesn't hold back the other
+    fair = FairQueue()
+    for source in ("a", "a", "a", "b", "b"):
+        fair.put(Utterance(0, source=source))
+    assert [fair.get_nowait().source for _ in range(5)] == ["a", "b", "a", "b", "a"]
+    
+    # drop_oldest evicts the item queued first, not the one the rotation would serve next
+    stage = PipelineStage("fair", lambda item: item, queue_size=2, drop_policy="drop_oldest", fair=True)
+    first, second = Utterance(1, source="a"), Utterance(2, source="a")
+    stage.submit(first)
+    stage.submit(second)
+    assert stage.queue.get_nowait() is first
+    stage.submit(Utterance(3, source="b"))
+    stage.submit(Utterance(4, source="b"))
+    assert stage.dropped == 1
+    assert [stage.queue.get_nowait().start_position for _ in range(2)] == [3, 4]
+    
+    # Each source has its own input stage in front of the shared chain
+    results = []
+    done = threading.Event()
+    
+    def collect(item):
+        results.append(item.source)
+        if len(results) == 4:
+            done.set()
+    
+    inputs = {name: PipelineStage(f"input:{name}", lambda item: item) for name in ("a", "b")}
+    pipeline = Pipeline([PipelineStage("collect", collect, fair=True)], inputs)
+    pipeline.start()
+    try:
+        for source in ("a", "b", "a", "b"):
+            pipeline.submit(Utterance(0, source=source))
+        assert done.wait(timeout=5)
+    finally:
+        pipeline.stop()
+    assert sorted(results) == ["a", "a", "b", "b"]
+    assert pipeline.stats()["input:a"]["processed"] == 2
+    
+    print("✓ Multi-source pipeline works")
+    return True
+
+def test_multi_source_engine():
+    """Test that two audio sources run end to end through the engine with records tagged by source"""
+    print("\nTesting multi-source engine...")
+    
+    import time
+    
+    try:
+        import numpy as np
+        import voice_assistant
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    class OnsetDetector:
+        """Porcupine stand-in that fires when a frame turns loud"""
+        sample_rate = 16000
+        frame_length = 512
+        
+        def __init__(self):
+            self.loud = False
+        
+        def process(self, pcm):
+            loud = max(abs(min(pcm)), max(pcm)) > 5000
+            fired, self.loud = loud and not self.loud, loud
+            return 0 if fired else -1
+        
+        def delete(self):
+            pass
+    
+    class ToneModel:
+        """Whisper stand-in that names the source by the tone it hears"""
+        def transcribe(self, audio, **options):
+            spectrum = np.abs(np.fft.rfft(audio))
+            frequency = np.argmax(spectrum) * 16000 / len(audio)
+            return {"text": "kitchen" if frequency < 700 else "office", "segments": []}
+    
+    class Engine(voice_assistant.VoiceAssistant):
+        def init_whisper(self):
+            self.whisper_model = ToneModel()
+        
+        def init_symspell(self):
+            pass
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_file = os.path.join(temp_dir, "results.jsonl")
+        config_path = os.path.join(temp_dir, "config.json")
+        with open(config_path, 'w') as f:
+            json.dump({
+                "audio_sample_rate": 16000,
+                "parallel_init": False,
+                "incremental_features": False,
+                "output_file": output_file,
+                "output_format": "jsonl",
+                "audio_sources": [
+                    {"name": "kitchen", "type": "synthetic", "signal": "bursts", "frequency": 440,
+                     "duration": 9.0, "gap_duration": 3.0},
+                    {"name": "office", "type": "synthetic", "signal": "bursts", "frequency": 1000,
+                     "duration": 10.0, "gap_duration": 2.0}
+                ]
+            }, f)
+        
+        create = voice_assistant.pvporcupine.create
+        voice_assistant.pvporcupine.create = lambda **kwargs: OnsetDetector()
+        try:
+            assistant = Engine(config_path)
+        finally:
+            voice_assistant.pvporcupine.create = create
+        
+        assistant.start()
+        try:
+            deadline = time.monotonic() + 30
+            while time.monotonic() < deadline:
+                finished = all(stream.source.finished.is_set() for stream in assistant.streams)
+                if finished and assistant.is_idle():
+                    break
+                time.sleep(0.1)
+            metrics = assistant.get_metrics()
+        finally:
+            assistant.stop()
+        
+        with open(output_file) as f:
+            records = [json.loads(line) for line in f]
+    
+    # Each source's commands were endpointed on its own stream and tagged with its name
+    assert sorted(record["source"] for record in records) == ["kitchen"] * 2 + ["office"] * 3
+    assert all(record["text"] == record["source"] for record in records)
+    assert all(0.5 < record["audio_duration"] < 3.0 for record in records)
+    assert metrics["streams"]["kitchen"]["wake_words"] == 2
+    assert metrics["streams"]["office"]["wake_words"] == 3
+    assert metrics["counters"]["wake_words"] == 5
+    
+    # Confident segments skip SymSpell but come out in the same form as corrected ones
+    from symspellpy import SymSpell
+    assistant.sym_spell = SymSpell(max_dictionary_edit_distance=2, prefix_length=7)
+    for word, count in (("turn", 900), ("on", 1000), ("the", 2000), ("lights", 300), ("kitchen", 100)):
+        assistant.sym_spell.create_dictionary_entry(word, count)
+    segments = [{"text": "Turn on the lights.", "avg_logprob": -0.1},
+                {"text": "Turn on the lihgts.", "avg_logprob": -0.9}]
+    assert assistant.correct_segments(segments) == "turn on the lights turn on the lights"
+    
+    print("✓ Multi-source engine works")
+    return True
+
+def test_speech_segments():
+    """Test that non-speech segments are dropped and confidence covers the rest"""
+    print("\nTesting speech segments...")
+    
+    try:
+        from transcription import result_confidence, speech_segments
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    result = {"text": " Turn on the lights. Thank you.", "segments": [
+        {"start": 0.0, "end": 2.0, "text": " Turn on the lights.", "avg_logprob": -0.2,
+         "no_speech_prob": 0.05, "compression_ratio": 1.1},
+        {"start": 2.0, "end": 4.0, "text": " Thank you.", "avg_logprob": -0.9,
+         "no_speech_prob": 0.8, "compression_ratio": 0.8}
+    ]}
+    
+    segments, dropped = speech_segments(result, 0.6)
+    assert dropped == 1
+    assert [segment["text"] for segment in segments] == ["Turn on the lights."]
+    assert result_confidence({"segments": segments})["no_speech_prob"] == 0.05
+    
+    assert len(speech_segments(result, None)[0]) == 2
+    
+    # Results without segments keep their text, unscored
+    segments, dropped = speech_segments({"text": " hello "}, 0.6)
+    assert segments[0]["text"] == "hello" and dropped == 0
+    assert result_confidence({"segments": segments}) is None
+    
+    print("✓ Speech segments work")
+    return True
+
+def test_output_writer():
+    """Test that the output writer writes JSONL records in order and rotates"""
+    print("\nTesting output writer...")
+    
+    from output_writer import OutputWriter
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "logs", "output.jsonl")
+        written = []
+        writer = OutputWriter(path, "jsonl", max_bytes=400, backup_count=2)
+        for i in range(20):
+            writer.write(f"command {i}", {"raw_text": f"comand {i}"}, on_written=lambda i=i: written.append(i))
+        writer.flush()
+        writer.stop()
+        
+        assert written == list(range(20))
+        assert writer.rotations > 0 and writer.records_written == 20
+        assert sorted(os.listdir(os.path.dirname(path))) == ["output.jsonl", "output.jsonl.1", "output.jsonl.2"]
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert records[-1]["text"] == "command 19" and records[-1]["raw_text"] == "comand 19"
+        assert all(os.path.getsize(os.path.join(os.path.dirname(path), name)) <= 400
+                   for name in os.listdir(os.path.dirname(path)))
+    
+    print("✓ Output writer works")
+    return True
+
+def test_wav_loading():
+    """Test memory-mapped WAV loading and manifest parsing for batch mode"""
+    print("\nTesting batch WAV loading...")
+    
+    try:
+        import wave
+        import numpy as np
+        from batch_transcribe import iter_audio_files, load_audio_file
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_path = os.path.join(temp_dir, "stereo.wav")
+        samples = np.array([[16384, -16384], [8192, 8192]], dtype='<i2')
+        with wave.open(wav_path, 'wb') as f:
+            f.setnchannels(2)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(samples.tobytes())
+        
+        audio = load_audio_file(wav_path, 16000)
+        assert audio.dtype == np.float32
+        assert np.allclose(audio, [0.0, 0.25])
+        
+        manifest_path = os.path.join(temp_dir, "manifest.txt")
+        with open(manifest_path, 'w') as f:
+            f.write("# recordings\nstereo.wav\n\n")
+        assert list(iter_audio_files(manifest_path)) == [wav_path]
+        assert list(iter_audio_files(temp_dir)) == [wav_path]
+    
+    print("✓ Batch WAV loading works")
+    return True
+
+def test_batch_resume():
+    """Test that files whose transcription failed are retried when a batch resumes"""
+    print("\nTesting batch resume...")
+    
+    try:
+        import wave
+        import numpy as np
+        from batch_transcribe import run_batch
+        from transcription import speech_segments
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    class FakeAssistant:
+        sample_rate = 16000
+        decoding_profile = "balanced"
+        
+        def __init__(self, result):
+            self.result = result
+            self.saved = []
+            self.output_writer = self
+        
+        def wait_until_ready(self):
+            pass
+        
+        def transcribe_result(self, audio):
+            return self.result
+        
+        def speech_segments(self, result):
+            return speech_segments(result)
+        
+        def correct_segments(self, segments):
+            return " ".join(segment["text"] for segment in segments)
+        
+        def save_output(self, text, record, on_written):
+            self.saved.append(text)
+            on_written()
+        
+        def flush(self):
+            pass
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with wave.open(os.path.join(temp_dir, "command.wav"), 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(np.zeros(1600, dtype='<i2').tobytes())
+        checkpoint = os.path.join(temp_dir, "checkpoint.txt")
+        
+        summary = run_batch(FakeAssistant(None), temp_dir, jobs=1, checkpoint_path=checkpoint)
+        assert summary["failed"] == 1 and summary["files"] == 0
+        
+        assistant = FakeAssistant({"text": " lights on"})
+        summary = run_batch(assistant, temp_dir, jobs=1, checkpoint_path=checkpoint)
+        assert summary["files"] == 1 and summary["skipped"] == 0
+        assert assistant.saved == ["lights on"]
+        
+        summary = run_batch(assistant, temp_dir, jobs=1, checkpoint_path=checkpoint)
+        assert summary["skipped"] == 1 and summary["files"] == 0
+    
+    print("✓ Batch resume works")
+    return True
+
+def write_tiny_whisper(path):
+    """Write a randomly initialized Whisper checkpoint small enough to load and decode quickly"""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+    
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=1, n_audio_layer=1,
+                           n_vocab=51865, n_text_ctx=64, n_text_state=64, n_text_head=1, n_text_layer=1)
+    torch.manual_seed(0)
+    model = Whisper(dims)
+    
+    # Whisper leaves the text positional embedding uninitialized; checkpoints overwrite it
+    model.decoder.positional_embedding.data.normal_(0, 0.02)
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, path)
+
+def test_transcription_pool():
+    """Test that pool results arrive in submission order and a dead worker's utterances fail"""
+    print("\nTesting transcription worker pool...")
+    
+    try:
+        import numpy as np
+        import torch
+        import whisper
+        from transcription import ProcessPoolTranscriber
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "tiny_random.pt")
+        write_tiny_whisper(model_path)
+        
+        options = {"language": "en", "fp16": False, "temperature": 0.0}
+        pool = ProcessPoolTranscriber(model_path, num_workers=2, options=options, warmup=False)
+        pool.start()
+        try:
+            assert pool.ready.wait(timeout=120) and pool.ready_workers
+            
+            # Longer clips first, so later ones tend to finish first
+            order = []
+            futures = []
+            for i, seconds in enumerate((3, 3, 1, 1)):
+                future = pool.submit(np.zeros(seconds * 16000, dtype=np.float32))
+                future.add_done_callback(lambda _, i=i: order.append(i))
+                futures.append(future)
+            assert all("text" in future.result(timeout=120) for future in futures)
+            assert order == [0, 1, 2, 3]
+            
+            # Killing a worker mid-utterance fails that utterance, and its replacement serves the next
+            future = pool.submit(np.zeros(5 * 16000, dtype=np.float32))
+            worker = next(worker for worker in pool._workers.values() if worker.tasks)
+            worker.process.kill()
+            failed = False
+            try:
+                future.result(timeout=120)
+            except RuntimeError:
+                failed = True
+            assert failed and pool.restarts == 1
+            assert "text" in pool.submit(np.zeros(16000, dtype=np.float32)).result(timeout=120)
+            assert pool.pending == 0
+        finally:
+            pool.stop()
+    
+    print("✓ Transcription worker pool works")
+    return True
+
+def test_batched_decoding():
+    """Test that batched decoding gives the same results as decoding each clip alone"""
+    print("\nTesting batched decoding...")
+    
+    try:
+        import numpy as np
+        import whisper
+        from transcription import (BatchTranscriber, DECODING_PROFILES, decoding_options, transcribe_features,
+                                   window_features)
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "tiny_random.pt")
+        write_tiny_whisper(model_path)
+        model = whisper.load_model(model_path)
+    
+    rng = np.random.default_rng(0)
+    audios = [(rng.standard_normal(16000 * seconds) * 0.05).astype(np.float32) for seconds in (1, 2, 3)]
+    features = [window_features(audio).numpy() for audio in audios]
+    batcher = BatchTranscriber(model, batch_size=3)
+    
+    # Deterministic beam search with timestamps matches clip by clip
+    options = {"language": "en", "fp16": False, "temperature": 0.0, "beam_size": 2, "without_timestamps": False}
+    batched = batcher.transcribe_batch(audios, options, features)
+    for audio, feature, result in zip(audios, features, batched):
+        alone = transcribe_features(model, feature, len(audio) / 16000, options)
+        assert result["text"] == alone["text"]
+        assert abs(result["segments"][0]["avg_logprob"] - alone["segments"][0]["avg_logprob"]) < 1e-4
+    
+    # Clips failing the compression ratio check fall back to the next temperature, as they do alone
+    options = {"language": "en", "fp16": False, "temperature": (0.0, 0.5), "compression_ratio_threshold": 1.0}
+    batched = batcher.transcribe_batch(audios, options, features)
+    for audio, feature, result in zip(audios, features, batched):
+        alone = transcribe_features(model, feature, len(audio) / 16000, options)
+        assert result["segments"][0]["temperature"] == alone["segments"][0]["temperature"] == 0.5
+    
+    # Without precomputed features each clip decodes as model.transcribe() decodes it
+    for profile in ("balanced", "accurate"):
+        options = decoding_options(dict(DECODING_PROFILES[profile], temperature=[0.0]), {"language": "en", "fp16": False})
+        batched = batcher.transcribe_batch(audios, options)
+        for audio, result in zip(audios, batched):
+            alone = model.transcribe(audio, **options)
+            assert result["text"] == alone["text"]
+            assert abs(result["segments"][0]["avg_logprob"] - alone["segments"][0]["avg_logprob"]) < 1e-6
+    
+    print("✓ Batched decoding works")
+    return True
+
+def test_quantized_cache():
+    """Test int8 quantization, its disk cache and that the cache is keyed by library versions"""
+    print("\nTesting quantized model cache...")
+    
+    try:
+        import numpy as np
+        import torch
+        import whisper
+        from transcription import load_whisper_model, quantized_cache_path, transcribe_features
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        model_path = os.path.join(temp_dir, "tiny_random.pt")
+        cache_dir = os.path.join(temp_dir, "cache")
+        other_path = os.path.join(temp_dir, "tiny_random_v2.pt")
+        write_tiny_whisper(model_path)
+        write_tiny_whisper(other_path)
+        load_whisper_model(other_path, quantize=True, cache_dir=cache_dir)
+        
+        quantized, source, _ = load_whisper_model(model_path, quantize=True, cache_dir=cache_dir)
+        assert source == "quantized"
+        assert not any(type(module) is torch.nn.Linear for module in quantized.modules())
+        cached, source, _ = load_whisper_model(model_path, quantize=True, cache_dir=cache_dir)
+        assert source == "cache"
+        
+        audio = (np.random.default_rng(0).standard_normal(16000) * 0.05).astype(np.float32)
+        features = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), 80)
+        options = {"language": "en", "fp16": False, "temperature": 0.0}
+        assert transcribe_features(quantized, features, 1.0, options) == transcribe_features(cached, features, 1.0, options)
+        
+        # A whisper or torch upgrade gets a new cache file instead of the stale pickle
+        path = quantized_cache_path(cache_dir, model_path)
+        version = whisper.__version__
+        whisper.__version__ = version + ".next"
+        try:
+            assert quantized_cache_path(cache_dir, model_path) != path
+        finally:
+            whisper.__version__ = version
+        
+        # Caches of other models in the same directory are kept, even with overlapping names
+        assert os.path.exists(quantized_cache_path(cache_dir, other_path))
+        names = [os.path.basename(quantized_cache_path(cache_dir, name)).rsplit('_', 1)[0]
+                 for name in ("tiny", "tiny.en")]
+        assert names == ["whisper_int8_tiny", "whisper_int8_tiny.en"]
+    
+    print("✓ Quantized model cache works")
+    return True
+
+def test_audio_sources():
+    """Test that a non-realtime source fills the ring buffer without overrunning a slow reader"""
+    print("\nTesting audio sources...")
+    
+    try:
+        import numpy as np
+        from audio_capture import AudioRingBuffer, SyntheticSource, create_audio_source
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    ring = AudioRingBuffer(1024)
+    reader = ring.reader()
+    source = create_audio_source({"type": "synthetic", "signal": "tone", "duration": 0.5}, 16000, 256)
+    assert isinstance(source, SyntheticSource)
+    source.start(ring)
+    
+    received = []
+    while len(received) < 8000 // 256:
+        block = reader.read(256, timeout=2.0)
+        assert block is not None
+        received.append(block)
+    
+    assert source.finished.wait(timeout=2.0)
+    source.stop()
+    assert ring.overruns == 0
+    assert source.samples_written == 8000
+    assert np.abs(np.concatenate(received)).max() > 5000
+    
+    print("✓ Audio sources work")
+    return True
+
+def test_partial_stabilization():
+    """Test that partial hypotheses only commit words two decodes agree on"""
+    print("\nTesting partial transcript stabilization...")
+    
+    try:
+        from streaming import PartialTranscriber
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    partials = []
+    transcriber = PartialTranscriber(None, partials.append, 16000)
+    transcriber.started_at = 0.0
+    
+    transcriber.add_hypothesis("turn of the")
+    assert transcriber.stable_words == []
+    transcriber.add_hypothesis("turn off the light")
+    assert transcriber.stable_words == ["turn"]
+    transcriber.add_hypothesis("turn off the lights")
+    assert transcriber.stable_words == ["turn", "off", "the"]
+    
+    # Stable words are kept even if a later decode disagrees with them
+    transcriber.add_hypothesis("done of the lights")
+    assert transcriber.stable_words == ["turn", "off", "the"]
+    assert partials[-1] == "turn off the lights"
+    assert len(partials) == 3
+    
+    print("✓ Partial transcript stabilization works")
+    return True
+
+def test_latency_metrics():
+    """Test latency histogram percentiles and the metrics JSON dump"""
+    print("\nTesting latency metrics...")
+    
+    from metrics import LatencyMetrics, MetricsDumper, format_prometheus
+    
+    metrics = LatencyMetrics()
+    for ms in range(1, 101):
+        metrics.record("transcribe_audio", ms / 1000.0)
+    metrics.increment("wake_words")
+    
+    stats = metrics.snapshot()["stages"]["transcribe_audio"]
+    assert stats["count"] == 100
+    assert abs(stats["p50"] - 0.050) < 0.050 * 0.07
+    assert abs(stats["p99"] - 0.099) < 0.099 * 0.07
+    assert stats["max"] == 0.1
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "metrics.json")
+        MetricsDumper(path, metrics.snapshot).dump()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        assert data["counters"]["wake_words"] == 1
+        assert data["stages"]["transcribe_audio"]["recent_count"] == 100
+    
+    text = format_prometheus(metrics.snapshot())
+    assert 'voice_assistant_stage_latency_seconds_count{stage="transcribe_audio"} 100' in text
+    assert 'voice_assistant_events_total{event="wake_words"} 1' in text
+    
+    # Estimates that can decrease are gauges, not counters
+    snapshot = dict(metrics.snapshot(), wake_gate_cpu_saved_seconds=-0.007)
+    text = format_prometheus(snapshot)
+    assert "# TYPE voice_assistant_wake_gate_cpu_saved_seconds gauge" in text
+    assert "voice_assistant_wake_gate_cpu_saved_seconds -0.007" in text
+    assert "cpu_saved_seconds_total" not in text and 'event="wake_gate_cpu_saved_seconds"' not in text
+    
+    print("✓ Latency metrics work")
+    return True
+
+def test_wake_word_frames():
+    """Test that wake word frames reach Porcupine unchanged from arrays and bytes"""
+    print("\nTesting wake word frame handling...")
+    
+    try:
+        import numpy as np
+        from wake_word import PorcupineFrameProcessor, EnergyGate
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    class RecordingEngine:
+        frame_length = 4
+        
+        def process(self, pcm):
+            self.pcm = list(pcm)
+            return 0 if self.pcm[0] > 0 else -1
+    
+    engine = RecordingEngine()
+    processor = PorcupineFrameProcessor(engine)
+    
+    frame = np.array([1000, -2, 3, -4], dtype=np.int16)
+    assert processor.process(frame) == 0
+    assert engine.pcm == [1000, -2, 3, -4]
+    
+    assert processor.process((-frame).tobytes()) == -1
+    assert engine.pcm == [-1000, 2, -3, 4]
+    
+    processor.frame[:] = [5, 6, 7, 8]
+    processor.process()
+    assert engine.pcm == [5, 6, 7, 8]
+    
+    # Silent frames are gated; the first loud frame replays them first
+    calls = []
+    engine.process = lambda pcm: calls.append(list(pcm)) or -1
+    gate = EnergyGate(processor, history_frames=2, hangover_frames=0)
+    for value in (0, 1, 2):
+        assert gate.process(np.full(4, value, dtype=np.int16)) == -1
+    assert calls == [] and gate.frames_gated == 3
+    
+    gate.process(np.full(4, 8000, dtype=np.int16))
+    assert calls == [[1] * 4, [2] * 4, [8000] * 4]
+    assert gate.frames_replayed == 2
+    
+    print("✓ Wake word frame handling works")
+    return True
+
+
+def test_decoding_profiles():
+    """Test that decoding profiles map to whisper transcribe() options"""
+    print("\nTesting decoding profiles...")
+    
+    try:
+        from transcription import DECODING_PROFILES, decoding_options
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    fast = decoding_options(DECODING_PROFILES["fast"])
+    assert fast["temperature"] == (0.0,)
+    assert fast["compression_ratio_threshold"] is None and fast["logprob_threshold"] is None
+    assert fast["without_timestamps"] and fast["sample_len"] == 48
+    assert "beam_size" not in fast
+    
+    accurate = decoding_options(DECODING_PROFILES["accurate"])
+    assert accurate["beam_size"] == 5 and "sample_len" not in accurate
+    assert accurate["condition_on_previous_text"] and not accurate["without_timestamps"]
+    
+    with open('config.json', 'r') as f:
+        config = json.load(f)
+    assert config["decoding_profile"] in config["decoding_profiles"]
+    
+    print("✓ Decoding profiles work")
+    return True
+
+
+def test_incremental_features():
+    """Test that incrementally computed log-mel features match whisper's"""
+    print("\nTesting incremental log-mel features...")
+    
+    try:
+        import numpy as np
+        import torch
+        import whisper
+        from features import IncrementalLogMel
+    except ImportError as e:
+        print(f"✗ Skipped, missing dependency: {e}")
+        return False
+    
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(32000) * 0.1).astype(np.float32)
+    samples = np.empty_like(audio)
+    features = IncrementalLogMel(samples, whisper.audio.mel_filters("cpu", 80).numpy())
+    for start in range(0, len(audio), 512):
+        samples[start:start + 512] = audio[start:start + 512]
+        features.update(min(start + 512, len(audio)))
+    
+    # The window transcribe() decodes: content frames, then zeros up to 3000
+    start, end = 3200, 30000
+    mel = whisper.log_mel_spectrogram(torch.from_numpy(audio[start:end]), 80, padding=480000)
+    expected = whisper.pad_or_trim(mel[:, :mel.shape[-1] - 3000], 3000)
+    assert np.abs(features.finalize(start, end) - expected.numpy()).max() < 1e-4
+    
+    print("✓ Incremental log-mel features work")
+    return True
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -147,6 +1136,92 @@ def main():
     # Test 4: Imports
     results.append(("Module Imports", test_imports()))
     
+    # Test 5: Ring buffer
+    results.append(("Ring Buffer", test_ring_buffer()))
+    
+    # Test 6: VAD endpointer
+    results.append(("VAD Endpointer", test_endpointer()))
+    
+    # Test 7: Pipeline
+    try:
+        test_pipeline()
+        results.append(("Pipeline", True))
+    except Exception as e:
+        print(f"✗ Pipeline failed: {e}")
+        results.append(("Pipeline", False))
+    
+    # Test 8: SymSpell cache
+    results.append(("SymSpell Cache", test_symspell_cache()))
+    
+    # Test 9: Batch WAV loading
+    results.append(("Batch WAV Loading", test_wav_loading()))
+    
+    # Test 10: Audio sources
+    results.append(("Audio Sources", test_audio_sources()))
+    
+    # Test 11: Partial transcripts
+    results.append(("Partial Transcripts", test_partial_stabilization()))
+    
+    # Test 12: Latency metrics
+    try:
+        test_latency_metrics()
+        results.append(("Latency Metrics", True))
+    except Exception as e:
+        print(f"✗ Latency metrics failed: {e}")
+        results.append(("Latency Metrics", False))
+    
+    # Test 13: Wake word frames
+    results.append(("Wake Word Frames", test_wake_word_frames()))
+    
+    # Test 14: Decoding profiles
+    results.append(("Decoding Profiles", test_decoding_profiles()))
+    
+    # Test 15: Incremental features
+    results.append(("Incremental Features", test_incremental_features()))
+    
+    # Test 16: Correction cache
+    results.append(("Correction Cache", test_correction_cache()))
+    
+    # Test 17: Output writer
+    try:
+        test_output_writer()
+        results.append(("Output Writer", True))
+    except Exception as e:
+        print(f"✗ Output writer failed: {e}")
+        results.append(("Output Writer", False))
+    
+    # Test 18: Speech segments
+    results.append(("Speech Segments", test_speech_segments()))
+    
+    # Test 19: Domain lexicon
+    results.append(("Domain Lexicon", test_domain_lexicon()))
+    
+    # Test 20: Benchmark comparison
+    results.append(("Benchmark Comparison", test_benchmark_compare()))
+    
+    # Test 21: Multi-source pipeline
+    try:
+        test_fair_pipeline()
+        results.append(("Multi-Source Pipeline", True))
+    except Exception as e:
+        print(f"✗ Multi-source pipeline failed: {e}")
+        results.append(("Multi-Source Pipeline", False))
+    
+    # Test 22: Batch resume
+    results.append(("Batch Resume", test_batch_resume()))
+    
+    # Test 23: Transcription worker pool
+    results.append(("Transcription Worker Pool", test_transcription_pool()))
+    
+    # Test 24: Batched decoding
+    results.append(("Batched Decoding", test_batched_decoding()))
+    
+    # Test 25: Quantized model cache
+    results.append(("Quantized Model Cache", test_quantized_cache()))
+    
+    # Test 26: Multi-source engine
+    results.append(("Multi-Source Engine", test_multi_source_engine()))
+    
     # Summary
     print("\n" + "=" * 60)
     print("Test Summary")
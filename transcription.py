@@ -0,0 +1,845 @@
+"""
+Whisper transcription backends
+Model loading with optional int8 dynamic quantization cached on disk, a
+multi-process pool where each worker loads its own model and receives audio
+through shared memory, and an in-process batcher that decodes several pending
+utterances in one forward pass
+"""
+
+import os
+import glob
+import hashlib
+import threading
+import queue
+import time
+import multiprocessing as mp
+import multiprocessing.connection
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Options passed to whisper's transcribe() for every utterance
+TRANSCRIBE_OPTIONS = {
+    "language": "en",
+    "fp16": False
+}
+
+# Decoding profiles trading accuracy for latency; config.json may override
+# fields or add profiles. None leaves a threshold check disabled
+DECODING_PROFILES = {
+    "fast": {
+        "beam_size": None,
+        "temperature": [0.0],
+        "compression_ratio_threshold": None,
+        "logprob_threshold": None,
+        "no_speech_threshold": 0.6,
+        "condition_on_previous_text": False,
+        "without_timestamps": True,
+        "max_tokens": 48
+    },
+    "balanced": {
+        "beam_size": None,
+        "temperature": [0.0, 0.4, 0.8],
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+        "condition_on_previous_text": False,
+        "without_timestamps": True,
+        "max_tokens": 96
+    },
+    "accurate": {
+        "beam_size": 5,
+        "temperature": [0.0, 0.2, 0.4, 0.6, 0.8, 1.0],
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+        "condition_on_previous_text": True,
+        "without_timestamps": False,
+        "max_tokens": None
+    }
+}
+
+# Per-segment scores whisper reports alongside the text
+SEGMENT_SCORES = ("avg_logprob", "no_speech_prob", "compression_ratio")
+
+# Whisper works on fixed 30 second windows of 16 kHz audio
+WHISPER_SAMPLE_RATE = 16000
+WHISPER_WINDOW_SAMPLES = 30 * WHISPER_SAMPLE_RATE
+
+
+def decoding_options(profile, base=None):
+    """
+    Whisper transcribe() keyword arguments for a decoding profile dict
+    
+    `beam_size` None decodes greedily, a single temperature disables the
+    fallback re-decodes and `max_tokens` None keeps whisper's own limit.
+    """
+    options = dict(TRANSCRIBE_OPTIONS if base is None else base)
+    temperature = profile.get("temperature", 0.0)
+    options["temperature"] = tuple(temperature) if isinstance(temperature, (list, tuple)) else temperature
+    
+    for key in ("compression_ratio_threshold", "logprob_threshold", "no_speech_threshold"):
+        if key in profile:
+            options[key] = profile[key]
+    options["condition_on_previous_text"] = profile.get("condition_on_previous_text", True)
+    options["without_timestamps"] = profile.get("without_timestamps", False)
+    
+    if profile.get("beam_size"):
+        options["beam_size"] = profile["beam_size"]
+    if profile.get("best_of"):
+        options["best_of"] = profile["best_of"]
+    if profile.get("max_tokens"):
+        options["sample_len"] = profile["max_tokens"]
+    return options
+
+# Bump when the quantized model cache layout changes so old files are rebuilt
+QUANTIZED_CACHE_VERSION = 1
+
+
+def quantized_cache_path(cache_dir, model_name):
+    """
+    Cache file for the int8 model, keyed by checkpoint, torch and whisper versions
+    
+    The pickled module depends on torch's quantized kernels and whisper's
+    classes, so a version change of either gets a new file.
+    """
+    import torch
+    import whisper
+    
+    if model_name in whisper._MODELS:
+        # The download URL contains the checkpoint's SHA256; names like "tiny.en" are kept whole
+        source = whisper._MODELS[model_name]
+        name = model_name
+    else:
+        source = f"{os.path.abspath(model_name)}|{os.path.getsize(model_name)}|{os.path.getmtime(model_name)}"
+        name = os.path.splitext(os.path.basename(model_name))[0]
+    
+    key = f"{source}|{torch.__version__}|{whisper.__version__}|{QUANTIZED_CACHE_VERSION}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"whisper_int8_{name}_{digest}.pt")
+
+
+def quantize_whisper(model):
+    """Apply int8 dynamic quantization to all linear layers of a float32 Whisper model"""
+    import torch
+    
+    # quantize_dynamic matches module types exactly, so subclasses of
+    # nn.Linear (whisper's adds a dtype cast) are replaced by plain ones
+    # sharing the same weights
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    
+    quantization = getattr(torch, "ao", torch).quantization
+    return quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(model_name, quantize=False, cache_dir=None):
+    """
+    Load a Whisper model on the CPU, optionally int8 quantized
+    
+    Returns a tuple of (model, source, seconds) where source is "checkpoint",
+    "quantized" (quantized at load) or "cache" (quantized model read from
+    `cache_dir`). A new quantized model is written to the cache and stale
+    cache files for the same model name are removed.
+    """
+    import torch
+    import whisper
+    
+    start = time.perf_counter()
+    if not quantize:
+        return whisper.load_model(model_name), "checkpoint", time.perf_counter() - start
+    
+    cache_path = quantized_cache_path(cache_dir, model_name) if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            model = torch.load(cache_path, weights_only=False)
+            return model.eval(), "cache", time.perf_counter() - start
+        except Exception as e:
+            print(f"Quantized Whisper cache unreadable, rebuilding: {e}")
+    
+    # Dynamic quantization targets the CPU
+    model = quantize_whisper(whisper.load_model(model_name, device="cpu")).eval()
+    
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            
+            # Several worker processes may build the cache at once; each
+            # writes its own temp file and the last rename wins
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            torch.save(model, temp_path)
+            os.replace(temp_path, cache_path)
+            
+            # Only files of this exact model name: the digest is always 16 characters
+            prefix = os.path.basename(cache_path).rsplit('_', 1)[0]
+            for stale in glob.glob(os.path.join(cache_dir, f"{prefix}_{'?' * 16}.pt")):
+                if os.path.abspath(stale) != os.path.abspath(cache_path):
+                    os.remove(stale)
+        except Exception as e:
+            print(f"Failed to write quantized Whisper cache: {e}")
+    
+    return model, "quantized", time.perf_counter() - start
+
+
+def decoded_result(result, duration, tokenizer):
+    """
+    transcribe()-style result dict for one whisper DecodingResult covering `duration` seconds
+    
+    As in transcribe(), the text is decoded from the text tokens only (those
+    before `tokenizer.eot`), so special tokens never reach it.
+    """
+    text = tokenizer.decode([token for token in result.tokens if token < tokenizer.eot])
+    return {
+        "text": text,
+        "language": result.language,
+        "segments": [{
+            "start": 0.0,
+            "end": duration,
+            "text": text,
+            "tokens": result.tokens,
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob
+        }]
+    }
+
+
+def result_confidence(result):
+    """
+    Confidence summary of a transcribe() result, or None without scored segments
+    
+    avg_logprob is averaged over segments weighted by duration;
+    no_speech_prob and compression_ratio are the worst (highest) values.
+    """
+    segments = [s for s in result.get("segments") or [] if s.get("avg_logprob") is not None]
+    if not segments:
+        return None
+    
+    weights = [max(segment["end"] - segment["start"], 1e-3) for segment in segments]
+    return {
+        "avg_logprob": sum(w * s["avg_logprob"] for w, s in zip(weights, segments)) / sum(weights),
+        "no_speech_prob": max(s["no_speech_prob"] for s in segments),
+        "compression_ratio": max(s["compression_ratio"] for s in segments)
+    }
+
+
+def scored_segments(result):
+    """
+    Text, start, end and SEGMENT_SCORES of each segment of a transcribe() result
+    
+    Results without segments give one segment with the whole text and no
+    scores (None).
+    """
+    segments = [
+        dict({key: segment.get(key) for key in ("start", "end") + SEGMENT_SCORES}, text=segment["text"].strip())
+        for segment in result.get("segments") or []
+    ]
+    if not segments:
+        segments = [dict(dict.fromkeys(("start", "end") + SEGMENT_SCORES), text=result["text"].strip())]
+    return segments
+
+
+def speech_segments(result, no_speech_threshold=0.6):
+    """
+    scored_segments() of a result without those that are probably not speech
+    
+    Segments whose no_speech_prob is at least `no_speech_threshold` (None
+    keeps them all) are dropped, as are empty ones. Returns (segments,
+    number dropped as non-speech).
+    """
+    segments = scored_segments(result)
+    kept = [
+        segment for segment in segments
+        if no_speech_threshold is None or segment["no_speech_prob"] is None
+        or segment["no_speech_prob"] < no_speech_threshold
+    ]
+    return [segment for segment in kept if segment["text"]], len(segments) - len(kept)
+
+
+def fallback_temperatures(options):
+    """Temperatures transcribe() tries in turn for a window with these options"""
+    temperatures = options.get("temperature", 0.0)
+    return list(temperatures) if isinstance(temperatures, (list, tuple)) else [temperatures]
+
+
+def window_decoding_options(options, temperature):
+    """whisper.DecodingOptions for decoding one window at `temperature` with transcribe() options"""
+    import whisper
+    
+    return whisper.DecodingOptions(
+        language=options.get("language"),
+        fp16=options.get("fp16", False),
+        temperature=temperature,
+        beam_size=options.get("beam_size") if temperature == 0 else None,
+        best_of=options.get("best_of") if temperature > 0 else None,
+        sample_len=options.get("sample_len"),
+        without_timestamps=options.get("without_timestamps", False)
+    )
+
+
+def needs_fallback(result, options):
+    """Whether a decoded window fails transcribe()'s compression ratio or log-prob check without being silence"""
+    no_speech_threshold = options.get("no_speech_threshold", 0.6)
+    if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+        return False
+    
+    compression_ratio_threshold = options.get("compression_ratio_threshold", 2.4)
+    logprob_threshold = options.get("logprob_threshold", -1.0)
+    return (
+        (compression_ratio_threshold is not None and result.compression_ratio > compression_ratio_threshold)
+        or (logprob_threshold is not None and result.avg_logprob < logprob_threshold)
+    )
+
+
+def window_tokenizer(model):
+    """The tokenizer transcribe() decodes a model's text tokens with"""
+    import whisper
+    
+    return whisper.tokenizer.get_tokenizer(model.is_multilingual, num_languages=model.num_languages)
+
+
+def window_result(result, duration, options, tokenizer):
+    """decoded_result() of a window, with the text dropped if transcribe() would judge it silence"""
+    no_speech_threshold = options.get("no_speech_threshold", 0.6)
+    logprob_threshold = options.get("logprob_threshold", -1.0)
+    
+    output = decoded_result(result, duration, tokenizer)
+    if (no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold
+            and (logprob_threshold is None or result.avg_logprob < logprob_threshold)):
+        output["text"] = ""
+        output["segments"] = []
+    return output
+
+
+def window_features(audio, n_mels=80):
+    """
+    Log-mel features of a clip of up to 30 seconds, as transcribe() builds its window
+    
+    The clip is normalized together with 30 seconds of padding, and its
+    content frames are then padded with zeros to 3000 frames.
+    """
+    import torch
+    import whisper
+    
+    mel = whisper.log_mel_spectrogram(torch.as_tensor(audio), n_mels, padding=whisper.audio.N_SAMPLES)
+    return whisper.pad_or_trim(mel[:, :mel.shape[-1] - whisper.audio.N_FRAMES], whisper.audio.N_FRAMES)
+
+
+def transcribe_features(model, features, duration, options=None):
+    """
+    Transcribe a clip of up to 30 seconds from precomputed log-mel features
+    
+    `features` is an (n_mels, 3000) array or tensor. Decoding follows
+    transcribe() for a single window: each temperature in `options` is tried
+    until the result passes the compression ratio and log-prob checks, and
+    the text is dropped if the window is judged to be silence.
+    """
+    import torch
+    import whisper
+    
+    options = TRANSCRIBE_OPTIONS if options is None else options
+    mel = torch.as_tensor(features).to(model.device)
+    for temperature in fallback_temperatures(options):
+        result = whisper.decode(model, mel, window_decoding_options(options, temperature))
+        if not needs_fallback(result, options):
+            break
+    
+    return window_result(result, duration, options, window_tokenizer(model))
+
+
+def transcription_worker(worker_id, model_name, num_threads, options, warmup, quantize, cache_dir,
+                         task_conn, result_conn):
+    """Worker process: load Whisper once, then transcribe audio from shared memory"""
+    try:
+        import torch
+        
+        torch.set_num_threads(num_threads)
+        model, _, _ = load_whisper_model(model_name, quantize, cache_dir)
+        
+        # Dummy decode so the first real utterance doesn't pay one-time setup costs
+        if warmup:
+            model.transcribe(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32), **options)
+    except Exception as e:
+        result_conn.send(("failed", worker_id, str(e)))
+        return
+    
+    result_conn.send(("ready", worker_id, None))
+    
+    while True:
+        try:
+            task = task_conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        
+        task_id, shm_name, num_samples, task_options = task
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                audio = np.ndarray((num_samples,), dtype=np.float32, buffer=shm.buf)
+                result = model.transcribe(audio, **(task_options or options))
+                del audio
+            finally:
+                shm.close()
+            result_conn.send(("result", task_id, result))
+        except Exception as e:
+            result_conn.send(("error", task_id, str(e)))
+
+
+class WorkerHandle:
+    """One worker process, its task and result pipes and the tasks sent to it"""
+    
+    def __init__(self, worker_id, process, task_conn, result_conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.task_conn = task_conn
+        self.result_conn = result_conn
+        self.tasks = set()
+        self.state = "starting"
+
+
+class ProcessPoolTranscriber:
+    """Pool of Whisper worker processes returning results in submission order"""
+    
+    def __init__(self, model_name, num_workers=2, threads_per_worker=1, options=None,
+                 max_pending=None, warmup=True, quantize=False, cache_dir=None):
+        """
+        Configure the pool; processes are started by start()
+        
+        At most `max_pending` utterances (default two per worker) are in
+        flight at once; submit() blocks beyond that. `ready` is set once the
+        first worker has loaded (and warmed up) its model, or all have failed.
+        With `quantize` each worker loads the int8 model from `cache_dir`.
+        
+        Each utterance is sent to the least busy worker. If a worker process
+        dies, the utterances it held fail with RuntimeError and a new worker
+        takes its place; a worker that dies before its model has loaded is
+        counted in `failed_workers` and not replaced.
+        """
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.warmup = warmup
+        self.quantize = quantize
+        self.cache_dir = cache_dir
+        self.options = dict(TRANSCRIBE_OPTIONS if options is None else options)
+        
+        self._context = mp.get_context("spawn")
+        self._workers = {}
+        self._collector = None
+        self._running = False
+        self._wakeup_recv, self._wakeup_send = self._context.Pipe(duplex=False)
+        self._slots = threading.BoundedSemaphore(max_pending or num_workers * 2)
+        self._lock = threading.Lock()
+        
+        # Submission order bookkeeping
+        self._next_task_id = 0
+        self._next_to_deliver = 0
+        self._pending = {}
+        self._completed = {}
+        
+        self.ready_workers = 0
+        self.failed_workers = 0
+        self.restarts = 0
+        self.ready = threading.Event()
+    
+    def start(self):
+        """Spawn worker processes and the result collector thread"""
+        self._running = True
+        with self._lock:
+            for worker_id in range(self.num_workers):
+                self._spawn(worker_id)
+        
+        self._collector = threading.Thread(target=self._collect_results, daemon=True)
+        self._collector.start()
+    
+    def _spawn(self, worker_id):
+        """Start a worker process in slot `worker_id`"""
+        task_recv, task_send = self._context.Pipe(duplex=False)
+        result_recv, result_send = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=transcription_worker,
+            args=(worker_id, self.model_name, self.threads_per_worker, self.options,
+                  self.warmup, self.quantize, self.cache_dir, task_recv, result_send),
+            daemon=True
+        )
+        process.start()
+        
+        # The worker has its own copies; closing ours lets each side see EOF when the other goes away
+        task_recv.close()
+        result_send.close()
+        self._workers[worker_id] = WorkerHandle(worker_id, process, task_send, result_recv)
+    
+    @property
+    def pending(self):
+        """Number of submitted utterances without a result yet"""
+        return len(self._pending)
+    
+    def submit(self, audio, options=None):
+        """
+        Queue float32 audio for transcription; returns a Future for whisper's result dict
+        
+        `options` replaces the pool's transcribe() options for this utterance.
+        """
+        if self.failed_workers == self.num_workers:
+            raise RuntimeError("No transcription workers available")
+        
+        audio = np.asarray(audio, dtype=np.float32)
+        self._slots.acquire()
+        
+        # One copy into shared memory; workers read it without pickling the samples
+        shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+        np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf)[:] = audio
+        
+        future = Future()
+        with self._lock:
+            # Prefer workers that have loaded their model, then the least busy
+            workers = [worker for worker in self._workers.values() if worker.state in ("starting", "ready")]
+            if not workers:
+                shm.close()
+                shm.unlink()
+                self._slots.release()
+                raise RuntimeError("No transcription workers available")
+            worker = min(workers, key=lambda worker: (worker.state != "ready", len(worker.tasks)))
+            
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._pending[task_id] = (future, shm)
+            worker.tasks.add(task_id)
+            try:
+                worker.task_conn.send((task_id, shm.name, len(audio), options))
+            except OSError:
+                # The worker just died; the collector fails its tasks
+                pass
+        return future
+    
+    def _collect_results(self):
+        """Receive worker results, resolve futures strictly in submission order and replace dead workers"""
+        while self._running:
+            with self._lock:
+                waitables = {self._wakeup_recv: None}
+                for worker in self._workers.values():
+                    waitables[worker.result_conn] = worker
+                    waitables[worker.process.sentinel] = worker
+            
+            for ready in mp.connection.wait(list(waitables)):
+                worker = waitables[ready]
+                if worker is None:
+                    # Woken up by stop()
+                    self._wakeup_recv.recv()
+                    continue
+                if worker.state == "exited":
+                    continue
+                
+                if ready is worker.result_conn:
+                    try:
+                        self._handle_message(worker, worker.result_conn.recv())
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                
+                # Deliver anything it sent before exiting, then fail what it still held
+                try:
+                    while worker.result_conn.poll():
+                        self._handle_message(worker, worker.result_conn.recv())
+                except (EOFError, OSError):
+                    pass
+                self._worker_exited(worker)
+    
+    def _handle_message(self, worker, message):
+        """Handle a ready, failed, result or error message from a worker"""
+        kind, key, payload = message
+        if kind == "ready":
+            with self._lock:
+                worker.state = "ready"
+                self.ready_workers += 1
+            self.ready.set()
+            return
+        if kind == "failed":
+            self._mark_failed(worker, payload)
+            return
+        
+        with self._lock:
+            worker.tasks.discard(key)
+            deliverable = self._complete(key, kind, payload)
+        self._deliver(deliverable)
+    
+    def _mark_failed(self, worker, reason):
+        """Record that a worker could not load its model"""
+        with self._lock:
+            worker.state = "failed"
+            self.failed_workers += 1
+        print(f"Transcription worker {worker.worker_id} failed to start: {reason}")
+        if self.failed_workers == self.num_workers:
+            self.ready.set()
+    
+    def _worker_exited(self, worker):
+        """Fail the tasks of a worker whose process exited and replace it if it was serving"""
+        worker.process.join(timeout=1)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        exitcode = worker.process.exitcode
+        
+        if worker.state == "starting" and self._running:
+            self._mark_failed(worker, f"exited with code {exitcode}")
+        
+        with self._lock:
+            deliverable = []
+            for task_id in sorted(worker.tasks):
+                deliverable += self._complete(
+                    task_id, "error", f"Transcription worker {worker.worker_id} exited with code {exitcode}"
+                )
+            worker.tasks.clear()
+            worker.task_conn.close()
+            worker.result_conn.close()
+            
+            was_ready = worker.state == "ready"
+            worker.state = "exited"
+            if was_ready:
+                self.ready_workers -= 1
+            if was_ready and self._running:
+                print(f"Transcription worker {worker.worker_id} exited with code {exitcode}, restarting")
+                self.restarts += 1
+                self._spawn(worker.worker_id)
+            else:
+                del self._workers[worker.worker_id]
+        self._deliver(deliverable)
+    
+    def _complete(self, task_id, kind, payload):
+        """Store a task's outcome; returns the futures now deliverable in order (lock held)"""
+        if task_id not in self._pending or task_id in self._completed:
+            return []
+        
+        self._completed[task_id] = (kind, payload)
+        deliverable = []
+        while self._next_to_deliver in self._completed:
+            task_id = self._next_to_deliver
+            future, shm = self._pending.pop(task_id)
+            deliverable.append((future, shm) + self._completed.pop(task_id))
+            self._next_to_deliver += 1
+        return deliverable
+    
+    def _deliver(self, deliverable):
+        """Release the shared memory of completed tasks and resolve their futures"""
+        for future, shm, kind, payload in deliverable:
+            shm.close()
+            shm.unlink()
+            self._slots.release()
+            if kind == "result":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+    
+    def stop(self, timeout=5):
+        """Stop worker processes and release outstanding shared memory"""
+        self._running = False
+        with self._lock:
+            workers = list(self._workers.values())
+        
+        for worker in workers:
+            try:
+                worker.task_conn.send(None)
+            except OSError:
+                pass
+        
+        for worker in workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        
+        self._wakeup_send.send(None)
+        if self._collector is not None:
+            self._collector.join(timeout=timeout)
+        
+        with self._lock:
+            for future, shm in self._pending.values():
+                shm.close()
+                shm.unlink()
+                if not future.done():
+                    future.set_exception(RuntimeError("Transcriber stopped"))
+            self._pending.clear()
+            self._completed.clear()
+            
+            for worker in self._workers.values():
+                worker.task_conn.close()
+                worker.result_conn.close()
+            self._workers = {}
+
+
+class BatchTranscriber:
+    """Collects pending utterances and decodes them together in batches"""
+    
+    def __init__(self, model, batch_size=8, max_wait=0.05, options=None, max_pending=None):
+        """
+        Configure batching for an already loaded Whisper model
+        
+        A batch is decoded as soon as `batch_size` utterances are waiting, or
+        `max_wait` seconds after the first one arrived. At most `max_pending`
+        utterances (default four batches) may wait; submit() blocks beyond that.
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.options = dict(TRANSCRIBE_OPTIONS if options is None else options)
+        self._queue = queue.Queue(maxsize=max_pending or batch_size * 4)
+        self._thread = None
+        self._in_flight = 0
+        self.is_running = False
+        
+        # Batch size statistics
+        self.batches = 0
+        self.batched_utterances = 0
+    
+    def start(self):
+        """Start the batching thread"""
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    @property
+    def pending(self):
+        """Number of submitted utterances without a result yet"""
+        return self._queue.qsize() + self._in_flight
+    
+    def submit(self, audio, options=None, features=None):
+        """
+        Queue float32 audio for transcription; returns a Future for whisper's result dict
+        
+        `options` replaces the transcriber's options for this utterance;
+        utterances with different options are decoded in separate batches.
+        Precomputed log-mel `features` of the clip are used instead of
+        computing them again.
+        """
+        future = Future()
+        self._queue.put((np.asarray(audio, dtype=np.float32), future, options or self.options, features))
+        return future
+    
+    def _run(self):
+        """Gather up to batch_size utterances within max_wait and decode them together"""
+        while self.is_running:
+            try:
+                batch = [self._queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._in_flight = len(batch)
+            groups = {}
+            for item in batch:
+                groups.setdefault(repr(sorted(item[2].items())), []).append(item)
+            
+            for group in groups.values():
+                try:
+                    results = self.transcribe_batch(
+                        [item[0] for item in group], group[0][2], [item[3] for item in group]
+                    )
+                except Exception as e:
+                    for _, future, _, _ in group:
+                        future.set_exception(e)
+                    continue
+                
+                for (_, future, _, _), result in zip(group, results):
+                    future.set_result(result)
+            self._in_flight = 0
+    
+    def transcribe_batch(self, audios, options=None, features=None):
+        """
+        Transcribe a list of float32 clips, returning one result dict per clip
+        
+        Clips that fit in a single 30 second window get the features
+        transcribe() would decode (see window_features(); or their entry in
+        `features`, if given), stacked into one batch and decoded
+        together with the same rules as transcribe_features() (see
+        decode_windows() for beam search): clips failing
+        the compression ratio or log-prob check are decoded again, as a
+        smaller batch, at each following temperature of `options`, and
+        windows judged silent lose their text. Longer clips fall back to
+        whisper's sequential transcribe().
+        """
+        import torch
+        
+        options = options or self.options
+        tokenizer = window_tokenizer(self.model)
+        results = [None] * len(audios)
+        short = [i for i, audio in enumerate(audios) if len(audio) <= WHISPER_WINDOW_SAMPLES]
+        
+        for i, audio in enumerate(audios):
+            if i not in short:
+                results[i] = self.model.transcribe(audio, **options)
+        
+        for start in range(0, len(short), self.batch_size):
+            indices = short[start:start + self.batch_size]
+            mel = torch.stack([
+                torch.from_numpy(features[i]) if features and features[i] is not None
+                else window_features(audios[i], self.model.dims.n_mels)
+                for i in indices
+            ]).to(self.model.device)
+            
+            # One encoder pass for the batch; fallback decodes reuse its output
+            with torch.no_grad():
+                audio_features = self.model.embed_audio(mel)
+            
+            decoded = [None] * len(indices)
+            remaining = list(range(len(indices)))
+            for temperature in fallback_temperatures(options):
+                batch = self.decode_windows(audio_features[remaining], window_decoding_options(options, temperature))
+                for j, result in zip(remaining, batch):
+                    decoded[j] = result
+                remaining = [j for j in remaining if needs_fallback(decoded[j], options)]
+                if not remaining:
+                    break
+            
+            for i, result in zip(indices, decoded):
+                results[i] = window_result(result, len(audios[i]) / WHISPER_SAMPLE_RATE, options, tokenizer)
+            
+            self.batches += 1
+            self.batched_utterances += len(indices)
+        
+        return results
+    
+    def decode_windows(self, audio_features, decode_options):
+        """
+        whisper.decode() encoded windows, returning one DecodingResult each
+        
+        Greedy decoding runs on the whole batch. Beam search and best-of
+        sampling decode one window at a time, since whisper only expands the
+        audio features per beam or candidate for a single window.
+        """
+        import whisper
+        
+        if len(audio_features) > 1 and (decode_options.beam_size or decode_options.best_of):
+            return [whisper.decode(self.model, audio_features[j:j + 1], decode_options)[0]
+                    for j in range(len(audio_features))]
+        return whisper.decode(self.model, audio_features, decode_options)
+    
+    def stop(self, timeout=5):
+        """Stop the batching thread and fail utterances still waiting"""
+        self.is_running = False
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        
+        while True:
+            try:
+                _, future, _, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("Transcriber stopped"))
@@ -7,50 +7,116 @@ Uses Porcupine for wake word, Whisper for ASR, and SymSpell for correction
 import os
 import sys
 import json
+import signal
+import argparse
 import wave
-import struct
 import threading
 import queue
 import time
+import multiprocessing
+import contextlib
 from datetime import datetime
 from pathlib import Path
 
 import numpy as np
-import pyaudio
 import pvporcupine
-import whisper
-from symspellpy import SymSpell, Verbosity
 
-import tkinter as tk
-from tkinter import ttk, scrolledtext
-import matplotlib
-matplotlib.use('TkAgg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
+from audio_capture import AudioRingBuffer, AudioStream, create_audio_source
+from endpointing import EnergyEndpointer
+from pipeline import Pipeline, PipelineStage, Utterance
+from transcription import (ProcessPoolTranscriber, BatchTranscriber, TRANSCRIBE_OPTIONS, DECODING_PROFILES,
+                           WHISPER_WINDOW_SAMPLES, decoding_options, load_whisper_model, result_confidence,
+                           speech_segments, transcribe_features)
+from features import IncrementalLogMel
+from output_writer import OutputWriter
+from streaming import PartialTranscriber
+from wake_word import PorcupineFrameProcessor, EnergyGate
+from metrics import LatencyMetrics, LatencyHistogram, MetricsDumper, MetricsServer, process_rss_bytes
+from text_correction import (CorrectionCache, DomainLexicon, dictionary_cache_key, lexicon_cache_key,
+                             load_symspell, normalize_text)
+
 
 
 class VoiceAssistant:
     """Main voice assistant class with wake word detection and speech recognition"""
     
-    def __init__(self, config_path="config.json"):
-        """Initialize the voice assistant with configuration"""
+    def __init__(self, config_path="config.json", audio_source=None):
+        """
+        Initialize the voice assistant with configuration
+        
+        `audio_source` is an AudioSource (microphone, WAV replay, synthetic)
+        or a source configuration dict overriding the `audio_source` and
+        `audio_sources` entries with a single input.
+        """
         self.load_config(config_path)
         
         # Audio setup
-        self.audio = pyaudio.PyAudio()
         self.sample_rate = self.config['audio_sample_rate']
         self.chunk_size = 512
         
         # State management
         self.is_running = False
-        self.is_listening = False
-        self.audio_queue = queue.Queue()
         self.result_queue = queue.Queue()
         
+        # Continuous capture: each input stream has a persistent source feeding its own ring buffer
+        self.streams = self.create_streams(audio_source)
+        self.stream_names = {stream.name: stream for stream in self.streams}
+        self.preroll_samples = int(self.sample_rate * self.config.get('command_preroll', 0.3))
+        
+        # The first stream is the one the GUI shows and single-stream callers use
+        self.ring_buffer = self.streams[0].ring_buffer
+        self.audio_source = self.streams[0].source
+        self.endpointer = self.streams[0].endpointer
+        
+        # Command processing runs on its own workers so wake word detection never blocks
+        self.pipeline = self.create_pipeline()
+        
+        # Per-stage latency histograms, optionally dumped to a JSON file
+        self.metrics = LatencyMetrics(window=self.config.get('metrics_window', 60))
+        self.real_time_factor = LatencyHistogram(window=self.config.get('metrics_window', 60))
+        self.metrics_server = None
+        self.metrics_dumper = None
+        if self.config.get('metrics_file'):
+            self.metrics_dumper = MetricsDumper(
+                self.config['metrics_file'],
+                self.get_metrics,
+                interval=self.config.get('metrics_interval', 10)
+            )
+        
+        # Named decoding profiles; the active one can be switched at runtime
+        self.profile_options = self.load_decoding_profiles()
+        self.decoding_profile = self.config.get('decoding_profile', 'balanced')
+        if self.decoding_profile not in self.profile_options:
+            print(f"Unknown decoding profile '{self.decoding_profile}', using 'balanced'")
+            self.decoding_profile = 'balanced'
+        
+        # Results are written to the output file by a background thread
+        self.output_writer = self.create_output_writer()
+        
+        # Models load in the background; each sets its readiness event when done
+        self.porcupine = None
+        self.wake_word_gate = None
+        self.whisper_model = None
+        self.whisper_lock = threading.Lock()
+        self.transcriber = None
+        self.transcribing = set()
+        self.sym_spell = None
+        self.correction_cache = None
+        self.correction_cache_key = None
+        self.general_dictionary_key = None
+        self.domain_lexicon = None
+        self.porcupine_ready = threading.Event()
+        self.whisper_ready = threading.Event()
+        self.symspell_ready = threading.Event()
+        self.model_load_times = {}
+        self.mel_filters = None
+        
+        # Memory held by the last and largest utterance's audio and feature buffers
+        self.last_utterance_bytes = 0
+        self.peak_utterance_bytes = 0
+        
         # Initialize models
-        self.init_porcupine()
-        self.init_whisper()
-        self.init_symspell()
+        self.init_models()
         
     def load_config(self, config_path):
         """Load configuration from JSON file"""
@@ -64,75 +130,490 @@ class VoiceAssistant:
                 "wake_word": "susie",
                 "porcupine_sensitivity": 0.5,
                 "whisper_model": "tiny",
+                "whisper_warmup": True,
+                "whisper_quantize": False,
+                "whisper_cache_dir": "cache",
+                "decoding_profile": "balanced",
+                "decoding_profiles": {},
+                "parallel_init": True,
+                "transcription_workers": 0,
+                "transcription_threads_per_worker": 1,
+                "transcription_batch_size": 1,
+                "transcription_batch_wait": 0.05,
                 "audio_sample_rate": 16000,
+                "audio_source": {"type": "pyaudio"},
+                "audio_sources": [],
                 "recording_duration": 5,
+                "command_preroll": 0.3,
+                "ring_buffer_duration": 30,
+                "vad_enabled": True,
+                "vad_threshold_db": 10,
+                "vad_min_energy_db": -50,
+                "vad_hangover": 0.8,
+                "vad_min_duration": 1.0,
+                "vad_no_speech_timeout": 3.0,
+                "vad_padding": 0.2,
+                "wake_gate_enabled": True,
+                "wake_gate_threshold_db": 6,
+                "wake_gate_min_energy_db": -65,
+                "wake_gate_history_frames": 10,
+                "wake_gate_hangover_frames": 10,
+                "incremental_features": True,
+                "streaming_partials": False,
+                "streaming_stride": 1.0,
+                "streaming_min_audio": 0.5,
+                "metrics_file": None,
+                "metrics_interval": 10,
+                "metrics_window": 60,
+                "metrics_http_port": None,
+                "metrics_http_host": "127.0.0.1",
+                "pipeline_stages": {
+                    "endpointing": {"queue_size": 4, "drop_policy": "drop_newest"},
+                    "transcription": {"queue_size": 8, "drop_policy": "block"},
+                    "correction": {"queue_size": 8, "drop_policy": "block"},
+                    "output": {"queue_size": 32, "drop_policy": "block"}
+                },
+                "no_speech_drop_threshold": 0.6,
+                "correction_skip_logprob": -0.3,
                 "output_file": "output.txt",
+                "output_format": "text",
+                "output_fsync_interval": 5,
+                "output_max_bytes": None,
+                "output_max_age": None,
+                "output_backup_count": 5,
                 "symspell_max_edit_distance": 2,
-                "symspell_prefix_length": 7
+                "symspell_prefix_length": 7,
+                "symspell_cache_dir": "cache",
+                "domain_lexicon": None,
+                "domain_lexicon_boost": 2.0,
+                "domain_lexicon_reload_interval": 2,
+                "correction_cache_size": 1000,
+                "correction_token_cache_size": 20000,
+                "correction_warm_file": None
             }
     
+    def load_decoding_profiles(self):
+        """
+        transcribe() options for each decoding profile
+        
+        Entries in the `decoding_profiles` config override fields of the
+        built-in profile of the same name; new names start from `balanced`.
+        """
+        profiles = {name: dict(profile) for name, profile in DECODING_PROFILES.items()}
+        for name, overrides in self.config.get('decoding_profiles', {}).items():
+            profiles.setdefault(name, dict(DECODING_PROFILES['balanced'])).update(overrides)
+        return {name: decoding_options(profile) for name, profile in profiles.items()}
+    
+    def set_decoding_profile(self, name):
+        """Switch the decoding profile used for the next commands"""
+        if name not in self.profile_options:
+            raise ValueError(f"Unknown decoding profile '{name}', expected one of {', '.join(self.profile_options)}")
+        self.decoding_profile = name
+        print(f"Decoding profile: {name}")
+    
+    def create_output_writer(self):
+        """Create the asynchronous output file writer from configuration"""
+        settings = dict(
+            fsync_interval=self.config.get('output_fsync_interval', 5),
+            max_bytes=self.config.get('output_max_bytes'),
+            max_age=self.config.get('output_max_age'),
+            backup_count=self.config.get('output_backup_count', 5)
+        )
+        output_file = self.config.get('output_file', 'output.txt')
+        try:
+            return OutputWriter(output_file, self.config.get('output_format', 'text'), **settings)
+        except ValueError as e:
+            print(f"{e}, using 'text'")
+            return OutputWriter(output_file, 'text', **settings)
+    
+    def create_streams(self, audio_source=None):
+        """
+        Create the input streams, each with its own ring buffer and endpointer
+        
+        `audio_source` (an AudioSource or source configuration) gives a single
+        stream. Otherwise every entry of `audio_sources` is a stream, named by
+        its "name" field, and without any the `audio_source` entry is the only one.
+        """
+        if audio_source is not None:
+            entries = [audio_source]
+        else:
+            entries = self.config.get('audio_sources') or [self.config.get('audio_source', {"type": "pyaudio"})]
+        
+        ring_samples = int(self.sample_rate * self.config.get('ring_buffer_duration', 30))
+        streams = []
+        for index, source in enumerate(entries):
+            name = f"source{index + 1}"
+            if isinstance(source, dict):
+                options = dict(source)
+                name = str(options.pop('name', name))
+                source = create_audio_source(options, self.sample_rate, self.chunk_size)
+            
+            stream = AudioStream(name, source, AudioRingBuffer(ring_samples))
+            
+            # Voice activity endpointing ends command recording when speech stops
+            if self.config.get('vad_enabled', True):
+                stream.endpointer = self.create_endpointer()
+            streams.append(stream)
+        
+        if len({stream.name for stream in streams}) != len(streams):
+            raise ValueError("Audio source names must be unique")
+        return streams
+    
+    def get_stream(self, name=None):
+        """The stream called `name`, or the first stream"""
+        return self.stream_names.get(name, self.streams[0])
+    
+    def source_prefix(self, name):
+        """Prefix identifying the stream in messages, when there is more than one"""
+        return f"[{name or self.streams[0].name}] " if len(self.streams) > 1 else ""
+    
+    @property
+    def is_listening(self):
+        """Whether a command is being recorded on any stream"""
+        return any(stream.is_listening for stream in self.streams)
+    
+    def create_endpointer(self):
+        """Create a voice activity endpointer from configuration"""
+        return EnergyEndpointer(
+            self.sample_rate,
+            threshold_db=self.config.get('vad_threshold_db', 10),
+            min_energy_db=self.config.get('vad_min_energy_db', -50),
+            hangover=self.config.get('vad_hangover', 0.8),
+            min_duration=self.config.get('vad_min_duration', 1.0),
+            max_duration=self.config.get('recording_duration', 5),
+            no_speech_timeout=self.config.get('vad_no_speech_timeout', 3.0),
+            padding=self.config.get('vad_padding', 0.2)
+        )
+    
+    def create_feature_extractor(self, samples):
+        """
+        Incremental log-mel features for a recording buffer, or None
+        
+        Features are only used by the in-process model; worker processes
+        compute their own.
+        """
+        if not self.config.get('incremental_features', True) or not self.whisper_ready.is_set():
+            return None
+        if not self.whisper_model or isinstance(self.transcriber, ProcessPoolTranscriber):
+            return None
+        
+        if self.mel_filters is None:
+            import whisper
+            self.mel_filters = whisper.audio.mel_filters("cpu", self.whisper_model.dims.n_mels).numpy()
+        return IncrementalLogMel(samples, self.mel_filters)
+    
+    def create_partial_transcriber(self, source=None):
+        """Create a partial transcriber for the next recording on a stream, or None if streaming is off"""
+        if not self.config.get('streaming_partials', False) or not self.whisper_ready.is_set():
+            return None
+        if not self.whisper_model and not self.transcriber:
+            return None
+        
+        return PartialTranscriber(
+            self.transcribe_partial,
+            lambda text: self.result_queue.put(("partial", f"{self.source_prefix(source)}{text}")),
+            self.sample_rate,
+            stride=self.config.get('streaming_stride', 1.0),
+            min_audio=self.config.get('streaming_min_audio', 0.5)
+        )
+    
+    def create_pipeline(self):
+        """
+        Create the endpointing -> transcription -> correction -> output pipeline
+        
+        With several streams, each records its commands in its own
+        endpointing stage, and the shared transcription and correction stages
+        take commands from the streams in turn.
+        """
+        stage_config = self.config.get('pipeline_stages', {})
+        multiple = len(self.streams) > 1
+        
+        def create_stage(name, handler, kind=None):
+            kind = kind or name
+            options = stage_config.get(kind, {})
+            return PipelineStage(
+                name,
+                handler,
+                queue_size=options.get('queue_size', 8),
+                drop_policy=options.get('drop_policy', 'block'),
+                block_timeout=options.get('block_timeout'),
+                fair=multiple and kind in ("transcription", "correction")
+            )
+        
+        shared = [
+            create_stage("transcription", self.transcription_stage),
+            create_stage("correction", self.correction_stage),
+            create_stage("output", self.output_stage)
+        ]
+        if not multiple:
+            return Pipeline([create_stage("endpointing", self.endpoint_stage)] + shared)
+        
+        inputs = {
+            stream.name: create_stage(f"endpointing:{stream.name}", self.endpoint_stage, "endpointing")
+            for stream in self.streams
+        }
+        return Pipeline(shared, inputs)
+    
+    def init_models(self):
+        """Initialize Porcupine, Whisper and SymSpell, concurrently unless parallel_init is off"""
+        initializers = [
+            ("porcupine", self.init_porcupine, self.porcupine_ready),
+            ("whisper", self.init_whisper, self.whisper_ready),
+            ("symspell", self.init_symspell, self.symspell_ready)
+        ]
+        
+        for name, initializer, ready in initializers:
+            if self.config.get('parallel_init', True):
+                threading.Thread(
+                    target=self.run_initializer,
+                    args=(name, initializer, ready),
+                    name=f"init-{name}",
+                    daemon=True
+                ).start()
+            else:
+                self.run_initializer(name, initializer, ready)
+    
+    def run_initializer(self, name, initializer, ready):
+        """Run one model initializer, record its load time and signal readiness"""
+        start = time.perf_counter()
+        try:
+            initializer()
+        except Exception as e:
+            print(f"Failed to initialize {name}: {e}")
+        finally:
+            self.model_load_times[name] = time.perf_counter() - start
+            ready.set()
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until all models have finished loading; returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for ready in (self.porcupine_ready, self.whisper_ready, self.symspell_ready):
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            if not ready.wait(remaining):
+                return False
+        return True
+    
     def init_porcupine(self):
-        """Initialize Porcupine wake word detection"""
+        """Initialize Porcupine wake word detection, one detector per input stream"""
         try:
             # Get access key from environment or use default
             access_key = os.environ.get('PORCUPINE_ACCESS_KEY', '')
             
-            # For built-in wake words like "porcupine", "picovoice", etc.
-            # We'll use the built-in keyword detection
-            self.porcupine = pvporcupine.create(
-                access_key=access_key,
-                keywords=['porcupine']  # Using built-in keyword
-            )
+            # Porcupine keeps context across frames, so streams can't share a detector
+            for stream in self.streams:
+                # For built-in wake words like "porcupine", "picovoice", etc.
+                # We'll use the built-in keyword detection
+                stream.porcupine = pvporcupine.create(
+                    access_key=access_key,
+                    keywords=['porcupine']  # Using built-in keyword
+                )
+                stream.wake_word_frames = PorcupineFrameProcessor(stream.porcupine)
+                if self.config.get('wake_gate_enabled', True):
+                    stream.wake_word_gate = EnergyGate(
+                        stream.wake_word_frames,
+                        threshold_db=self.config.get('wake_gate_threshold_db', 6),
+                        min_energy_db=self.config.get('wake_gate_min_energy_db', -65),
+                        history_frames=self.config.get('wake_gate_history_frames', 10),
+                        hangover_frames=self.config.get('wake_gate_hangover_frames', 10)
+                    )
+            
+            primary = self.streams[0]
+            self.porcupine = primary.porcupine
             self.porcupine_sample_rate = self.porcupine.sample_rate
             self.porcupine_frame_length = self.porcupine.frame_length
-            print(f"Porcupine initialized (using 'porcupine' as wake word)")
+            self.wake_word_frames = primary.wake_word_frames
+            self.wake_word_gate = primary.wake_word_gate
+            streams = f", {len(self.streams)} streams" if len(self.streams) > 1 else ""
+            print(f"Porcupine initialized (using 'porcupine' as wake word{streams})")
         except Exception as e:
             print(f"Failed to initialize Porcupine: {e}")
             print("Note: For custom wake word 'susie', you need a Porcupine access key")
             print("Set PORCUPINE_ACCESS_KEY environment variable")
+            for stream in self.streams:
+                if stream.porcupine:
+                    stream.porcupine.delete()
+                stream.porcupine = stream.wake_word_frames = stream.wake_word_gate = None
             self.porcupine = None
     
     def init_whisper(self):
         """Initialize Whisper speech recognition model"""
+        self.transcriber = None
+        self.whisper_model = None
+        
+        num_workers = self.config.get('transcription_workers', 0)
+        model_name = self.config.get('whisper_model', 'tiny')
+        quantize = self.config.get('whisper_quantize', False)
+        cache_dir = self.config.get('whisper_cache_dir', 'cache')
+        
+        if num_workers > 0:
+            # Decode in separate processes, each with its own model copy
+            threads = self.config.get('transcription_threads_per_worker', 1)
+            print(f"Starting {num_workers} Whisper {model_name} workers ({threads} threads each)...")
+            try:
+                self.transcriber = ProcessPoolTranscriber(
+                    model_name, num_workers, threads,
+                    options=self.profile_options[self.decoding_profile],
+                    warmup=self.config.get('whisper_warmup', True),
+                    quantize=quantize,
+                    cache_dir=cache_dir
+                )
+                self.transcriber.start()
+                self.transcriber.ready.wait()
+                if self.transcriber.ready_workers:
+                    return
+                
+                # Every worker failed to load; decode in this process instead
+                print("No transcription workers started, loading Whisper in-process")
+                self.transcriber.stop()
+            except Exception as e:
+                print(f"Failed to start transcription workers: {e}")
+            self.transcriber = None
+        
         try:
-            model_name = self.config.get('whisper_model', 'tiny')
-            print(f"Loading Whisper {model_name} model...")
-            self.whisper_model = whisper.load_model(model_name)
-            print("Whisper model loaded successfully")
+            print(f"Loading Whisper {model_name} model{' (int8)' if quantize else ''}...")
+            self.whisper_model, source, seconds = load_whisper_model(model_name, quantize, cache_dir)
+            print(f"Whisper model loaded from {source} in {seconds:.2f}s")
+            
+            if self.config.get('whisper_warmup', True):
+                self.warm_up_whisper()
+            
+            # Decode pending utterances together when batching is enabled
+            batch_size = self.config.get('transcription_batch_size', 1)
+            if batch_size > 1:
+                self.transcriber = BatchTranscriber(
+                    self.whisper_model,
+                    batch_size=batch_size,
+                    max_wait=self.config.get('transcription_batch_wait', 0.05),
+                    options=self.profile_options[self.decoding_profile]
+                )
+                self.transcriber.start()
         except Exception as e:
             print(f"Failed to initialize Whisper: {e}")
             self.whisper_model = None
     
+    def warm_up_whisper(self):
+        """Run a dummy decode so the first real command doesn't pay one-time setup costs"""
+        start = time.perf_counter()
+        try:
+            silence = np.zeros(self.sample_rate, dtype=np.float32)
+            self.whisper_model.transcribe(silence, **self.profile_options[self.decoding_profile])
+            print(f"Whisper warm-up took {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"Whisper warm-up failed: {e}")
+    
     def init_symspell(self):
         """Initialize SymSpell for text correction"""
         try:
-            self.sym_spell = SymSpell(
-                max_dictionary_edit_distance=self.config.get('symspell_max_edit_distance', 2),
-                prefix_length=self.config.get('symspell_prefix_length', 7)
+            # Load the prebuilt index from cache when the dictionary is unchanged
+            dictionary_path = "frequency_dictionary_en_82_765.txt"
+            self.sym_spell, source, self.symspell_load_time = load_symspell(
+                dictionary_path,
+                max_edit_distance=self.config.get('symspell_max_edit_distance', 2),
+                prefix_length=self.config.get('symspell_prefix_length', 7),
+                cache_dir=self.config.get('symspell_cache_dir', 'cache')
             )
             
-            # Try to load dictionary
-            dictionary_path = "frequency_dictionary_en_82_765.txt"
-            if os.path.exists(dictionary_path):
-                self.sym_spell.load_dictionary(dictionary_path, term_index=0, count_index=1)
-                print("SymSpell dictionary loaded")
+            if self.sym_spell:
+                print(f"SymSpell dictionary loaded from {source} in {self.symspell_load_time:.2f}s")
+                self.init_domain_lexicon()
+                self.init_correction_cache(dictionary_path)
             else:
                 print("SymSpell dictionary not found, text correction disabled")
-                self.sym_spell = None
         except Exception as e:
             print(f"Failed to initialize SymSpell: {e}")
             self.sym_spell = None
     
+    def init_domain_lexicon(self):
+        """Merge the domain lexicon, if configured, over the general dictionary"""
+        path = self.config.get('domain_lexicon')
+        if not path:
+            return
+        if not os.path.exists(path):
+            print(f"Domain lexicon {path} not found, using the general dictionary only")
+            return
+        
+        try:
+            self.domain_lexicon = DomainLexicon(
+                self.sym_spell,
+                path,
+                boost=self.config.get('domain_lexicon_boost', 2.0),
+                check_interval=self.config.get('domain_lexicon_reload_interval', 2.0)
+            )
+            terms = self.domain_lexicon.reload()
+            print(f"Domain lexicon loaded: {terms} terms from {path}")
+        except Exception as e:
+            print(f"Failed to load domain lexicon: {e}")
+            self.domain_lexicon = None
+    
+    def check_domain_lexicon(self):
+        """Reload the domain lexicon if its file changed, dropping corrections made with the old one"""
+        if not self.domain_lexicon or not self.domain_lexicon.changed():
+            return
+        
+        try:
+            # No lookup sees a half-merged index or caches a result from the old one
+            with self.domain_lexicon.lock:
+                terms = self.domain_lexicon.reload()
+                if self.correction_cache:
+                    self.correction_cache.clear()
+                    if self.general_dictionary_key:
+                        self.correction_cache_key = self.dictionary_key()
+            self.metrics.increment("domain_lexicon_reloads")
+            print(f"Domain lexicon reloaded: {terms} terms")
+        except Exception as e:
+            print(f"Failed to reload domain lexicon: {e}")
+    
+    def dictionary_key(self):
+        """Warm file key: the general dictionary's index key plus the domain lexicon's, if any"""
+        if not self.domain_lexicon:
+            return self.general_dictionary_key
+        lexicon_key = lexicon_cache_key(self.domain_lexicon.path, self.domain_lexicon.boost)
+        return f"{self.general_dictionary_key}-{lexicon_key}"
+    
+    def init_correction_cache(self, dictionary_path):
+        """Put the sentence and word LRU caches in front of SymSpell and load the warm set"""
+        max_sentences = self.config.get('correction_cache_size', 1000)
+        if not max_sentences:
+            return
+        
+        self.correction_cache = CorrectionCache(
+            self.sym_spell,
+            max_sentences=max_sentences,
+            max_tokens=self.config.get('correction_token_cache_size', 20000)
+        )
+        
+        warm_file = self.config.get('correction_warm_file')
+        if warm_file:
+            try:
+                self.general_dictionary_key = dictionary_cache_key(
+                    dictionary_path,
+                    self.config.get('symspell_max_edit_distance', 2),
+                    self.config.get('symspell_prefix_length', 7)
+                )
+                self.correction_cache_key = self.dictionary_key()
+                loaded = self.correction_cache.load(warm_file, self.correction_cache_key)
+                if loaded:
+                    print(f"Loaded {loaded} cached corrections from {warm_file}")
+            except Exception as e:
+                print(f"Failed to load correction warm set: {e}")
+    
     def correct_text(self, text):
         """Correct text using SymSpell"""
         if not self.sym_spell or not text:
             return text
         
+        self.check_domain_lexicon()
         try:
-            suggestions = self.sym_spell.lookup_compound(
-                text, 
-                max_edit_distance=2
-            )
+            with self.domain_lexicon.lock if self.domain_lexicon else contextlib.nullcontext():
+                if self.correction_cache:
+                    with self.metrics.time("correct_text"):
+                        return self.correction_cache.correct(text)
+                
+                with self.metrics.time("correct_text"):
+                    suggestions = self.sym_spell.lookup_compound(
+                        text, 
+                        max_edit_distance=2
+                    )
             if suggestions:
                 return suggestions[0].term
         except Exception as e:
@@ -140,364 +621,759 @@ class VoiceAssistant:
         
         return text
     
-    def detect_wake_word(self, audio_data):
-        """Detect wake word in audio data"""
-        if not self.porcupine:
+    def detect_wake_word(self, audio_data=None, stream=None):
+        """
+        Detect wake word in one frame of int16 audio (array or bytes)
+        
+        Without an argument the frame already read into the stream's
+        preallocated `wake_word_frames.frame` buffer is checked, without any
+        copy. Frames the energy gate considers silent skip Porcupine entirely.
+        `stream` selects the input whose detector is used (default: the first).
+        """
+        stream = stream or self.streams[0]
+        if not stream.porcupine:
             return False
         
         try:
-            # Convert audio data to int16 array
-            pcm = struct.unpack_from("h" * self.porcupine_frame_length, audio_data)
-            keyword_index = self.porcupine.process(pcm)
+            start = time.perf_counter()
+            detector = stream.wake_word_gate or stream.wake_word_frames
+            keyword_index = detector.process(audio_data)
+            self.metrics.record("detect_wake_word", time.perf_counter() - start)
             return keyword_index >= 0
         except Exception as e:
             print(f"Wake word detection error: {e}")
             return False
     
-    def record_audio(self, duration):
-        """Record audio for specified duration"""
-        print(f"Recording for {duration} seconds...")
-        
-        frames = []
-        stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=self.chunk_size
-        )
+    def record_audio(self, duration, reader=None, utterance=None):
+        """
+        Record audio for specified duration from the capture ring buffer
         
-        num_chunks = int(self.sample_rate / self.chunk_size * duration)
+        The recording starts `command_preroll` seconds before the reader's
+        position so speech right after the wake word is kept. When a reader
+        is given it is advanced past the recorded audio. With VAD enabled,
+        `duration` is an upper bound: recording stops once speech ends and
+        leading and trailing silence is trimmed.
         
-        for i in range(num_chunks):
-            try:
-                data = stream.read(self.chunk_size, exception_on_overflow=False)
-                frames.append(data)
-            except Exception as e:
-                print(f"Audio read error: {e}")
+        Samples are converted into one preallocated float32 buffer as they
+        are read and the returned audio is a view of it. When an utterance is
+        given, the log-mel features computed while recording are stored on it
+        and the utterance's stream is recorded (otherwise the first stream).
+        """
+        print(f"Recording for up to {duration} seconds...")
+        record_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        
+        stream = self.get_stream(utterance.source if utterance is not None else None)
+        endpointer = stream.endpointer
+        if reader is None:
+            reader = stream.ring_buffer.reader()
+        
+        start = reader.position
+        reader.rewind(self.preroll_samples)
+        num_samples = int(self.sample_rate * duration) + (start - reader.position)
+        
+        samples = np.empty(num_samples, dtype=np.float32)
+        filled = 0
+        
+        if endpointer:
+            endpointer.reset()
+        
+        # Log-mel frames and partial transcripts are computed from the same buffer while it fills
+        features = self.create_feature_extractor(samples) if utterance is not None else None
+        partials = self.create_partial_transcriber(stream.name)
+        if partials:
+            partials.start(samples)
+        
+        while filled < num_samples:
+            count = min(self.chunk_size, num_samples - filled)
+            chunk = reader.read(count, out=samples[filled:filled + count], timeout=1.0)
+            if chunk is None:
+                print("Audio read error: capture stream stalled or stopped")
+                break
+            
+            # The endpointer measures int16-scale levels, so scale to [-1, 1] in place afterwards
+            done = endpointer.process(chunk) if endpointer else False
+            chunk *= 1.0 / 32768.0
+            filled += count
+            
+            if features:
+                features.update(filled)
+            if done:
                 break
+            
+            if partials:
+                bounds = endpointer.speech_bounds() if endpointer else (0, filled)
+                if bounds:
+                    partials.update(bounds[0], filled)
+        
+        if partials:
+            partials.stop()
+            if partials.decodes:
+                print(f"Partial transcripts: {partials.decodes} decodes, "
+                      f"first after {partials.first_partial_latency or 0:.2f}s")
         
-        stream.stop_stream()
-        stream.close()
+        start, end = 0, filled
+        if endpointer:
+            bounds = endpointer.speech_bounds()
+            start, end = bounds if bounds else (0, 0)
+            print(f"Endpoint after {filled / self.sample_rate:.2f}s, "
+                  f"speech {(end - start) / self.sample_rate:.2f}s")
         
-        # Convert to numpy array
-        audio_data = b''.join(frames)
-        audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
+        audio_np = samples[start:end]
         
+        if utterance is not None:
+            memory = samples.nbytes
+            if features and 0 < end - start <= WHISPER_WINDOW_SAMPLES:
+                utterance.features = features.finalize(start, end)
+                memory += features.nbytes
+                self.metrics.record("log_mel", features.seconds)
+            self.last_utterance_bytes = memory
+            self.peak_utterance_bytes = max(self.peak_utterance_bytes, memory)
+            print(f"Utterance buffers: {memory / 1e6:.2f} MB, "
+                  f"log-mel {features.seconds * 1000 if features else 0:.1f} ms")
+        
+        self.metrics.record("record_audio", time.perf_counter() - record_start)
+        self.metrics.record("record_audio_cpu", time.thread_time() - cpu_start)
         return audio_np
     
-    def transcribe_audio(self, audio_data):
-        """Transcribe audio using Whisper"""
-        if not self.whisper_model:
+    def transcribe_audio(self, audio_data, profile=None, features=None):
+        """Transcribe audio using Whisper; returns the text, or None on failure"""
+        result = self.transcribe_result(audio_data, profile, features)
+        return result['text'].strip() if result else None
+    
+    def transcribe_result(self, audio_data, profile=None, features=None):
+        """
+        Transcribe audio with a decoding profile (default: the active one)
+        
+        Returns whisper's result dict, or None on failure. Log-mel `features`
+        computed while recording are decoded directly by the in-process model
+        instead of being recomputed from the audio.
+        """
+        self.whisper_ready.wait()
+        if not self.whisper_model and not self.transcriber:
             return None
         
+        profile = profile or self.decoding_profile
+        options = self.profile_options[profile]
         try:
-            print("Transcribing audio...")
-            result = self.whisper_model.transcribe(
-                audio_data,
-                language='en',
-                fp16=False
-            )
-            text = result['text'].strip()
-            print(f"Transcribed: {text}")
-            return text
+            print(f"Transcribing audio ({profile})...")
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            duration = len(audio_data) / self.sample_rate
+            if isinstance(self.transcriber, BatchTranscriber):
+                result = self.transcriber.submit(audio_data, options, features).result()
+            elif self.transcriber:
+                result = self.transcriber.submit(audio_data, options).result()
+            else:
+                # One decode at a time: whisper's KV cache hooks live on the shared model
+                with self.whisper_lock:
+                    if features is not None:
+                        result = transcribe_features(self.whisper_model, features, duration, options)
+                    else:
+                        result = self.whisper_model.transcribe(audio_data, **options)
+                self.metrics.record("transcribe_audio_cpu", time.process_time() - cpu_start)
+            self.record_transcription_time(time.perf_counter() - start, duration, profile)
+            print(f"Transcribed ({profile}): {result['text'].strip()}")
+            return result
         except Exception as e:
             print(f"Transcription error: {e}")
+            self.metrics.increment("transcription_errors")
             return None
     
-    def save_output(self, text):
-        """Save transcribed and corrected text to output file"""
-        output_file = self.config.get('output_file', 'output.txt')
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def record_transcription_time(self, seconds, audio_duration, profile=None):
+        """Record transcription latency, also per decoding profile, and its real-time factor"""
+        self.metrics.record("transcribe_audio", seconds)
+        if profile:
+            self.metrics.record(f"transcribe_audio_{profile}", seconds)
+        if audio_duration:
+            self.real_time_factor.record(seconds / audio_duration)
+    
+    def transcribe_partial(self, audio_data, prefix=""):
+        """
+        Transcribe the speech recorded so far for a partial transcript
         
+        The in-process model decodes greedily with the stable text forced as
+        the decoder prefix, so only the unstable tail is generated again.
+        """
+        if self.transcriber:
+            with self.metrics.time("transcribe_partial"):
+                return self.transcriber.submit(audio_data).result()['text'].strip()
+        
+        options = dict(TRANSCRIBE_OPTIONS, temperature=0.0, condition_on_previous_text=False)
+        if prefix:
+            options['prefix'] = prefix
+        with self.metrics.time("transcribe_partial"), self.whisper_lock:
+            result = self.whisper_model.transcribe(audio_data, **options)
+        
+        # Whisper returns only the tokens generated after the prefix
+        return f"{prefix} {result['text'].strip()}".strip()
+    
+    def save_output(self, text, record=None, on_written=None):
+        """
+        Queue transcribed and corrected text for the output file
+        
+        The line is written by the background writer; `record` adds fields to
+        JSONL output and `on_written()` runs once the line is in the file.
+        """
         try:
-            with open(output_file, 'a', encoding='utf-8') as f:
-                f.write(f"[{timestamp}] {text}\n")
-            print(f"Saved to {output_file}")
+            with self.metrics.time("save_output"):
+                self.output_writer.write(text, record, on_written)
         except Exception as e:
             print(f"Failed to save output: {e}")
     
-    def audio_monitoring_thread(self):
-        """Thread for continuous audio monitoring and wake word detection"""
-        if not self.porcupine:
-            print("Porcupine not initialized, wake word detection disabled")
+    def audio_monitoring_thread(self, stream=None):
+        """Thread for continuous audio monitoring and wake word detection on one stream"""
+        stream = stream or self.streams[0]
+        try:
+            self.monitor_stream(stream)
+        finally:
+            # A reader that stopped advancing would stall a blocking replay source forever
+            if stream.monitor_reader is not None:
+                stream.monitor_reader.close()
+                stream.monitor_reader = None
+    
+    def monitor_stream(self, stream):
+        """Scan one stream for the wake word and submit commands until the assistant stops"""
+        prefix = self.source_prefix(stream.name)
+        
+        # Start listening as soon as Porcupine is loaded, even if Whisper isn't yet
+        while self.is_running and not self.porcupine_ready.wait(timeout=0.5):
+            pass
+        
+        if not stream.porcupine:
+            print(f"{prefix}Porcupine not initialized, wake word detection disabled")
             return
         
-        stream = self.audio.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.porcupine_sample_rate,
-            input=True,
-            frames_per_buffer=self.porcupine_frame_length
-        )
+        # The reader was created before the source started, so replayed audio
+        # is never missed; skip anything a live source already overwrote
+        reader = stream.monitor_reader
+        reader.position = max(reader.position, stream.ring_buffer.oldest_position)
         
-        print("Listening for wake word...")
+        print(f"{prefix}Listening for wake word...")
+        self.result_queue.put(("status", "Listening for wake word..."))
         
         while self.is_running:
             try:
-                audio_data = stream.read(self.porcupine_frame_length, exception_on_overflow=False)
+                # Read straight into the buffer Porcupine processes
+                frame = reader.read(self.porcupine_frame_length, out=stream.wake_word_frames.frame, timeout=0.5)
+                if frame is None:
+                    continue
                 
-                # Send audio data to GUI for visualization
-                self.audio_queue.put(audio_data)
+                # Keep the endpointer's noise floor current between commands
+                if stream.endpointer and not stream.is_listening:
+                    stream.endpointer.observe(frame)
                 
                 # Check for wake word
-                if self.detect_wake_word(audio_data):
-                    print("Wake word detected!")
-                    self.result_queue.put(("wake_word", "Wake word detected"))
-                    
-                    # Close monitoring stream
-                    stream.stop_stream()
-                    stream.close()
+                if self.detect_wake_word(stream=stream):
+                    print(f"{prefix}Wake word detected!")
+                    self.result_queue.put(("wake_word", f"{prefix}Wake word detected"))
+                    self.metrics.increment("wake_words")
+                    stream.wake_words += 1
                     
-                    # Record and process command
-                    self.process_voice_command()
-                    
-                    # Reopen monitoring stream
-                    stream = self.audio.open(
-                        format=pyaudio.paInt16,
-                        channels=1,
-                        rate=self.porcupine_sample_rate,
-                        input=True,
-                        frames_per_buffer=self.porcupine_frame_length
-                    )
-                    print("Listening for wake word...")
+                    # Hand the command to the pipeline; this thread keeps
+                    # listening while it is recorded and decoded
+                    utterance = Utterance(reader.position, reader=stream.ring_buffer.reader(reader.position),
+                                          source=stream.name)
+                    if not self.pipeline.submit(utterance):
+                        print("Command dropped, pipeline is full")
+                        self.metrics.increment("commands_dropped")
+                        self.result_queue.put(("status", "Busy, command dropped"))
                     
             except Exception as e:
                 print(f"Audio monitoring error: {e}")
                 time.sleep(0.1)
-        
-        stream.stop_stream()
-        stream.close()
     
-    def process_voice_command(self):
-        """Process voice command after wake word detection"""
-        self.result_queue.put(("status", "Recording command..."))
+    def endpoint_stage(self, utterance):
+        """Pipeline stage: record the command from its stream's ring buffer until speech ends"""
+        stream = self.get_stream(utterance.source)
+        self.result_queue.put(("status", f"{self.source_prefix(stream.name)}Recording command..."))
         
-        # Record audio
-        duration = self.config.get('recording_duration', 5)
-        audio_data = self.record_audio(duration)
+        stream.is_listening = True
+        try:
+            duration = self.config.get('recording_duration', 5)
+            reader = utterance.reader or stream.ring_buffer.reader(utterance.start_position)
+            utterance.reader = None
+            try:
+                utterance.audio = self.record_audio(duration, reader, utterance)
+            finally:
+                reader.close()
+            utterance.audio_duration = len(utterance.audio) / self.sample_rate
+            utterance.timestamps["recorded"] = time.monotonic()
+        finally:
+            stream.is_listening = False
+        
+        if len(utterance.audio) == 0:
+            self.result_queue.put(("status", "No speech detected"))
+            return None
         
-        # Transcribe
+        return utterance
+    
+    def transcription_stage(self, utterance):
+        """Pipeline stage: transcribe recorded audio"""
         self.result_queue.put(("status", "Transcribing..."))
-        text = self.transcribe_audio(audio_data)
+        self.whisper_ready.wait()
         
-        if text:
-            # Correct text
-            self.result_queue.put(("status", "Correcting text..."))
-            corrected_text = self.correct_text(text)
+        if self.transcriber:
+            # With several streams the backlog waits in this stage's fair queue
+            # rather than in the transcriber's first-come first-served one
+            if len(self.streams) > 1:
+                self.wait_for_transcriber()
             
-            # Display and save result
-            self.result_queue.put(("transcription", f"Original: {text}"))
-            if corrected_text != text:
-                self.result_queue.put(("transcription", f"Corrected: {corrected_text}"))
+            # Hand off to the worker processes or batcher without waiting;
+            # results are delivered in submission order and forwarded to correction
+            utterance.timestamps["transcription_submitted"] = time.monotonic()
+            utterance.profile = self.decoding_profile
+            options = self.profile_options[utterance.profile]
             
-            self.save_output(corrected_text)
-            self.result_queue.put(("status", "Ready"))
+            # Tracked until forwarded, so is_idle() doesn't miss it between the two stages
+            self.transcribing.add(utterance)
+            try:
+                if isinstance(self.transcriber, BatchTranscriber):
+                    future = self.transcriber.submit(utterance.audio, options, utterance.features)
+                else:
+                    future = self.transcriber.submit(utterance.audio, options)
+            except Exception:
+                self.transcribing.discard(utterance)
+                raise
+            future.add_done_callback(lambda f: self.forward_transcription(utterance, f))
+            utterance.audio = None
+            utterance.features = None
+            return None
+        
+        utterance.profile = self.decoding_profile
+        self.set_transcription(utterance, self.transcribe_result(utterance.audio, utterance.profile, utterance.features))
+        utterance.timestamps["transcribed"] = time.monotonic()
+        return self.finish_transcription(utterance)
+    
+    def wait_for_transcriber(self):
+        """Block while the transcriber already has enough work to keep every worker or batch slot busy"""
+        capacity = getattr(self.transcriber, 'num_workers', None) or getattr(self.transcriber, 'batch_size', 1)
+        while self.is_running and self.transcriber.pending >= capacity:
+            time.sleep(0.01)
+    
+    def forward_transcription(self, utterance, future):
+        """Complete a background transcription and pass it to the correction stage"""
+        utterance.timestamps["transcribed"] = time.monotonic()
+        self.record_transcription_time(
+            utterance.timestamps["transcribed"] - utterance.timestamps["transcription_submitted"],
+            utterance.audio_duration,
+            utterance.profile
+        )
+        
+        try:
+            self.set_transcription(utterance, future.result())
+            print(f"Transcribed ({utterance.profile}): {utterance.text}")
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            self.metrics.increment("transcription_errors")
+            utterance.text = None
+        
+        try:
+            if self.finish_transcription(utterance) is not None:
+                self.pipeline.stage("correction").submit(utterance)
+        finally:
+            self.transcribing.discard(utterance)
+    
+    def set_transcription(self, utterance, result):
+        """Store the speech segments, text and confidence of a whisper result (or None) on an utterance"""
+        if not result:
+            utterance.text = None
+            return
+        
+        utterance.segments, utterance.segments_dropped = self.speech_segments(result)
+        utterance.text = " ".join(segment["text"] for segment in utterance.segments)
+        utterance.confidence = result_confidence({"segments": utterance.segments})
+    
+    def speech_segments(self, result):
+        """
+        Scored segments of a whisper result, without those that are probably not speech
+        
+        Segments whose no-speech probability is at least
+        `no_speech_drop_threshold` are dropped before correction and output.
+        Returns (segments, number dropped).
+        """
+        segments, dropped = speech_segments(result, self.config.get('no_speech_drop_threshold', 0.6))
+        if dropped:
+            self.metrics.increment("segments_dropped", dropped)
+        return segments, dropped
+    
+    def correct_segments(self, segments):
+        """
+        Corrected text of transcribed segments
+        
+        Segments Whisper is confident about (average log-probability at or
+        above `correction_skip_logprob`) skip SymSpell and are only normalized
+        to the lowercase, unpunctuated form its corrections have; the rest go
+        through correct_text().
+        """
+        skip_logprob = self.config.get('correction_skip_logprob', -0.3)
+        parts = []
+        for segment in segments:
+            if (skip_logprob is not None and segment["avg_logprob"] is not None
+                    and segment["avg_logprob"] >= skip_logprob):
+                self.metrics.increment("corrections_skipped")
+                parts.append(normalize_text(segment["text"]) if self.sym_spell else segment["text"])
+            else:
+                parts.append(self.correct_text(segment["text"]))
+        return " ".join(part for part in parts if part)
+    
+    def finish_transcription(self, utterance):
+        """Drop the audio and stop processing if transcription produced no text"""
+        utterance.audio = None
+        utterance.features = None
+        
+        if not utterance.text:
+            if utterance.segments_dropped:
+                self.metrics.increment("no_speech_results")
+                self.result_queue.put(("status", "No speech detected"))
+            else:
+                self.result_queue.put(("status", "Transcription failed"))
+            return None
+        
+        return utterance
+    
+    def correction_stage(self, utterance):
+        """Pipeline stage: correct transcribed text"""
+        self.result_queue.put(("status", "Correcting text..."))
+        self.symspell_ready.wait()
+        if utterance.segments is not None:
+            utterance.corrected_text = self.correct_segments(utterance.segments)
         else:
-            self.result_queue.put(("status", "Transcription failed"))
+            utterance.corrected_text = self.correct_text(utterance.text)
+        utterance.timestamps["corrected"] = time.monotonic()
+        return utterance
+    
+    def output_stage(self, utterance):
+        """Pipeline stage: display and save the result"""
+        text, corrected_text = utterance.text, utterance.corrected_text
+        prefix = self.source_prefix(utterance.source)
+        
+        self.result_queue.put(("transcription", f"{prefix}Original ({utterance.profile}): {text}"))
+        if corrected_text != text:
+            self.result_queue.put(("transcription", f"{prefix}Corrected: {corrected_text}"))
+        
+        utterance.timestamps["saved"] = time.monotonic()
+        self.save_output(corrected_text, self.output_record(utterance))
+        self.metrics.record("end_to_end", utterance.timestamps["saved"] - utterance.detected_at)
+        
+        self.result_queue.put(("status", "Ready"))
+        return None
+    
+    def output_record(self, utterance):
+        """
+        JSONL fields for a finished utterance
+        
+        Timestamps are wall-clock times (seconds since the epoch) at which
+        each stage finished; latencies are the seconds each stage took. With
+        several streams the record names the `source` stream.
+        """
+        now_wall, now = time.time(), time.monotonic()
+        stages = sorted(utterance.timestamps.items(), key=lambda item: item[1])
+        record = {"source": self.get_stream(utterance.source).name} if len(self.streams) > 1 else {}
+        record.update({
+            "raw_text": utterance.text,
+            "profile": utterance.profile,
+            "audio_duration": utterance.audio_duration,
+            "confidence": utterance.confidence,
+            "segments_dropped": utterance.segments_dropped,
+            "timestamps": {name: round(now_wall - (now - t), 3) for name, t in stages},
+            "latencies": {
+                name: round(t - previous, 4)
+                for (_, previous), (name, t) in zip(stages, stages[1:])
+            }
+        })
+        return record
+    
+    def process_voice_command(self, reader=None):
+        """Process a voice command synchronously, running each pipeline stage inline"""
+        if reader is None:
+            reader = self.ring_buffer.reader()
+        
+        utterance = self.endpoint_stage(Utterance(reader.position))
+        if utterance is None:
+            return
+        
+        utterance.profile = self.decoding_profile
+        self.set_transcription(utterance, self.transcribe_result(utterance.audio, utterance.profile, utterance.features))
+        utterance.timestamps["transcribed"] = time.monotonic()
+        if self.finish_transcription(utterance) is None:
+            return
+        
+        self.output_stage(self.correction_stage(utterance))
+    
+    def is_idle(self):
+        """Whether all captured audio has been scanned and no command is in progress"""
+        # Streams without a running monitor thread have nothing left to scan
+        readers = [(stream.ring_buffer, stream.monitor_reader) for stream in self.streams]
+        caught_up = all(
+            ring.write_position - reader.position < self.chunk_size
+            for ring, reader in readers if reader is not None
+        )
+        return caught_up and not self.is_listening and self.pipeline.is_idle() and not self.transcribing
+    
+    def get_pipeline_stats(self):
+        """Per-stage queue depths and counters, including the capture stage"""
+        stats = {
+            "capture": {
+                "ring_overruns": sum(stream.ring_buffer.overruns for stream in self.streams),
+                "input_overflows": sum(stream.source.input_overflows for stream in self.streams)
+            }
+        }
+        if len(self.streams) > 1:
+            stats.update({f"capture:{stream.name}": stream.stats() for stream in self.streams})
+        stats.update(self.pipeline.stats())
+        return stats
+    
+    def get_metrics(self):
+        """
+        Per-stage latency percentiles (seconds), event counters and health gauges
+        
+        Stages are detect_wake_word, record_audio, transcribe_audio,
+        transcribe_partial, correct_text, save_output and end_to_end (wake word
+        to saved result). Counters include capture overruns (frames dropped
+        because a reader fell behind) and input overflows. Also reports wake
+        words per minute, the transcription real-time factor, queue depths,
+        model load times, process RSS and the active decoding profile.
+        transcribe_audio is also broken down per profile. The wake gate's
+        estimated CPU saving is a gauge (wake_gate_cpu_saved_seconds), since
+        it can decrease.
+        
+        Per-utterance cost is reported as CPU time (record_audio_cpu,
+        log_mel, transcribe_audio_cpu) and the memory held by the last and
+        largest utterance's audio and feature buffers. Correction cache hit
+        rates are under correction_cache, and the domain lexicon size and
+        reload count under domain_lexicon. Capture counters are summed over
+        every stream; streams breaks them down per audio source.
+        """
+        snapshot = self.metrics.snapshot()
+        snapshot["counters"].update({
+            "ring_overruns": sum(stream.ring_buffer.overruns for stream in self.streams),
+            "input_overflows": sum(stream.source.input_overflows for stream in self.streams),
+            "pipeline_dropped": sum(stage.dropped for stage in self.pipeline.stages),
+            "pipeline_errors": sum(stage.errors for stage in self.pipeline.stages)
+        })
+        
+        gates = [stream.wake_word_gate for stream in self.streams if stream.wake_word_gate]
+        if gates:
+            snapshot["counters"].update({
+                "wake_gate_frames": sum(gate.frames for gate in gates),
+                "wake_gate_frames_gated": sum(gate.frames_gated for gate in gates),
+                "wake_gate_frames_replayed": sum(gate.frames_replayed for gate in gates)
+            })
+            
+            # An estimate that can go down (or below zero), so not a counter
+            snapshot["wake_gate_cpu_saved_seconds"] = sum(gate.cpu_saved_seconds for gate in gates)
+        
+        if self.correction_cache:
+            stats = self.correction_cache.stats()
+            snapshot["counters"].update({
+                f"correction_cache_{name}": stats[name]
+                for name in ("sentence_hits", "sentence_misses", "token_hits", "token_misses")
+            })
+            snapshot["correction_cache"] = stats
+        
+        if self.domain_lexicon:
+            snapshot["domain_lexicon"] = self.domain_lexicon.stats()
+        
+        writer = self.output_writer.stats()
+        snapshot["counters"].update({
+            f"output_{name}": writer[name] for name in ("records_written", "rotations", "fsyncs", "errors")
+        })
+        
+        queue_depths = {stage.name: stage.depth for stage in self.pipeline.stages}
+        queue_depths["output_writer"] = writer["pending"]
+        if self.transcriber:
+            queue_depths["transcriber"] = self.transcriber.pending
+        
+        snapshot.update({
+            "wake_words_per_minute": self.metrics.rate_per_minute("wake_words"),
+            "real_time_factor": self.real_time_factor.snapshot() if self.real_time_factor.count else None,
+            "queue_depths": queue_depths,
+            "model_load_times": dict(self.model_load_times),
+            "process_rss_bytes": process_rss_bytes(),
+            "last_utterance_bytes": self.last_utterance_bytes,
+            "peak_utterance_bytes": self.peak_utterance_bytes,
+            "decoding_profile": self.decoding_profile,
+            "streams": {stream.name: stream.stats() for stream in self.streams}
+        })
+        return snapshot
     
     def start(self):
         """Start the voice assistant"""
         self.is_running = True
         
-        # Start audio monitoring thread
-        self.monitor_thread = threading.Thread(target=self.audio_monitoring_thread, daemon=True)
-        self.monitor_thread.start()
+        # Open the persistent audio sources and the processing workers
+        for stream in self.streams:
+            stream.monitor_reader = stream.ring_buffer.reader()
+            try:
+                stream.source.start(stream.ring_buffer)
+            except Exception as e:
+                print(f"{self.source_prefix(stream.name)}Failed to open audio input: {e}")
+        self.pipeline.start()
+        
+        if self.metrics_dumper:
+            self.metrics_dumper.start()
+        
+        # Metrics are served from their own thread, never the capture or monitoring threads
+        if self.config.get('metrics_http_port') is not None:
+            try:
+                self.metrics_server = MetricsServer(
+                    self.get_metrics,
+                    host=self.config.get('metrics_http_host', '127.0.0.1'),
+                    port=self.config['metrics_http_port']
+                )
+                self.metrics_server.start()
+                print(f"Serving metrics on http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+            except Exception as e:
+                print(f"Failed to start metrics server: {e}")
+                self.metrics_server = None
+        
+        # Start one audio monitoring thread per stream
+        for stream in self.streams:
+            stream.monitor_thread = threading.Thread(
+                target=self.audio_monitoring_thread,
+                args=(stream,),
+                name=f"monitor-{stream.name}",
+                daemon=True
+            )
+            stream.monitor_thread.start()
     
     def stop(self):
         """Stop the voice assistant"""
         self.is_running = False
+        for stream in self.streams:
+            stream.source.stop()
         
-        if hasattr(self, 'monitor_thread'):
-            self.monitor_thread.join(timeout=2)
+        for stream in self.streams:
+            if stream.monitor_thread:
+                stream.monitor_thread.join(timeout=2)
         
-        if self.porcupine:
-            self.porcupine.delete()
+        self.pipeline.stop()
         
-        self.audio.terminate()
-
-
-class VoiceAssistantGUI:
-    """GUI for the voice assistant with audio spectrum visualization"""
-    
-    def __init__(self, root):
-        """Initialize the GUI"""
-        self.root = root
-        self.root.title("Voice Assistant - Say 'porcupine' to activate")
-        self.root.geometry("700x500")
-        self.root.resizable(True, True)
-        
-        # Initialize voice assistant
-        self.assistant = VoiceAssistant()
-        
-        # Setup GUI
-        self.setup_gui()
-        
-        # Start assistant
-        self.assistant.start()
-        
-        # Start GUI update loop
-        self.update_gui()
-        
-        # Handle window close
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
-    
-    def setup_gui(self):
-        """Setup GUI components"""
-        # Main container
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Configure grid weights
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        main_frame.columnconfigure(0, weight=1)
-        main_frame.rowconfigure(1, weight=1)
-        main_frame.rowconfigure(2, weight=1)
-        
-        # Status label
-        self.status_label = ttk.Label(
-            main_frame, 
-            text="Status: Listening for wake word...",
-            font=('Segoe UI', 10, 'bold')
-        )
-        self.status_label.grid(row=0, column=0, pady=5, sticky=tk.W)
-        
-        # Audio spectrum visualization
-        spectrum_frame = ttk.LabelFrame(main_frame, text="Audio Spectrum", padding="5")
-        spectrum_frame.grid(row=1, column=0, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
-        spectrum_frame.columnconfigure(0, weight=1)
-        spectrum_frame.rowconfigure(0, weight=1)
-        
-        self.figure = Figure(figsize=(6, 2), dpi=100)
-        self.ax = self.figure.add_subplot(111)
-        self.ax.set_ylim([0, 1])
-        self.ax.set_xlim([0, 100])
-        self.ax.set_xlabel('Frequency Bins')
-        self.ax.set_ylabel('Amplitude')
-        self.ax.grid(True, alpha=0.3)
-        
-        self.canvas = FigureCanvasTkAgg(self.figure, spectrum_frame)
-        self.canvas.get_tk_widget().grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        self.line, = self.ax.plot([], [], 'b-', linewidth=1)
-        
-        # Output text area
-        output_frame = ttk.LabelFrame(main_frame, text="Transcriptions", padding="5")
-        output_frame.grid(row=2, column=0, pady=5, sticky=(tk.W, tk.E, tk.N, tk.S))
-        output_frame.columnconfigure(0, weight=1)
-        output_frame.rowconfigure(0, weight=1)
-        
-        self.output_text = scrolledtext.ScrolledText(
-            output_frame,
-            wrap=tk.WORD,
-            width=70,
-            height=10,
-            font=('Segoe UI', 9)
-        )
-        self.output_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        if self.transcriber:
+            self.transcriber.stop()
         
-        # Control buttons
-        button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=3, column=0, pady=5)
+        if self.metrics_dumper:
+            self.metrics_dumper.stop()
         
-        self.clear_button = ttk.Button(
-            button_frame,
-            text="Clear Output",
-            command=self.clear_output
-        )
-        self.clear_button.grid(row=0, column=0, padx=5)
+        if self.metrics_server:
+            self.metrics_server.stop()
         
-        self.quit_button = ttk.Button(
-            button_frame,
-            text="Quit",
-            command=self.on_closing
-        )
-        self.quit_button.grid(row=0, column=1, padx=5)
+        self.output_writer.stop()
         
-    def update_spectrum(self, audio_data):
-        """Update audio spectrum visualization"""
-        try:
-            # Convert audio data to numpy array
-            pcm = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
-            
-            # Compute FFT
-            fft = np.fft.rfft(pcm)
-            spectrum = np.abs(fft)
-            
-            # Normalize and limit to displayable range
-            if len(spectrum) > 0:
-                spectrum = spectrum / (np.max(spectrum) + 1e-10)
-                
-                # Downsample for display
-                display_bins = 100
-                if len(spectrum) > display_bins:
-                    spectrum = np.interp(
-                        np.linspace(0, len(spectrum) - 1, display_bins),
-                        np.arange(len(spectrum)),
-                        spectrum
-                    )
-                
-                # Update plot
-                x_data = np.arange(len(spectrum))
-                self.line.set_data(x_data, spectrum)
-                self.canvas.draw_idle()
-        except Exception as e:
-            pass  # Silently ignore visualization errors
-    
-    def update_gui(self):
-        """Update GUI with new data from queues"""
-        # Update audio spectrum
-        try:
-            while not self.assistant.audio_queue.empty():
-                audio_data = self.assistant.audio_queue.get_nowait()
-                self.update_spectrum(audio_data)
-        except queue.Empty:
-            pass
+        if self.correction_cache and self.config.get('correction_warm_file'):
+            try:
+                self.correction_cache.save(self.config['correction_warm_file'], self.correction_cache_key)
+            except Exception as e:
+                print(f"Failed to save correction warm set: {e}")
         
-        # Update status and results
+        for stream in self.streams:
+            if stream.porcupine:
+                stream.porcupine.delete()
+
+
+def run_headless(assistant):
+    """
+    Run the engine without a GUI until SIGTERM or Ctrl+C, logging results to stdout
+    
+    With a finite audio source (file replay or synthetic audio) the engine
+    stops by itself once the source is exhausted and every command has been
+    processed.
+    """
+    stop_event = threading.Event()
+    
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}, shutting down...")
+        stop_event.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    assistant.start()
+    
+    while not stop_event.is_set():
         try:
-            while not self.assistant.result_queue.empty():
-                msg_type, msg = self.assistant.result_queue.get_nowait()
-                
-                if msg_type == "status":
-                    self.status_label.config(text=f"Status: {msg}")
-                elif msg_type == "wake_word":
-                    self.output_text.insert(tk.END, f"\n=== {msg} ===\n")
-                    self.output_text.see(tk.END)
-                elif msg_type == "transcription":
-                    self.output_text.insert(tk.END, f"{msg}\n")
-                    self.output_text.see(tk.END)
+            msg_type, msg = assistant.result_queue.get(timeout=0.2)
         except queue.Empty:
-            pass
+            finished = all(stream.source.finished.is_set() for stream in assistant.streams)
+            if finished and assistant.is_idle():
+                print("Audio source finished")
+                print(json.dumps(assistant.get_pipeline_stats(), indent=2))
+                break
+            continue
         
-        # Schedule next update
-        self.root.after(50, self.update_gui)
-    
-    def clear_output(self):
-        """Clear the output text area"""
-        self.output_text.delete(1.0, tk.END)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] {msg_type}: {msg}", flush=True)
     
-    def on_closing(self):
-        """Handle window closing"""
-        print("Shutting down...")
-        self.assistant.stop()
-        self.root.destroy()
+    assistant.stop()
 
 
-def main():
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Offline voice assistant with wake word detection")
+    parser.add_argument('--config', default='config.json', help="Path to the configuration file")
+    parser.add_argument('--headless', action='store_true',
+                        help="Run without the GUI; results are printed and saved to the output file")
+    parser.add_argument('--replay', metavar='WAV',
+                        help="Use a WAV file as the audio input instead of the microphone")
+    parser.add_argument('--max-speed', action='store_true',
+                        help="Replay the WAV file as fast as it can be processed instead of in real time")
+    parser.add_argument('--batch', metavar='PATH',
+                        help="Transcribe WAV/FLAC files from a directory or manifest file and exit")
+    parser.add_argument('--jobs', type=int, default=4,
+                        help="Files processed in parallel in batch mode (default: 4)")
+    parser.add_argument('--checkpoint', default='batch_checkpoint.txt',
+                        help="File recording completed files so a batch can resume")
+    parser.add_argument('--report', help="Write the batch summary as JSON to this file")
+    parser.add_argument('--profile',
+                        help="Decoding profile to start with (fast, balanced, accurate or one from the config)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main entry point"""
+    # Required for transcription worker processes in frozen executables
+    multiprocessing.freeze_support()
+    
+    args = parse_args(argv)
+    
     print("=" * 60)
     print("Voice Assistant with Wake Word Detection")
     print("=" * 60)
     print("Starting application...")
     
-    # Create GUI
-    root = tk.Tk()
-    app = VoiceAssistantGUI(root)
+    audio_source = None
+    if args.replay:
+        audio_source = {"type": "wav", "path": args.replay, "realtime": not args.max_speed}
+    
+    assistant = VoiceAssistant(args.config, audio_source)
+    if args.profile:
+        try:
+            assistant.set_decoding_profile(args.profile)
+        except ValueError as e:
+            print(e)
+            assistant.stop()
+            return
     
-    # Run main loop
-    root.mainloop()
+    if args.batch:
+        from batch_transcribe import run_batch
+        try:
+            run_batch(assistant, args.batch, args.jobs, args.checkpoint, args.report)
+        finally:
+            assistant.stop()
+    elif args.headless:
+        run_headless(assistant)
+    else:
+        # Imported here so headless mode never loads tkinter or matplotlib
+        import tkinter as tk
+        from gui import VoiceAssistantGUI
+        
+        # Create GUI
+        root = tk.Tk()
+        app = VoiceAssistantGUI(root, assistant)
+        
+        # Run main loop
+        root.mainloop()
     
     print("Application closed")
 
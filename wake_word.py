@@ -0,0 +1,184 @@
+"""
+Wake word frame handling for Porcupine
+Frames are read into one preallocated int16 buffer that Porcupine's native
+library reads directly, and an energy gate skips inference on silent frames
+"""
+
+import ctypes
+import time
+
+import numpy as np
+
+from endpointing import EnergyEndpointer
+
+
+class PorcupineFrameProcessor:
+    """Runs Porcupine on int16 frames without converting them to Python ints"""
+    
+    def __init__(self, porcupine):
+        """
+        Preallocate the frame buffer and a pointer to it
+        
+        pvporcupine's process() copies every sample into a new ctypes array.
+        When its native entry point is available the buffer is passed to it
+        directly instead; otherwise frames go through process() as a list.
+        """
+        self.porcupine = porcupine
+        self.frame_length = porcupine.frame_length
+        self.frame = np.zeros(self.frame_length, dtype=np.int16)
+        self.zero_copy = False
+        
+        try:
+            self._process_func = porcupine._process_func
+            self._handle = porcupine._handle
+            self._success = porcupine.PicovoiceStatuses.SUCCESS
+            self._pointer = self.frame.ctypes.data_as(ctypes.POINTER(ctypes.c_short))
+            self._result = ctypes.c_int()
+            self._result_ref = ctypes.byref(self._result)
+            self.zero_copy = True
+        except AttributeError:
+            pass
+    
+    def load(self, frame):
+        """Copy an int16 array or bytes of one frame into the buffer"""
+        if frame is self.frame:
+            return
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            frame = np.frombuffer(frame, dtype=np.int16)
+        if len(frame) != self.frame_length:
+            raise ValueError(f"Invalid frame length, expected {self.frame_length} but received {len(frame)}")
+        np.copyto(self.frame, frame, casting='unsafe')
+    
+    def process(self, frame=None):
+        """
+        Keyword index detected at the end of a frame, or -1
+        
+        With no argument the frame already read into `self.frame` is used;
+        any other int16 array or bytes of the right length is copied into it.
+        """
+        if frame is not None:
+            self.load(frame)
+        
+        if self.zero_copy:
+            status = self._process_func(self._handle, self._pointer, self._result_ref)
+            if status is self._success:
+                return self._result.value
+        
+        # Fallback, and the error path: process() raises Porcupine's own exception
+        return self.porcupine.process(self.frame.tolist())
+
+
+class EnergyGate:
+    """
+    Skips Porcupine on frames that are clearly silent
+    
+    Frame energy is compared against an adaptive noise floor. Gated frames
+    are kept in a short history that is fed to Porcupine when the gate
+    opens, so its internal context covers the audio just before the speech.
+    """
+    
+    def __init__(self, processor, threshold_db=6.0, min_energy_db=-65.0, history_frames=10,
+                 hangover_frames=10, noise_adaptation=0.02):
+        """
+        Gate frames for a PorcupineFrameProcessor
+        
+        The gate opens when a frame is `threshold_db` above the noise floor
+        and above `min_energy_db` (dBFS), and stays open for `hangover_frames`
+        frames after the level drops. The last `history_frames` gated frames
+        are replayed when it opens.
+        """
+        self.processor = processor
+        self.threshold_db = threshold_db
+        self.min_energy_db = min_energy_db
+        self.hangover_frames = hangover_frames
+        self.noise_adaptation = noise_adaptation
+        self.noise_floor_db = min_energy_db - threshold_db
+        
+        self.history = np.zeros((history_frames, processor.frame_length), dtype=np.int16)
+        self.history_next = 0
+        self.history_count = 0
+        self.current = np.empty(processor.frame_length, dtype=np.int16)
+        self.hangover_left = 0
+        
+        # Counters
+        self.frames = 0
+        self.frames_gated = 0
+        self.frames_replayed = 0
+        self.frames_processed = 0
+        self.gate_seconds = 0.0
+        self.process_seconds = 0.0
+    
+    def is_open(self, frame):
+        """Update the gate state for a frame; returns whether Porcupine should see it"""
+        energy_db = float(EnergyEndpointer.frame_energy_db(frame))
+        loud = energy_db > max(self.noise_floor_db + self.threshold_db, self.min_energy_db)
+        
+        # The floor also rises slowly while the gate is open, so steady
+        # background noise above min_energy_db eventually closes it again
+        if energy_db < self.noise_floor_db:
+            self.noise_floor_db = energy_db
+        else:
+            self.noise_floor_db += self.noise_adaptation * (energy_db - self.noise_floor_db)
+        
+        if loud:
+            self.hangover_left = self.hangover_frames
+            return True
+        if self.hangover_left > 0:
+            self.hangover_left -= 1
+            return True
+        return False
+    
+    def process(self, frame=None):
+        """Keyword index for a frame (default: the processor's buffer), or -1 if it was gated"""
+        if frame is not None:
+            self.processor.load(frame)
+        frame = self.processor.frame
+        self.frames += 1
+        
+        start = time.perf_counter()
+        is_open = self.is_open(frame)
+        if not is_open:
+            self.history[self.history_next] = frame
+            self.history_next = (self.history_next + 1) % len(self.history)
+            self.history_count = min(self.history_count + 1, len(self.history))
+            self.frames_gated += 1
+        self.gate_seconds += time.perf_counter() - start
+        
+        if not is_open:
+            return -1
+        
+        start = time.perf_counter()
+        keyword_index = -1
+        if self.history_count:
+            # Replaying overwrites the processor's buffer, so keep the current frame
+            np.copyto(self.current, frame)
+            for i in range(self.history_count):
+                index = (self.history_next - self.history_count + i) % len(self.history)
+                keyword_index = max(keyword_index, self.processor.process(self.history[index]))
+            self.frames_replayed += self.history_count
+            self.history_count = 0
+            frame = self.current
+        
+        keyword_index = max(keyword_index, self.processor.process(frame))
+        self.frames_processed += 1
+        self.process_seconds += time.perf_counter() - start
+        return keyword_index
+    
+    @property
+    def cpu_saved_seconds(self):
+        """Estimated Porcupine time avoided, net of the gate's own cost"""
+        calls = self.frames_processed + self.frames_replayed
+        if not calls:
+            return 0.0
+        skipped = self.frames_gated - self.frames_replayed
+        return skipped * self.process_seconds / calls - self.gate_seconds
+    
+    def stats(self):
+        """Gate counters"""
+        return {
+            "frames": self.frames,
+            "frames_gated": self.frames_gated,
+            "frames_replayed": self.frames_replayed,
+            "noise_floor_db": self.noise_floor_db,
+            "cpu_saved_seconds": self.cpu_saved_seconds
+        }